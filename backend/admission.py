@@ -0,0 +1,97 @@
+from sqlalchemy import func, or_
+
+from jobs import enqueue_many
+from models import db, Event, Registration, WaitlistEntry, insert_or_ignore
+from stats import record_registrations
+
+# Seats are taken with a single conditional UPDATE (participants + n <=
+# capacity) instead of reading the row under SELECT ... FOR UPDATE. The check
+# and the increment are one statement, so two writers can never both see the
+# last free seat: SQLite runs it under the database write lock, and PostgreSQL
+# re-evaluates the WHERE clause against the latest row version when a
+# concurrent update commits first. Failed attempts match no row and hold no
+# lock, so a sold-out event costs its rejected registrants very little.
+
+def item_columns(model):
+    """(Registration column, WaitlistEntry column) for Event or Challenge"""
+    if model is Event:
+        return Registration.event_id, WaitlistEntry.event_id
+    return Registration.challenge_id, WaitlistEntry.challenge_id
+
+def reserve_seats(model, item_id, amount=1):
+    """Take amount seats if they are all free; returns True on success"""
+    return bool(model.query.filter(
+        model.id == item_id,
+        or_(model.capacity.is_(None), model.participants + amount <= model.capacity)
+    ).update({model.participants: model.participants + amount}, synchronize_session=False))
+
+def reserve_up_to(model, item_id, amount):
+    """Take as many of amount seats as are free; returns the number taken"""
+    if amount <= 0 or reserve_seats(model, item_id, amount):
+        return max(amount, 0)
+    taken = 0
+    while taken < amount and reserve_seats(model, item_id):
+        taken += 1
+    return taken
+
+def release_seats(model, item_id, amount=1):
+    model.query.filter(model.id == item_id, model.participants >= amount).update(
+        {model.participants: model.participants - amount}, synchronize_session=False
+    )
+
+def join_waitlist(user_id, model, item_id):
+    """Queue the user for item_id (once); returns (entry id, position, created)"""
+    _, column = item_columns(model)
+    entry_id = insert_or_ignore(WaitlistEntry, {
+        'user_id': user_id, column.key: item_id
+    }, ['user_id', column.key], column.isnot(None))
+    created = entry_id is not None
+    if not created:
+        entry_id = db.session.query(WaitlistEntry.id).filter(
+            WaitlistEntry.user_id == user_id, column == item_id
+        ).scalar()
+    return entry_id, waitlist_position(column, item_id, entry_id), created
+
+def waitlist_position(column, item_id, entry_id):
+    """1-based place in the queue, counted over the (item, id) index"""
+    return db.session.query(func.count(WaitlistEntry.id)).filter(
+        column == item_id, WaitlistEntry.id <= entry_id
+    ).scalar()
+
+def leave_waitlist(user_id, model, item_id):
+    _, column = item_columns(model)
+    return WaitlistEntry.query.filter(
+        WaitlistEntry.user_id == user_id, column == item_id
+    ).delete(synchronize_session=False)
+
+def promote_waitlist(model, item_id):
+    """Move the oldest waitlisted users onto free seats of a free item.
+
+    Runs in the caller's transaction. Each promotion reserves a seat first and
+    then claims the head of the queue with a DELETE, so concurrent promoters
+    never hand out the same entry or the same seat twice. Returns the new
+    registration ids; confirmations are queued for them.
+    """
+    registration_column, column = item_columns(model)
+    promoted = []
+    while True:
+        entry = db.session.query(WaitlistEntry.id, WaitlistEntry.user_id) \
+            .filter(column == item_id).order_by(WaitlistEntry.id).first()
+        if entry is None or not reserve_seats(model, item_id):
+            break
+        claimed = WaitlistEntry.query.filter(WaitlistEntry.id == entry.id).delete(synchronize_session=False)
+        registration_id = insert_or_ignore(Registration, {
+            'user_id': entry.user_id,
+            registration_column.key: item_id,
+            'payment_status': 'completed'
+        }, ['user_id', registration_column.key], registration_column.isnot(None)) if claimed else None
+        if registration_id is None:
+            # Claimed by another promoter, or the user registered directly
+            release_seats(model, item_id)
+            continue
+        promoted.append(registration_id)
+
+    if promoted:
+        record_registrations(model, {item_id: len(promoted)})
+        enqueue_many('send_registration_confirmation', [{'registration_id': i} for i in promoted])
+    return promoted
@@ -1,31 +1,113 @@
-
-from flask import Flask, request, jsonify
+from flask import Flask, Blueprint, request, jsonify, current_app, abort, send_from_directory
 from flask_cors import CORS
-from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import JWTManager, jwt_required, get_jwt, get_jwt_identity
+from sqlalchemy import tuple_
+from collections import Counter
 from datetime import datetime, timedelta
-import stripe
+import base64
+import csv
+import io
 import os
-from models import db, User, College, Event, Challenge, Registration
-from seed_data import seed_all
+from models import (
+    db, User, College, Event, Challenge, Registration, WaitlistEntry, CollegeStats, CollegeDailyStats,
+    insert_or_ignore, registered_pairs
+)
+from cache import response_cache, cache_policy
+from compression import response_compression
+from search import search, index_row
+from stats import record_registrations, record_approval
+from admission import (
+    item_columns, reserve_seats, reserve_up_to, release_seats, join_waitlist, leave_waitlist,
+    waitlist_position, promote_waitlist
+)
+from passwords import password_hasher, HasherBusy
+from database import engine_options, pool_status, PoolTimeout
+from commands import eventify_cli, init_db
+from payments import stripe_gateway, record_payment_event
+from jobs import enqueue, enqueue_once
+from live import live_counts
+from media import IMAGE_OWNERS, VARIANT_PATH, ImageError, check_public_url, save_upload
+from identity import init_identity, issue_token, identity_cache, revoked_tokens, admin_required
+from metrics import request_metrics
+from replicas import REPLICA_BIND, replica_router
+from ratelimit import rate_limiter, parse_limits, client_ip, submitted_email, jwt_user
+import tasks  # registers the background tasks with the job queue
+from serializers import (
+    json_response, user_serializer, college_serializer, pending_college_serializer,
+    college_event_serializer, event_serializer, challenge_serializer,
+    college_stats_serializer, daily_stats_serializer, registration_serializer,
+    my_registration_serializer
+)
+
+api = Blueprint('api', __name__)
+jwt = JWTManager()
+cors = CORS()
 
-app = Flask(__name__)
+def default_config():
+    """Configuration read from the environment"""
+    return {
+        'SQLALCHEMY_DATABASE_URI': os.getenv('DATABASE_URL', 'sqlite:///eventify.db'),
+        'SQLALCHEMY_TRACK_MODIFICATIONS': False,
+        'JWT_SECRET_KEY': os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production'),
+        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(days=7),
+        'STRIPE_SECRET_KEY': os.getenv('STRIPE_SECRET_KEY', 'sk_test_your_stripe_secret_key'),
+        'STRIPE_WEBHOOK_SECRET': os.getenv('STRIPE_WEBHOOK_SECRET', ''),
+        'STRIPE_API_BASE': os.getenv('STRIPE_API_BASE', 'https://api.stripe.com'),
+        'EVENTS_PAGE_SIZE': int(os.getenv('EVENTS_PAGE_SIZE', 50)),
+        'EVENTS_MAX_PAGE_SIZE': int(os.getenv('EVENTS_MAX_PAGE_SIZE', 200)),
+        'CACHE_BACKEND': os.getenv('CACHE_BACKEND', 'memory'),
+        'CACHE_REDIS_URL': os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+        'CACHE_TTL': int(os.getenv('CACHE_TTL', 300)),
+        'IDENTITY_CACHE_TTL': int(os.getenv('IDENTITY_CACHE_TTL', 60)),
+        'PASSWORD_HASH_METHOD': os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'),
+        'PASSWORD_HASH_WORKERS': int(os.getenv('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)),
+        'BULK_REGISTRATION_MAX_ROWS': int(os.getenv('BULK_REGISTRATION_MAX_ROWS', 20000)),
+        'RATELIMIT_ENABLED': os.getenv('RATELIMIT_ENABLED', 'true').lower() == 'true',
+        'RATELIMIT_STORAGE': os.getenv('RATELIMIT_STORAGE', 'memory'),
+        'RATELIMITS': parse_limits(os.getenv('RATELIMITS', '')),
+        'METRICS_ENABLED': os.getenv('METRICS_ENABLED', 'true').lower() == 'true',
+        'COMPRESS_ENABLED': os.getenv('COMPRESS_ENABLED', 'true').lower() == 'true',
+        'COMPRESS_MIN_SIZE': int(os.getenv('COMPRESS_MIN_SIZE', 1024)),
+        'CATALOG_MAX_AGE': int(os.getenv('CATALOG_MAX_AGE', 60)),
+        'REPLICA_DATABASE_URL': os.getenv('REPLICA_DATABASE_URL', ''),
+        'REPLICA_MAX_LAG': float(os.getenv('REPLICA_MAX_LAG', 5)),
+        'REPLICA_STICKY_SECONDS': int(os.getenv('REPLICA_STICKY_SECONDS', 10)),
+        'LIVE_COUNTS_WINDOW': float(os.getenv('LIVE_COUNTS_WINDOW', 0.25)),
+        'LIVE_MAX_SUBSCRIBERS': int(os.getenv('LIVE_MAX_SUBSCRIBERS', 10000)),
+        'DEBUG_PROFILE_TOKEN': os.getenv('DEBUG_PROFILE_TOKEN', ''),
+        'ADMIN_EMAILS': {email.strip().lower() for email in os.getenv('ADMIN_EMAILS', '').split(',') if email.strip()},
+        'MAIL_SERVER': os.getenv('MAIL_SERVER', 'localhost'),
+        'MAIL_PORT': int(os.getenv('MAIL_PORT', 1025)),
+        'MAIL_USE_TLS': os.getenv('MAIL_USE_TLS', 'false').lower() == 'true',
+        'MAIL_USERNAME': os.getenv('MAIL_USERNAME', ''),
+        'MAIL_PASSWORD': os.getenv('MAIL_PASSWORD', ''),
+        'MAIL_SENDER': os.getenv('MAIL_SENDER', 'Eventify <no-reply@eventify.local>'),
+        'MEDIA_ROOT': os.getenv('MEDIA_ROOT', ''),
+        'MEDIA_URL': os.getenv('MEDIA_URL', '/media').rstrip('/'),
+        'IMAGE_MAX_BYTES': int(os.getenv('IMAGE_MAX_BYTES', 10 * 1024 * 1024)),
+        'IMAGE_MAX_PIXELS': int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000)),
+        'IMAGE_FETCH_TIMEOUT': int(os.getenv('IMAGE_FETCH_TIMEOUT', 10))
+    }
 
-# Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', 'sqlite:///eventify.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(days=7)
+# Overload errors skip the routes' catch-all handlers and become a fast 503
+OVERLOAD_ERRORS = (HasherBusy, PoolTimeout)
 
-# Initialize extensions
-db.init_app(app)
-jwt = JWTManager(app)
-CORS(app, origins=["http://localhost:8080", "http://localhost:5173"])
+@api.app_errorhandler(HasherBusy)
+def handle_hasher_busy(e):
+    response = jsonify({'error': str(e)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
-# Stripe configuration
-stripe.api_key = os.getenv('STRIPE_SECRET_KEY', 'sk_test_your_stripe_secret_key')
+@api.app_errorhandler(PoolTimeout)
+def handle_pool_timeout(e):
+    db.session.rollback()
+    response = jsonify({'error': 'Database is busy, try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
 
 # Authentication Routes
-@app.route('/api/auth/register', methods=['POST'])
+@api.route('/api/auth/register', methods=['POST'])
+@rate_limiter.limit('register', ip=client_ip)
 def register():
     try:
         data = request.get_json()
@@ -42,20 +124,18 @@ def register():
         db.session.add(user)
         db.session.commit()
         
-        access_token = create_access_token(identity=user.id)
-        return jsonify({
+        access_token = issue_token(user)
+        return json_response({
             'access_token': access_token,
-            'user': {
-                'id': user.id,
-                'email': user.email,
-                'username': user.username,
-                'college_id': user.college_id
-            }
+            'user': user_serializer.dump_instance(user)
         })
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/auth/login', methods=['POST'])
+@api.route('/api/auth/login', methods=['POST'])
+@rate_limiter.limit('login', ip=client_ip, email=submitted_email)
 def login():
     try:
         data = request.get_json()
@@ -64,207 +144,450 @@ def login():
         
         user = User.query.filter_by(email=email).first()
         if user and user.check_password(password):
-            access_token = create_access_token(identity=user.id)
-            return jsonify({
+            # Upgrade hashes made with an older algorithm or cost on the fly
+            if user.password_needs_rehash():
+                user.set_password(password)
+                db.session.commit()
+            access_token = issue_token(user)
+            return json_response({
                 'access_token': access_token,
-                'user': {
-                    'id': user.id,
-                    'email': user.email,
-                    'username': user.username,
-                    'college_id': user.college_id
-                }
+                'user': user_serializer.dump_instance(user)
             })
         
         return jsonify({'error': 'Invalid credentials'}), 401
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/auth/me', methods=['GET'])
+@api.route('/api/auth/me', methods=['GET'])
 @jwt_required()
 def get_current_user():
+    claims = get_jwt()
+    if 'username' in claims:
+        return json_response({
+            'id': claims['sub'],
+            'email': claims['email'],
+            'username': claims['username'],
+            'college_id': claims['college_id']
+        })
+
+    # Tokens issued before claims were embedded fall back to the identity cache
+    identity = identity_cache.get(get_jwt_identity())
+    if identity is None:
+        return jsonify({'error': 'User not found'}), 404
+    return json_response({key: identity[key] for key in user_serializer.keys})
+
+@api.route('/api/auth/logout', methods=['POST'])
+@jwt_required()
+def logout():
+    claims = get_jwt()
+    revoked_tokens.revoke(claims['jti'], claims['exp'])
+    return jsonify({'success': True})
+
+@api.route('/api/auth/logout-all', methods=['POST'])
+@jwt_required()
+def logout_everywhere():
+    """Revoke every token issued to the current user"""
     user_id = get_jwt_identity()
-    user = User.query.get(user_id)
-    return jsonify({
-        'id': user.id,
-        'email': user.email,
-        'username': user.username,
-        'college_id': user.college_id
-    })
+    User.query.filter(User.id == user_id).update(
+        {User.token_version: User.token_version + 1}, synchronize_session=False
+    )
+    db.session.commit()
+    identity_cache.invalidate(user_id)
+    return jsonify({'success': True})
 
 # College Routes
-@app.route('/api/colleges', methods=['GET'])
+@api.route('/api/colleges', methods=['GET'])
+@replica_router.reads
+@response_cache.cached()
 def get_colleges():
-    colleges = College.query.filter_by(approved=True).all()
-    return jsonify([{
-        'id': college.id,
-        'name': college.name,
-        'short_name': college.short_name,
-        'location': college.location,
-        'state': college.state,
-        'website': college.website,
-        'email': college.email,
-        'phone': college.phone,
-        'logo_url': college.logo_url,
-        'description': college.description,
-        'established_year': college.established_year,
-        'college_type': college.college_type,
-        'affiliation': college.affiliation
-    } for college in colleges])
-
-@app.route('/api/colleges/<int:college_id>', methods=['GET'])
+    colleges = college_serializer.query().filter(College.approved == True).yield_per(1000)
+    return college_serializer.stream_response(colleges)
+
+@api.route('/api/colleges/<int:college_id>', methods=['GET'])
+@replica_router.reads
+@response_cache.cached()
 def get_college(college_id):
-    college = College.query.get_or_404(college_id)
-    return jsonify({
-        'id': college.id,
-        'name': college.name,
-        'short_name': college.short_name,
-        'location': college.location,
-        'state': college.state,
-        'website': college.website,
-        'email': college.email,
-        'phone': college.phone,
-        'logo_url': college.logo_url,
-        'description': college.description,
-        'established_year': college.established_year,
-        'college_type': college.college_type,
-        'affiliation': college.affiliation
-    })
+    college = college_serializer.query().filter(College.id == college_id).first_or_404()
+    return college_serializer.response(college)
 
-@app.route('/api/colleges/<int:college_id>/events', methods=['GET'])
+@api.route('/api/colleges/<int:college_id>/events', methods=['GET'])
+@replica_router.reads
+@response_cache.cached('catalog', 'participants')
 def get_college_events(college_id):
-    events = Event.query.filter_by(college_id=college_id, approved=True).all()
-    return jsonify([{
-        'id': event.id,
-        'title': event.title,
-        'description': event.description,
-        'organizer': event.organizer,
-        'date': event.date,
-        'location': event.location,
-        'price': event.price,
-        'image': event.image,
-        'category': event.category,
-        'participants': event.participants,
-        'college_id': event.college_id
-    } for event in events])
+    events = college_event_serializer.query().filter(
+        Event.college_id == college_id, Event.approved == True
+    ).all()
+    return college_event_serializer.list_response(events)
+
+@api.route('/api/colleges/<int:college_id>/stats', methods=['GET'])
+@admin_required
+@response_cache.cached('catalog', 'participants')
+def get_college_stats(college_id):
+    """Dashboard totals plus registrations per day for the last ?days=N days,
+    read from the summary tables rather than aggregated per request"""
+    days = max(1, min(request.args.get('days', 30, type=int), 366))
+    stats = college_stats_serializer.query().filter(CollegeStats.college_id == college_id).first()
+    if stats is None:
+        if db.session.query(College.id).filter(College.id == college_id).first() is None:
+            return jsonify({'error': 'College not found'}), 404
+        data = {key: 0 for key in college_stats_serializer.keys}
+        data.update(college_id=college_id, revenue=0.0, updated_at=None)
+    else:
+        data = college_stats_serializer.dump(stats)
+
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily = daily_stats_serializer.query().filter(
+        CollegeDailyStats.college_id == college_id, CollegeDailyStats.day >= since
+    ).order_by(CollegeDailyStats.day)
+    data['registrations_per_day'] = daily_stats_serializer.dump_many(daily)
+    return json_response(data)
 
 # Events Routes (Updated with college integration)
-@app.route('/api/events', methods=['GET'])
+def event_listing_query():
+    """Select only the serialized event columns, with the college name joined in"""
+    return event_serializer.query(Event.created_at).outerjoin(College, Event.college_id == College.id)
+
+def encode_cursor(created_at, event_id):
+    """Encode the (created_at, id) keyset position of the last row on a page"""
+    raw = f"{created_at.isoformat()}|{event_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor, raising ValueError if malformed"""
+    padded = cursor + '=' * (-len(cursor) % 4)
+    try:
+        created_at, event_id = base64.urlsafe_b64decode(padded).decode().split('|')
+        return datetime.fromisoformat(created_at), int(event_id)
+    except Exception:
+        raise ValueError('Invalid cursor')
+
+def parse_date_arg(args, name):
+    """Return (datetime, date_only) for an ISO date or datetime argument"""
+    value = args.get(name)
+    if not value:
+        return None, False
+    try:
+        return datetime.fromisoformat(value), len(value) == 10
+    except ValueError:
+        raise ValueError(f'{name} must be an ISO date or datetime')
+
+def filter_dates(query, column, args, upcoming_since):
+    """Apply ?from=, ?to= (a bare date covers the whole day) and ?upcoming=true"""
+    start, _ = parse_date_arg(args, 'from')
+    if start:
+        query = query.filter(column >= start)
+
+    end, date_only = parse_date_arg(args, 'to')
+    if end and date_only:
+        query = query.filter(column < end + timedelta(days=1))
+    elif end:
+        query = query.filter(column <= end)
+
+    if args.get('upcoming') in ('1', 'true'):
+        query = query.filter(column >= upcoming_since)
+    return query
+
+def filter_events(query, args):
+    """Apply the optional /api/events filters from the query string"""
+    category = args.get('category')
+    if category:
+        query = query.filter(Event.category == category)
+
+    college_id = args.get('college_id', type=int)
+    if college_id is not None:
+        query = query.filter(Event.college_id == college_id)
+
+    min_price = args.get('min_price', type=float)
+    if min_price is not None:
+        query = query.filter(Event.price >= min_price)
+
+    max_price = args.get('max_price', type=float)
+    if max_price is not None:
+        query = query.filter(Event.price <= max_price)
+
+    # Events dated today still count as upcoming
+    today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+    return filter_dates(query, Event.date, args, today)
+
+@api.route('/api/events', methods=['GET'])
+@replica_router.reads
+@response_cache.cached('catalog', 'participants')
 def get_events():
-    events = Event.query.filter_by(approved=True).all()
-    return jsonify([{
-        'id': event.id,
-        'title': event.title,
-        'description': event.description,
-        'organizer': event.organizer,
-        'date': event.date,
-        'location': event.location,
-        'price': event.price,
-        'image': event.image,
-        'category': event.category,
-        'participants': event.participants,
-        'college_id': event.college_id,
-        'college_name': event.college.name if event.college else None
-    } for event in events])
-
-@app.route('/api/events/<int:event_id>', methods=['GET'])
+    """List approved events newest first, one keyset page at a time.
+
+    The cursor for the next page is returned in the X-Next-Cursor header
+    and is absent on the last page.
+    """
+    limit = request.args.get('limit', current_app.config['EVENTS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['EVENTS_MAX_PAGE_SIZE']))
+
+    try:
+        query = filter_events(event_listing_query().filter(Event.approved == True), request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            created_at, event_id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(tuple_(Event.created_at, Event.id) < (created_at, event_id))
+
+    # Fetch one extra row to know whether another page follows
+    events = query.order_by(Event.created_at.desc(), Event.id.desc()).limit(limit + 1).all()
+    has_more = len(events) > limit
+    events = events[:limit]
+
+    response = event_serializer.list_response(events)
+    if has_more:
+        last = events[-1]
+        response.headers['X-Next-Cursor'] = encode_cursor(last.created_at, last.id)
+    return response
+
+@api.route('/api/events/<int:event_id>', methods=['GET'])
+@replica_router.reads
 def get_event(event_id):
-    event = Event.query.get_or_404(event_id)
-    return jsonify({
-        'id': event.id,
-        'title': event.title,
-        'description': event.description,
-        'organizer': event.organizer,
-        'date': event.date,
-        'location': event.location,
-        'price': event.price,
-        'image': event.image,
-        'category': event.category,
-        'participants': event.participants,
-        'college_id': event.college_id,
-        'college_name': event.college.name if event.college else None
-    })
+    event = event_listing_query().filter(Event.id == event_id).first_or_404()
+    return event_serializer.response(event)
+
+@api.route('/api/events/stream', methods=['GET'])
+def stream_events():
+    """Server-sent events with [{id, participants}] for events whose count
+    changed, coalesced over LIVE_COUNTS_WINDOW"""
+    return live_counts.stream('event')
+
+@api.route('/api/events/<int:event_id>/stream', methods=['GET'])
+def stream_event(event_id):
+    """Like /api/events/stream for one event, starting with its current count"""
+    participants = db.session.query(Event.participants).filter(Event.id == event_id).scalar()
+    if participants is None:
+        return jsonify({'error': 'Event not found'}), 404
+    return live_counts.stream('event', event_id, initial={event_id: participants})
+
+@api.route('/api/challenges/stream', methods=['GET'])
+def stream_challenges():
+    return live_counts.stream('challenge')
 
 # Challenges Routes (Updated with college integration)
-@app.route('/api/challenges', methods=['GET'])
+def challenge_listing_query():
+    """Select only the serialized challenge columns, with the college name joined in"""
+    return challenge_serializer.query().outerjoin(College, Challenge.college_id == College.id)
+
+@api.route('/api/challenges', methods=['GET'])
+@replica_router.reads
+@response_cache.cached('catalog', 'participants')
 def get_challenges():
-    challenges = Challenge.query.filter_by(approved=True).all()
-    return jsonify([{
-        'id': challenge.id,
-        'title': challenge.title,
-        'description': challenge.description,
-        'shortDescription': challenge.short_description,
-        'category': challenge.category,
-        'deadline': challenge.deadline,
-        'participants': challenge.participants,
-        'status': challenge.status,
-        'rules': challenge.rules.split('|') if challenge.rules else [],
-        'prizes': challenge.prizes,
-        'price': challenge.price,
-        'college_id': challenge.college_id,
-        'college_name': challenge.college.name if challenge.college else None
-    } for challenge in challenges])
+    """List approved challenges; ?upcoming=true keeps those still open"""
+    try:
+        query = filter_dates(
+            challenge_listing_query().filter(Challenge.approved == True),
+            Challenge.deadline, request.args, datetime.utcnow()
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    challenges = query.yield_per(1000)
+    return challenge_serializer.stream_response(challenges)
+
+# Search Routes
+@api.route('/api/search', methods=['GET'])
+@replica_router.reads
+@response_cache.cached()
+def search_catalog():
+    """Ranked prefix search over approved events, challenges and colleges"""
+    terms = request.args.get('q', '')
+    kind = request.args.get('type')
+    if kind and kind not in ('event', 'challenge', 'college'):
+        return jsonify({'error': 'type must be event, challenge or college'}), 400
+    limit = max(1, min(request.args.get('limit', 20, type=int), 100))
+    offset = max(0, request.args.get('offset', 0, type=int))
+
+    try:
+        results = search(terms, kind=kind, limit=limit + 1, offset=offset)
+    except NotImplementedError as e:
+        return jsonify({'error': str(e)}), 501
+
+    response = jsonify(results[:limit])
+    if len(results) > limit:
+        response.headers['X-Next-Offset'] = str(offset + limit)
+    return response
 
 # Admin Routes (for managing colleges and approvals)
-@app.route('/api/admin/colleges/pending', methods=['GET'])
+@api.route('/api/admin/colleges/pending', methods=['GET'])
 @jwt_required()
 def get_pending_colleges():
-    colleges = College.query.filter_by(approved=False).all()
-    return jsonify([{
-        'id': college.id,
-        'name': college.name,
-        'short_name': college.short_name,
-        'location': college.location,
-        'state': college.state,
-        'created_at': college.created_at.isoformat()
-    } for college in colleges])
-
-@app.route('/api/admin/colleges/<int:college_id>/approve', methods=['POST'])
+    colleges = pending_college_serializer.query().filter(College.approved == False).all()
+    return pending_college_serializer.list_response(colleges)
+
+@api.route('/api/admin/colleges/<int:college_id>/approve', methods=['POST'])
 @jwt_required()
 def approve_college(college_id):
     college = College.query.get_or_404(college_id)
     college.approved = True
     db.session.commit()
+    response_cache.invalidate()
     return jsonify({'success': True})
 
-# Payment Routes (keep existing)
-@app.route('/api/payments/create-session', methods=['POST'])
+def approve_item(model, kind, item_id):
+    # Conditional update so a repeated approval is never counted twice
+    approved = model.query.filter(model.id == item_id, model.approved == False).update(
+        {model.approved: True}, synchronize_session=False
+    )
+    item = db.session.get(model, item_id)
+    if item is None:
+        return jsonify({'error': f'{kind.capitalize()} not found'}), 404
+    if approved:
+        record_approval(model, item.college_id)
+        index_row(db.session.connection(), kind, item)
+    db.session.commit()
+    response_cache.invalidate()
+    return jsonify({'success': True})
+
+@api.route('/api/admin/events/<int:event_id>/approve', methods=['POST'])
+@admin_required
+def approve_event(event_id):
+    return approve_item(Event, 'event', event_id)
+
+@api.route('/api/admin/challenges/<int:challenge_id>/approve', methods=['POST'])
+@admin_required
+def approve_challenge(challenge_id):
+    return approve_item(Challenge, 'challenge', challenge_id)
+
+def set_capacity(model, kind, item_id):
+    """Set or clear (null) an item's seat limit; raising it promotes the waitlist"""
+    data = request.get_json(silent=True) or {}
+    capacity = data.get('capacity')
+    if capacity is not None and (not isinstance(capacity, int) or isinstance(capacity, bool) or capacity < 0):
+        return jsonify({'error': 'capacity must be a non-negative integer or null'}), 400
+    item = db.session.get(model, item_id)
+    if item is None:
+        return jsonify({'error': f'{kind.capitalize()} not found'}), 404
+    # Lowering the limit below current participants keeps existing seats
+    model.query.filter(model.id == item_id).update({model.capacity: capacity}, synchronize_session=False)
+    promoted = promote_waitlist(model, item_id) if not item.price else []
+    db.session.commit()
+    # Capacity is shown in listings; promotions change the counts too
+    response_cache.invalidate('catalog', 'participants')
+    if promoted:
+        live_counts.touch(model, [item_id])
+    return jsonify({'success': True, 'capacity': capacity, 'promoted': len(promoted)})
+
+@api.route('/api/admin/events/<int:event_id>/capacity', methods=['PUT'])
+@admin_required
+def set_event_capacity(event_id):
+    return set_capacity(Event, 'event', event_id)
+
+@api.route('/api/admin/challenges/<int:challenge_id>/capacity', methods=['PUT'])
+@admin_required
+def set_challenge_capacity(challenge_id):
+    return set_capacity(Challenge, 'challenge', challenge_id)
+
+def replace_image(kind, item_id):
+    """Queue new variants from an uploaded file (multipart "file") or from
+    {"url": ...}; the item keeps its current image until they are ready"""
+    model, source_column, _ = IMAGE_OWNERS[kind]
+    if db.session.get(model, item_id) is None:
+        return jsonify({'error': f'{kind.capitalize()} not found'}), 404
+
+    upload = request.files.get('file')
+    if upload is not None:
+        try:
+            name = save_upload(upload.stream)
+        except ImageError as e:
+            return jsonify({'error': str(e)}), 413
+        enqueue('process_image', kind=kind, item_id=item_id, upload=name)
+    else:
+        url = (request.get_json(silent=True) or {}).get('url')
+        if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+            return jsonify({'error': 'Send a file or an http(s) url'}), 400
+        # Checked again by the worker on every fetch, redirects included
+        try:
+            check_public_url(url)
+        except ImageError as e:
+            return jsonify({'error': str(e)}), 400
+        model.query.filter(model.id == item_id).update({source_column: url}, synchronize_session=False)
+        enqueue('process_image', kind=kind, item_id=item_id)
+    db.session.commit()
+    return jsonify({'queued': True}), 202
+
+@api.route('/api/admin/events/<int:event_id>/image', methods=['POST'])
+@admin_required
+def replace_event_image(event_id):
+    return replace_image('event', event_id)
+
+@api.route('/api/admin/colleges/<int:college_id>/logo', methods=['POST'])
+@admin_required
+def replace_college_logo(college_id):
+    return replace_image('college', college_id)
+
+@api.route('/media/<path:filename>', methods=['GET'])
+def get_media(filename):
+    """Serve an image variant. Variant URLs are named by content hash, so
+    they are cached forever; in production let the web server or a CDN serve
+    MEDIA_ROOT at MEDIA_URL instead."""
+    if not VARIANT_PATH.fullmatch(filename):
+        abort(404)
+    response = send_from_directory(current_app.config['MEDIA_ROOT'], filename)
+    response.headers['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+@api.route('/api/admin/db/pool', methods=['GET'])
+@admin_required
+def get_db_pool_status():
+    return jsonify(pool_status(db.engine))
+
+# Payment Routes
+@api.route('/api/payments/create-session', methods=['POST'])
 @jwt_required()
 def create_payment_session():
     try:
+        user_id = get_jwt_identity()
         data = request.get_json()
         event_id = data.get('event_id')
         challenge_id = data.get('challenge_id')
         
         if event_id:
-            item = Event.query.get(event_id)
+            kind, item = 'event', db.session.get(Event, event_id)
             success_url = f"http://localhost:8080/registration-success/{event_id}"
         else:
-            item = Challenge.query.get(challenge_id)
+            kind, item = 'challenge', db.session.get(Challenge, challenge_id)
             success_url = f"http://localhost:8080/registration-success/{challenge_id}"
+        if item is None:
+            return jsonify({'error': 'Event not found'}), 404
+        column = Registration.event_id if kind == 'event' else Registration.challenge_id
+        if registered_pairs(column, [(user_id, item.id)]):
+            return jsonify({'error': 'Already registered'}), 409
+        # Advisory only: the seat is reserved when the payment is processed
+        if item.capacity is not None and item.participants >= item.capacity:
+            return jsonify({'error': 'Sold out'}), 409
         
-        session = stripe.checkout.Session.create(
-            payment_method_types=['card'],
-            line_items=[{
-                'price_data': {
-                    'currency': 'inr',
-                    'product_data': {
-                        'name': item.title,
-                    },
-                    'unit_amount': int(item.price * 100),
-                },
-                'quantity': 1,
-            }],
-            mode='payment',
-            success_url=success_url,
-            cancel_url='http://localhost:8080/events',
-        )
-        
-        return jsonify({'url': session.url})
+        url = stripe_gateway.checkout_url(user_id, kind, item, success_url, 'http://localhost:8080/events')
+        return jsonify({'url': url})
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/register-event', methods=['POST'])
+@api.route('/api/payments/webhook', methods=['POST'])
+def stripe_webhook():
+    """Record a Stripe event and leave finalizing it to the job queue"""
+    try:
+        event = stripe_gateway.construct_event(request.get_data(), request.headers.get('Stripe-Signature', ''))
+    except ValueError:
+        return jsonify({'error': 'Invalid payload'}), 400
+    except stripe_gateway.stripe.error.SignatureVerificationError:
+        return jsonify({'error': 'Invalid signature'}), 400
+
+    if record_payment_event(event):
+        enqueue_once('process_payments')
+        db.session.commit()
+    return jsonify({'received': True})
+
+@api.route('/api/register-event', methods=['POST'])
 @jwt_required()
+@rate_limiter.limit('register-event', ip=client_ip, user=jwt_user)
 def register_for_event():
     try:
         user_id = get_jwt_identity()
@@ -272,34 +595,368 @@ def register_for_event():
         event_id = data.get('event_id')
         challenge_id = data.get('challenge_id')
         
-        registration = Registration(
-            user_id=user_id,
-            event_id=event_id,
-            challenge_id=challenge_id,
-            payment_status='completed'
-        )
-        db.session.add(registration)
-        
-        if event_id:
-            event = Event.query.get(event_id)
-            event.participants += 1
-        else:
-            challenge = Challenge.query.get(challenge_id)
-            challenge.participants += 1
-            
+        model = Event if event_id else Challenge
+        item_id = event_id or challenge_id
+        column = Registration.event_id if event_id else Registration.challenge_id
+
+        item = db.session.query(model.price).filter(model.id == item_id).first()
+        if item is None:
+            return jsonify({'error': 'Event not found'}), 404
+
+        # Paid registrations are only created once Stripe confirms the payment
+        if item.price:
+            existing = find_registration(user_id, column, item_id)
+            if existing is None:
+                return jsonify({'error': 'Payment required, complete checkout first'}), 402
+            return registration_response(existing, created=False)
+
+        # A double submit hits the unique index and gets the first registration back
+        registration_id = insert_or_ignore(Registration, {
+            'user_id': user_id,
+            'event_id': event_id,
+            'challenge_id': challenge_id,
+            'payment_status': 'completed'
+        }, ['user_id', column.key], column.isnot(None))
+        if registration_id is None:
+            db.session.rollback()
+            return registration_response(find_registration(user_id, column, item_id), created=False)
+
+        # The seat is taken in the same transaction as the Registration insert;
+        # when none is left the user joins the waitlist instead
+        if not reserve_seats(model, item_id):
+            db.session.rollback()
+            entry_id, position, created = join_waitlist(user_id, model, item_id)
+            db.session.commit()
+            return jsonify({
+                'success': True,
+                'waitlisted': True,
+                'already_waitlisted': not created,
+                'waitlist_entry_id': entry_id,
+                'position': position
+            }), 202
+        leave_waitlist(user_id, model, item_id)
+        record_registrations(model, {item_id: 1})
+
+        # Queued in the same transaction, sent by the worker after the response
+        enqueue('send_registration_confirmation', registration_id=registration_id)
+
         db.session.commit()
-        return jsonify({'success': True})
+        response_cache.invalidate('participants')
+        live_counts.touch(model, [item_id])
+        return registration_response(find_registration(user_id, column, item_id), created=True)
+    except OVERLOAD_ERRORS:
+        raise
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-# Database initialization
-with app.app_context():
-    db.create_all()
-    
-    # Check if we need to seed data
-    if College.query.count() == 0:
-        print("No colleges found, seeding database...")
-        seed_all()
+def find_registration(user_id, column, item_id):
+    return registration_serializer.query().filter(
+        Registration.user_id == user_id, column == item_id
+    ).first()
+
+def registration_response(row, created):
+    return json_response({
+        'success': True,
+        'already_registered': not created,
+        'registration': registration_serializer.dump(row)
+    })
+
+@api.route('/api/me/registrations', methods=['GET'])
+@jwt_required()
+def get_my_registrations():
+    """The current user's registrations, newest first, one keyset page at a
+    time; the next page's cursor is returned in X-Next-Cursor"""
+    user_id = get_jwt_identity()
+    limit = request.args.get('limit', current_app.config['EVENTS_PAGE_SIZE'], type=int)
+    limit = max(1, min(limit, current_app.config['EVENTS_MAX_PAGE_SIZE']))
+
+    query = my_registration_serializer.query() \
+        .outerjoin(Event, Registration.event_id == Event.id) \
+        .outerjoin(Challenge, Registration.challenge_id == Challenge.id) \
+        .filter(Registration.user_id == user_id)
+
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            registered_at, registration_id = decode_cursor(cursor)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        query = query.filter(tuple_(Registration.registered_at, Registration.id) < (registered_at, registration_id))
+
+    rows = query.order_by(Registration.registered_at.desc(), Registration.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    response = my_registration_serializer.list_response(rows)
+    if has_more:
+        last = rows[-1]
+        response.headers['X-Next-Cursor'] = encode_cursor(last.registered_at, last.id)
+    return response
+
+@api.route('/api/me/registrations/<int:registration_id>', methods=['DELETE'])
+@jwt_required()
+def cancel_registration(registration_id):
+    """Cancel one of the current user's free registrations, handing the seat
+    to the head of the waitlist in the same transaction"""
+    registration = Registration.query.filter_by(id=registration_id, user_id=get_jwt_identity()).first()
+    if registration is None:
+        return jsonify({'error': 'Registration not found'}), 404
+    if registration.stripe_session_id:
+        return jsonify({'error': 'Paid registrations are cancelled by the organizer'}), 409
+
+    model = Event if registration.event_id else Challenge
+    item_id = registration.event_id or registration.challenge_id
+    # The DELETE is the claim, so a repeated cancel can't free the seat twice
+    if not Registration.query.filter_by(id=registration_id).delete(synchronize_session=False):
+        db.session.rollback()
+        return jsonify({'error': 'Registration not found'}), 404
+    release_seats(model, item_id)
+    record_registrations(model, {item_id: -1}, day=registration.registered_at.date())
+    promoted = promote_waitlist(model, item_id)
+    db.session.commit()
+    response_cache.invalidate('participants')
+    live_counts.touch(model, [item_id])
+    return jsonify({'success': True, 'promoted': len(promoted)})
+
+@api.route('/api/me/waitlist', methods=['GET'])
+@jwt_required()
+def get_my_waitlist():
+    """The current user's waitlist entries with their place in each queue"""
+    entries = WaitlistEntry.query.filter_by(user_id=get_jwt_identity()).order_by(WaitlistEntry.id).all()
+    results = []
+    for entry in entries:
+        model = Event if entry.event_id else Challenge
+        _, column = item_columns(model)
+        item_id = entry.event_id or entry.challenge_id
+        results.append({
+            'id': entry.id,
+            'event_id': entry.event_id,
+            'challenge_id': entry.challenge_id,
+            'position': waitlist_position(column, item_id, entry.id),
+            'created_at': entry.created_at.isoformat()
+        })
+    return jsonify(results)
+
+@api.route('/api/me/waitlist/<int:entry_id>', methods=['DELETE'])
+@jwt_required()
+def leave_waitlist_entry(entry_id):
+    removed = WaitlistEntry.query.filter_by(id=entry_id, user_id=get_jwt_identity()).delete(synchronize_session=False)
+    if not removed:
+        return jsonify({'error': 'Waitlist entry not found'}), 404
+    db.session.commit()
+    return jsonify({'success': True})
+
+def read_bulk_rows():
+    """Yield registration rows from a JSON array body or a streamed CSV body"""
+    if request.mimetype == 'text/csv':
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        yield from csv.DictReader(stream)
+    else:
+        rows = request.get_json()
+        if not isinstance(rows, list):
+            raise ValueError('Expected a JSON array of registrations')
+        yield from rows
+
+def parse_id(row, name):
+    """Read an optional integer id from a JSON or CSV row; only ints and digit
+    strings count, so 1.7 or true is an error rather than user 1"""
+    value = row.get(name)
+    if value is None or value == '':
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().isascii() and value.strip().isdigit():
+        return int(value)
+    raise ValueError(f'{name} must be an integer')
+
+def parse_email(row):
+    value = row.get('email')
+    if value is None or value == '':
+        return None
+    if not isinstance(value, str):
+        raise ValueError('email must be a string')
+    return value.strip() or None
+
+def query_in_chunks(query, column, values, chunk_size=500):
+    """Yield rows of query where column is in values, one IN query per chunk"""
+    values = list(values)
+    for i in range(0, len(values), chunk_size):
+        yield from query.filter(column.in_(values[i:i + chunk_size]))
+
+def existing_ids(column, ids):
+    """Return the subset of ids present in column"""
+    return {row[0] for row in query_in_chunks(db.session.query(column), column, ids)}
+
+@api.route('/api/register-event/bulk', methods=['POST'])
+@admin_required
+def bulk_register_for_events():
+    """Import a batch of walk-in registrations in one transaction.
+
+    Each row names a user (user_id or email) and exactly one free event_id or
+    challenge_id. Invalid rows are reported and skipped; valid rows are
+    inserted together and each counter is bumped once per event. Only
+    ADMIN_EMAILS may import, since rows name other users.
+    """
+    try:
+        max_rows = current_app.config['BULK_REGISTRATION_MAX_ROWS']
+        parsed = []
+        for row in read_bulk_rows():
+            if len(parsed) >= max_rows:
+                return jsonify({'error': f'Batch exceeds {max_rows} rows'}), 413
+            try:
+                if not isinstance(row, dict):
+                    raise ValueError('Row must be an object')
+                entry = {
+                    'user_id': parse_id(row, 'user_id'),
+                    'email': parse_email(row),
+                    'event_id': parse_id(row, 'event_id'),
+                    'challenge_id': parse_id(row, 'challenge_id')
+                }
+                if entry['user_id'] is None and entry['email'] is None:
+                    raise ValueError('user_id or email is required')
+                if (entry['event_id'] is None) == (entry['challenge_id'] is None):
+                    raise ValueError('Exactly one of event_id or challenge_id is required')
+                parsed.append((entry, None))
+            except (TypeError, ValueError) as e:
+                parsed.append((None, str(e)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    entries = [entry for entry, _ in parsed if entry]
+
+    # Resolve the whole batch with a handful of set-based queries
+    emails = {entry['email'] for entry in entries if entry['user_id'] is None}
+    user_ids_by_email = dict(query_in_chunks(db.session.query(User.email, User.id), User.email, emails))
+    known_users = existing_ids(User.id, {entry['user_id'] for entry in entries if entry['user_id']})
+    prices = {
+        'event': dict(query_in_chunks(db.session.query(Event.id, Event.price), Event.id,
+                                      {entry['event_id'] for entry in entries if entry['event_id']})),
+        'challenge': dict(query_in_chunks(db.session.query(Challenge.id, Challenge.price), Challenge.id,
+                                          {entry['challenge_id'] for entry in entries if entry['challenge_id']}))
+    }
+
+    results = []
+    candidates = []
+    for index, (entry, error) in enumerate(parsed):
+        if entry:
+            user_id = entry['user_id'] if entry['user_id'] is not None else user_ids_by_email.get(entry['email'])
+            kind = 'event' if entry['event_id'] else 'challenge'
+            if user_id is None or (entry['user_id'] is not None and user_id not in known_users):
+                error = 'User not found'
+            elif entry[f'{kind}_id'] not in prices[kind]:
+                error = f'{kind.capitalize()} not found'
+            elif prices[kind][entry[f'{kind}_id']]:
+                # Paid registrations are only created by the Stripe webhook
+                error = 'Payment required, register through checkout'
+
+        if error:
+            results.append({'row': index, 'success': False, 'error': error})
+            continue
+        candidates.append((index, user_id, entry))
+
+    # Pairs already registered, in the database or earlier in this batch, are skipped
+    registered = {
+        'event': registered_pairs(Registration.event_id, {
+            (user_id, entry['event_id']) for _, user_id, entry in candidates if entry['event_id']}),
+        'challenge': registered_pairs(Registration.challenge_id, {
+            (user_id, entry['challenge_id']) for _, user_id, entry in candidates if entry['challenge_id']})
+    }
+
+    accepted = []
+    wanted = {'event': Counter(), 'challenge': Counter()}
+    for index, user_id, entry in candidates:
+        kind = 'event' if entry['event_id'] else 'challenge'
+        pair = (user_id, entry[f'{kind}_id'])
+        if pair in registered[kind]:
+            results.append({'row': index, 'success': False, 'error': 'Already registered'})
+            continue
+        registered[kind].add(pair)
+        accepted.append((index, kind, entry[f'{kind}_id'], {
+            'user_id': user_id,
+            'event_id': entry['event_id'],
+            'challenge_id': entry['challenge_id'],
+            'payment_status': 'completed'
+        }))
+        wanted[kind][pair[1]] += 1
+
+    try:
+        # Seats go to rows in batch order; rows past an item's capacity are rejected
+        seats = {
+            'event': {item_id: reserve_up_to(Event, item_id, count) for item_id, count in sorted(wanted['event'].items())},
+            'challenge': {item_id: reserve_up_to(Challenge, item_id, count) for item_id, count in sorted(wanted['challenge'].items())}
+        }
+        mappings = []
+        event_counts = Counter()
+        challenge_counts = Counter()
+        for index, kind, item_id, mapping in accepted:
+            if not seats[kind][item_id]:
+                results.append({'row': index, 'success': False, 'error': 'Sold out'})
+                continue
+            seats[kind][item_id] -= 1
+            (event_counts if kind == 'event' else challenge_counts)[item_id] += 1
+            mappings.append(mapping)
+            results.append({'row': index, 'success': True})
+        results.sort(key=lambda result: result['row'])
+
+        if mappings:
+            db.session.bulk_insert_mappings(Registration, mappings)
+            record_registrations(Event, event_counts)
+            record_registrations(Challenge, challenge_counts)
+            db.session.commit()
+            response_cache.invalidate('participants')
+            live_counts.touch(Event, event_counts)
+            live_counts.touch(Challenge, challenge_counts)
+    except OVERLOAD_ERRORS:
+        raise
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({
+        'inserted': len(mappings),
+        'failed': len(results) - len(mappings),
+        'results': results
+    })
+
+def create_app(config=None):
+    """Build the Flask app. Startup does no database I/O; run
+    `flask eventify init-db` to create the schema and seed it."""
+    app = Flask(__name__)
+    app.config.from_mapping(default_config())
+    if config:
+        app.config.update(config)
+    app.config['MEDIA_ROOT'] = app.config['MEDIA_ROOT'] or os.path.join(app.instance_path, 'media')
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config['SQLALCHEMY_DATABASE_URI']))
+    replica_url = app.config.get('REPLICA_DATABASE_URL')
+    if replica_url:
+        app.config.setdefault('SQLALCHEMY_BINDS', {REPLICA_BIND: {'url': replica_url, **engine_options(replica_url)}})
+
+    # Initialize extensions
+    db.init_app(app)
+    jwt.init_app(app)
+    response_cache.init_app(app)
+    init_identity(app, jwt)
+    rate_limiter.init_app(app)
+    request_metrics.init_app(app)
+    # Registered after metrics so responses are compressed before their size is recorded
+    response_compression.init_app(app)
+    cache_policy.init_app(app)
+    replica_router.init_app(app)
+    live_counts.init_app(app)
+    password_hasher.init_app(app)
+    stripe_gateway.init_app(app)
+    cors.init_app(app, origins=["http://localhost:8080", "http://localhost:5173"], expose_headers=[
+        "X-Next-Cursor", "X-Next-Offset", "ETag", "Retry-After",
+        "RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset"
+    ])
+
+    app.register_blueprint(api)
+    app.cli.add_command(eventify_cli)
+    return app
 
 if __name__ == '__main__':
+    app = create_app()
+    with app.app_context():
+        init_db()
     app.run(debug=True, port=5000)
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Concurrent admission stress test for Eventify
+
+Creates one free event with a fixed capacity and many users, then has every
+user register at the same time (each one submitting --repeat times, like a
+double-clicked button). Afterwards it checks the invariants the admission
+engine promises:
+
+  * participants never exceeds capacity and equals the registration count
+  * every user holds exactly one registration or one waitlist entry
+  * cancelling registrations promotes the oldest waitlist entries, in order
+  * the college dashboard totals match the registration table
+
+Prints throughput and latency per phase and exits non-zero if any check
+fails. Point --database at PostgreSQL to exercise real row-level contention;
+with --url the requests go to a running server sharing that database and
+JWT_SECRET_KEY.
+
+Run from the backend directory:
+    python -m benchmarks.admission --users 2000 --capacity 150 --concurrency 64
+    python -m benchmarks.admission --database postgresql://localhost/eventify_stress --cancel 50
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import create_app
+from benchmarks.load import TestClientTarget, HttpTarget, percentile
+from commands import init_db
+from database import engine_options
+from identity import issue_token
+from models import db, User, College, Event, Registration, WaitlistEntry, CollegeStats
+
+def build_event(users, capacity):
+    """Create a college, one free event limited to capacity, and the users"""
+    suffix = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    college = College(name=f'Stress College {suffix}', short_name='SC', location='Test', state='Test', approved=True)
+    db.session.add(college)
+    db.session.flush()
+    event = Event(
+        title=f'Sold out fest {suffix}', description='Admission stress test', organizer='Benchmark',
+        date=datetime.utcnow() + timedelta(days=30), location='Main hall', price=0.0,
+        category='Technology', participants=0, capacity=capacity, college_id=college.id, approved=True
+    )
+    db.session.add(event)
+    db.session.flush()
+    db.session.execute(insert(User), [
+        {'email': f'stress-{suffix}-{i}@example.com', 'username': f'stress-{suffix}-{i}', 'password_hash': '!'}
+        for i in range(users)
+    ])
+    db.session.commit()
+    user_ids = [row[0] for row in db.session.query(User.id)
+                .filter(User.email.like(f'stress-{suffix}-%')).order_by(User.id)]
+    return event.id, college.id, user_ids
+
+def run_phase(label, target, calls, concurrency):
+    """Run (method, path, headers, body) calls concurrently; returns the
+    status of each call, in order, and prints a summary line"""
+    def one(call):
+        started = time.perf_counter()
+        status = target.request(*call)
+        return status, time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        outcomes = list(pool.map(one, calls))
+    elapsed = time.perf_counter() - started
+
+    statuses = {}
+    for status, _ in outcomes:
+        statuses[status] = statuses.get(status, 0) + 1
+    latencies = sorted(latency for _, latency in outcomes)
+    print(f"{label:<10} {len(latencies):6d} requests  {len(latencies) / elapsed:8.1f} req/s  "
+          f"p50 {percentile(latencies, 0.50) * 1000:6.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+          f"statuses {dict(sorted(statuses.items()))}")
+    return [status for status, _ in outcomes]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--capacity', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=2, help='Registration attempts per user.')
+    parser.add_argument('--cancel', type=int, default=25, help='Registrations to cancel afterwards.')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', help='SQLAlchemy URL or SQLite path; a temporary SQLite file by default.')
+    parser.add_argument('--url', help='Send requests to a running server instead of the in-process test client.')
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='eventify-admission-'), 'admission.db')
+    if '://' not in database:
+        database = 'sqlite:///' + os.path.abspath(database)
+    os.environ['DATABASE_URL'] = database
+
+    # In process, give every client thread its own connection so requests
+    # wait for locks instead of being shed with a 503 by the pool; SQLite
+    # doesn't queue writers fairly, so allow a long wait for its write lock
+    os.environ.setdefault('SQLITE_BUSY_TIMEOUT_MS', '60000')
+    app = create_app({
+        'RATELIMIT_ENABLED': False, 'METRICS_ENABLED': False, 'CACHE_BACKEND': 'none',
+        'SQLALCHEMY_ENGINE_OPTIONS': {**engine_options(database), 'pool_size': args.concurrency, 'max_overflow': 0}
+    })
+    with app.app_context():
+        init_db(seed=False)
+        event_id, college_id, user_ids = build_event(args.users, args.capacity)
+        tokens = {user_id: issue_token(db.session.get(User, user_id)) for user_id in user_ids}
+    target = HttpTarget(args.url) if args.url else TestClientTarget(app)
+    rng = random.Random(args.seed)
+
+    def auth(user_id):
+        return {'Authorization': f'Bearer {tokens[user_id]}'}
+
+    print(f"event {event_id}: capacity {args.capacity}, {args.users} users x {args.repeat} attempts, "
+          f"concurrency {args.concurrency}, {database.split('://')[0]}")
+
+    attempts = [user_id for user_id in user_ids for _ in range(args.repeat)]
+    rng.shuffle(attempts)
+    statuses = run_phase('register', target, [
+        ('POST', '/api/register-event', auth(user_id), {'event_id': event_id}) for user_id in attempts
+    ], args.concurrency)
+    # Requests shed with a 503 under overload never reached admission
+    answered = {user_id for user_id, status in zip(attempts, statuses) if status in (200, 202)}
+
+    failures = []
+
+    def check(condition, message):
+        print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            failures.append(message)
+
+    shed = sum(status not in (200, 202) for status in statuses)
+    check(not shed, f'every registration attempt was answered ({shed} failed or shed)')
+
+    def verify(expected_seats, departed=()):
+        db.session.expire_all()
+        participants = db.session.get(Event, event_id).participants
+        registered = [row[0] for row in db.session.query(Registration.user_id).filter(Registration.event_id == event_id)]
+        waitlisted = [row[0] for row in db.session.query(WaitlistEntry.user_id)
+                      .filter(WaitlistEntry.event_id == event_id).order_by(WaitlistEntry.id)]
+        stats = db.session.get(CollegeStats, college_id)
+        check(participants <= args.capacity, f'participants {participants} <= capacity {args.capacity}')
+        check(participants == len(registered) == expected_seats,
+              f'participants {participants} == registrations {len(registered)} == {expected_seats}')
+        check(len(set(registered)) == len(registered), 'no user registered twice')
+        check(set(registered) | set(waitlisted) == answered - set(departed)
+              and not set(registered) & set(waitlisted),
+              f'every user is registered or waitlisted exactly once ({len(waitlisted)} waiting)')
+        check(stats is not None and stats.registrations == len(registered) == stats.participants,
+              'college stats match the registration table')
+        return registered, waitlisted
+
+    with app.app_context():
+        registered, waitlisted = verify(min(args.capacity, len(answered)))
+
+        cancelled = rng.sample(registered, min(args.cancel, len(registered)))
+        registration_ids = dict(db.session.query(Registration.user_id, Registration.id).filter(
+            Registration.event_id == event_id, Registration.user_id.in_(cancelled)))
+
+    run_phase('cancel', target, [
+        ('DELETE', f'/api/me/registrations/{registration_ids[user_id]}', auth(user_id), None)
+        for user_id in cancelled
+    ], args.concurrency)
+
+    with app.app_context():
+        expected_promoted = waitlisted[:len(cancelled)]
+        now_registered, _ = verify(min(args.capacity, len(answered) - len(cancelled)), cancelled)
+        check(set(expected_promoted) <= set(now_registered), f'the first {len(expected_promoted)} waitlisted users were promoted')
+        check(not set(cancelled) & set(now_registered), 'cancelled users hold no seat')
+
+    print('PASSED' if not failures else f'FAILED: {len(failures)} checks')
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Live participant count stream test for Eventify
+
+Opens thousands of idle /api/events/stream subscribers, then registers users
+for a handful of events in bursts and measures how long it takes every
+subscriber to see every event's final count. Checks that:
+
+  * every subscriber stays connected while idle and receives the final count
+    of every event touched in each burst
+  * a burst is coalesced: the broadcaster reads the counts once per window,
+    however many subscribers are open (in-process server only)
+
+By default the app is served in-process by the threaded development server,
+which spends one thread per open stream. Point --url at a server running the
+async worker the guide recommends to measure that instead, e.g.
+    gunicorn -k gevent --worker-connections 10000 --workers 1 'app:create_app()'
+(the server must share --database and JWT_SECRET_KEY; one worker, or
+CACHE_BACKEND=redis, so the registrations reach the streaming process).
+
+Run from the backend directory:
+    python -m benchmarks.live --subscribers 2000 --rounds 5 --burst 200
+    python -m benchmarks.live --url http://localhost:5000 --database eventify.db --subscribers 5000
+"""
+
+import argparse
+import os
+import re
+import resource
+import selectors
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+
+from sqlalchemy import insert
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app
+from benchmarks.load import HttpTarget, percentile
+from commands import init_db
+from identity import issue_token
+from live import live_counts
+from models import db, User, College, Event
+
+MESSAGE = re.compile(rb'event: participants\ndata: (\[.*?\])\n\n')
+
+def build_catalog(events, users):
+    """Create a college with free, unlimited events and the users to register"""
+    suffix = datetime.utcnow().strftime('%Y%m%d%H%M%S%f')
+    college = College(name=f'Live College {suffix}', short_name='LC', location='Test', state='Test', approved=True)
+    db.session.add(college)
+    db.session.flush()
+    event_ids = []
+    for i in range(events):
+        event = Event(
+            title=f'Live fest {suffix} #{i}', description='Live count test', organizer='Benchmark',
+            date=datetime.utcnow() + timedelta(days=30), location='Main hall', price=0.0,
+            category='Technology', participants=0, college_id=college.id, approved=True
+        )
+        db.session.add(event)
+        db.session.flush()
+        event_ids.append(event.id)
+    db.session.execute(insert(User), [
+        {'email': f'live-{suffix}-{i}@example.com', 'username': f'live-{suffix}-{i}', 'password_hash': '!'}
+        for i in range(users)
+    ])
+    db.session.commit()
+    user_ids = [row[0] for row in db.session.query(User.id)
+                .filter(User.email.like(f'live-{suffix}-%')).order_by(User.id)]
+    return event_ids, user_ids
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+class Subscribers:
+    """Raw sockets held open on a stream, all read from one selector thread"""
+
+    def __init__(self, host, port, path, count):
+        self.selector = selectors.DefaultSelector()
+        self.buffers = {}
+        self.counts = {}  # socket -> {event id: latest participants}
+        self.seen_at = {}  # (socket, event id, participants) -> time received
+        self.ready = set()
+        self.closed = 0
+        self.lock = threading.Lock()
+        request = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nAccept: text/event-stream\r\n\r\n'.encode()
+        for _ in range(count):
+            sock = socket.create_connection((host, port))
+            sock.sendall(request)
+            sock.setblocking(False)
+            self.selector.register(sock, selectors.EVENT_READ)
+            self.buffers[sock] = b''
+            self.counts[sock] = {}
+        self.running = True
+        self.thread = threading.Thread(target=self.read, daemon=True)
+        self.thread.start()
+
+    def read(self):
+        while self.running:
+            for key, _ in self.selector.select(timeout=0.1):
+                sock = key.fileobj
+                try:
+                    data = sock.recv(65536)
+                except BlockingIOError:
+                    continue
+                if not data:
+                    self.selector.unregister(sock)
+                    self.closed += 1
+                    continue
+                now = time.perf_counter()
+                buffer = self.buffers[sock] + data
+                if sock not in self.ready and b'retry:' in buffer:
+                    self.ready.add(sock)
+                end = 0
+                for match in MESSAGE.finditer(buffer):
+                    end = match.end()
+                    for pair in re.finditer(rb'"id":(\d+),"participants":(\d+)', match.group(1)):
+                        item_id, participants = int(pair.group(1)), int(pair.group(2))
+                        with self.lock:
+                            self.counts[sock][item_id] = participants
+                            self.seen_at.setdefault((sock, item_id, participants), now)
+                self.buffers[sock] = buffer[end:] if end else buffer[-4096:]
+
+    def connected(self):
+        return len(self.ready) - self.closed
+
+    def wait_for(self, expected, timeout):
+        """When each subscriber first saw each expected {event id: count}, or
+        None if they haven't all seen them within timeout seconds"""
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            with self.lock:
+                if all(counts.get(item_id) == value for counts in self.counts.values()
+                       for item_id, value in expected.items()):
+                    return [self.seen_at[(sock, item_id, value)]
+                            for sock in self.counts for item_id, value in expected.items()]
+            time.sleep(0.01)
+        return None
+
+    def close(self):
+        self.running = False
+        self.thread.join()
+        for sock in self.buffers:
+            sock.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--subscribers', type=int, default=2000)
+    parser.add_argument('--events', type=int, default=5)
+    parser.add_argument('--rounds', type=int, default=5)
+    parser.add_argument('--burst', type=int, default=100, help='Registrations per round, spread over the events.')
+    parser.add_argument('--idle', type=float, default=2.0, help='Seconds to hold the subscribers idle first.')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--database', help='SQLAlchemy URL or SQLite path; a temporary SQLite file by default.')
+    parser.add_argument('--url', help='Stream from a running server instead of an in-process one.')
+    args = parser.parse_args()
+
+    database = args.database or os.path.join(tempfile.mkdtemp(prefix='eventify-live-'), 'live.db')
+    if '://' not in database:
+        database = 'sqlite:///' + os.path.abspath(database)
+    os.environ['DATABASE_URL'] = database
+
+    app = create_app({'RATELIMIT_ENABLED': False, 'METRICS_ENABLED': False, 'CACHE_BACKEND': 'none',
+                      'LIVE_MAX_SUBSCRIBERS': args.subscribers + 100})
+    with app.app_context():
+        init_db(seed=False)
+        event_ids, user_ids = build_catalog(args.events, args.rounds * args.burst)
+        tokens = {user_id: issue_token(db.session.get(User, user_id)) for user_id in user_ids}
+
+    server = None
+    if args.url:
+        base_url = args.url
+    else:
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        server.request_queue_size = 1024
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        base_url = f'http://127.0.0.1:{server.server_port}'
+    target = HttpTarget(base_url)
+    address = urlsplit(base_url)
+
+    print(f"{args.subscribers} subscribers, {args.events} events, {args.rounds} rounds x {args.burst} registrations, "
+          f"{'in-process threaded server' if server else base_url}")
+
+    started = time.perf_counter()
+    subscribers = Subscribers(address.hostname, address.port or 80, '/api/events/stream', args.subscribers)
+    while subscribers.connected() < args.subscribers and time.perf_counter() - started < 60:
+        time.sleep(0.05)
+    print(f"connected  {subscribers.connected()} in {time.perf_counter() - started:.2f} s")
+    time.sleep(args.idle)
+
+    failures = []
+
+    def check(condition, message):
+        print(f"  {'ok  ' if condition else 'FAIL'} {message}")
+        if not condition:
+            failures.append(message)
+
+    check(subscribers.connected() == args.subscribers and subscribers.closed == 0,
+          f'{args.subscribers} idle subscribers still open after {args.idle:.1f} s')
+
+    totals = dict.fromkeys(event_ids, 0)
+    reads_before = live_counts.reads
+    rounds_started = time.perf_counter()
+    latencies = []
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        for round_index in range(args.rounds):
+            burst = user_ids[round_index * args.burst:(round_index + 1) * args.burst]
+            calls = [(user_id, event_ids[i % len(event_ids)]) for i, user_id in enumerate(burst)]
+            statuses = list(pool.map(lambda call: target.request(
+                'POST', '/api/register-event', {'Authorization': f'Bearer {tokens[call[0]]}'}, {'event_id': call[1]}
+            ), calls))
+            finished = time.perf_counter()
+            for (_, event_id), status in zip(calls, statuses):
+                totals[event_id] += status == 200
+            seen = subscribers.wait_for(totals, timeout=10)
+            if seen is None:
+                check(False, f'round {round_index + 1}: every subscriber saw the final counts')
+                continue
+            delays = sorted(max(0.0, at - finished) for at in seen)
+            latencies.extend(delays)
+            print(f"round {round_index + 1}   {sum(status == 200 for status in statuses):5d} registered  "
+                  f"delivered to all in {delays[-1] * 1000:7.1f} ms  p50 {percentile(delays, 0.5) * 1000:6.1f} ms")
+
+    if latencies:
+        latencies.sort()
+        print(f"delivery   p50 {percentile(latencies, 0.5) * 1000:6.1f} ms  p99 {percentile(latencies, 0.99) * 1000:7.1f} ms  "
+              f"max {latencies[-1] * 1000:7.1f} ms after the burst finished")
+    check(len(latencies) == args.rounds * args.subscribers * args.events, 'every round reached every subscriber')
+    if server:
+        # At most one query per coalescing window, independent of subscribers
+        windows = (time.perf_counter() - rounds_started) / app.config['LIVE_COUNTS_WINDOW'] + args.rounds
+        reads = live_counts.reads - reads_before
+        check(reads <= windows,
+              f'{reads} count queries for {args.rounds} rounds and {args.subscribers} subscribers (at most {windows:.0f} windows)')
+        print(f"max RSS    {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB (client and server)")
+
+    subscribers.close()
+    if server:
+        server.shutdown()
+    print('PASSED' if not failures else f'FAILED: {len(failures)} checks')
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
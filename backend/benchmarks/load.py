@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+"""
+Load benchmark for Eventify against a synthetic catalog
+
+Builds a reproducible dataset on top of seed_data.py (colleges, events,
+challenges, users and registrations at the requested scale), then drives
+every main endpoint with concurrent clients and reports throughput,
+p50/p95/p99 latency, error counts and SQL statements per request. In process,
+statements are counted by an engine listener over the whole response,
+including rows fetched while a list streams. Against a running server
+(--url) they are read from the app's /metrics endpoint, which stops
+counting once a response starts streaming, so those endpoints show "-".
+
+Results are written as JSON; pass an earlier file with --compare to flag
+p95 regressions (exits non-zero when any endpoint is slower than the
+threshold allows).
+
+Run from the backend directory:
+    python -m benchmarks.load --colleges 10000 --events 500000 --registrations 5000000 \\
+        --database /tmp/eventify-bench.db --output results.json
+    python -m benchmarks.load --database /tmp/eventify-bench.db --reuse --compare results.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, insert
+
+from app import create_app
+from commands import init_db
+from identity import issue_token
+from models import db, User, College, Event, Challenge, Registration
+from passwords import password_hasher
+from search import rebuild_search_index
+from seed_data import seed_all
+from stats import rebuild_college_stats
+
+CATEGORIES = ('Technology', 'Cultural', 'Sports', 'Business', 'Arts', 'Science')
+STATES = ('Delhi', 'Maharashtra', 'Karnataka', 'Tamil Nadu', 'Kerala', 'Gujarat', 'West Bengal')
+WORDS = ('summit', 'hackathon', 'fest', 'workshop', 'conclave', 'expo', 'league', 'symposium')
+PASSWORD = 'benchmark-password'
+ADMIN_EMAIL = 'bench0@example.com'
+CHUNK = 10000
+
+def next_id(model):
+    return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+def insert_rows(model, rows):
+    """Insert generated rows in CHUNK-sized executemany batches"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= CHUNK:
+            db.session.execute(insert(model), batch)
+            db.session.commit()
+            batch = []
+    if batch:
+        db.session.execute(insert(model), batch)
+        db.session.commit()
+
+def build_dataset(args):
+    """Seed the sample data, then add synthetic rows at the requested scale"""
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    phase = time.perf_counter()
+
+    def done(label):
+        nonlocal phase
+        print(f"  {label:<24} {time.perf_counter() - phase:7.1f} s", flush=True)
+        phase = time.perf_counter()
+
+    seed_all()
+    done('seed data')
+
+    first_college = next_id(College)
+    insert_rows(College, ({
+        'id': first_college + i,
+        'name': f'Synthetic College {i}',
+        'short_name': f'SC{i}',
+        'location': f'Campus {i % 97}',
+        'state': rng.choice(STATES),
+        'college_type': rng.choice(('Engineering', 'Medical', 'Arts', 'Science')),
+        'approved': rng.random() < 0.95,
+        'created_at': now - timedelta(days=rng.randint(0, 3650))
+    } for i in range(args.colleges)))
+    college_ids = list(range(first_college, first_college + args.colleges)) or [1]
+    done('colleges')
+
+    # Every user shares one hash so login can be benchmarked with a known password
+    password_hash = password_hasher.hash(PASSWORD)
+    first_user = next_id(User)
+    insert_rows(User, ({
+        'id': first_user + i,
+        'email': f'bench{i}@example.com',
+        'username': f'bench{i}',
+        'password_hash': password_hash,
+        'college_id': rng.choice(college_ids),
+        'token_version': 0
+    } for i in range(args.users)))
+    user_ids = range(first_user, first_user + args.users)
+    done('users')
+
+    first_challenge = next_id(Challenge)
+    insert_rows(Challenge, ({
+        'id': first_challenge + i,
+        'title': f'{rng.choice(WORDS).title()} Challenge {i}',
+        'description': 'A synthetic challenge used for load testing. ' * 3,
+        'short_description': 'Synthetic challenge',
+        'category': rng.choice(CATEGORIES),
+        'deadline': now + timedelta(days=rng.randint(-180, 365)),
+        'participants': 0,
+        'rules': 'Be kind|Submit on time',
+        'prizes': 'INR 10,000',
+        'price': 0.0,
+        'college_id': rng.choice(college_ids),
+        'approved': rng.random() < 0.9,
+        'created_at': now - timedelta(seconds=rng.randint(0, 86400 * 365))
+    } for i in range(args.challenges)))
+    done('challenges')
+
+    # Registrations are generated alongside their event so participants match
+    per_event = args.registrations / max(args.events, 1)
+    remaining = args.registrations
+    first_event = next_id(Event)
+    registrations = []
+
+    def events():
+        nonlocal remaining
+        for i in range(args.events):
+            count = min(remaining, rng.randint(0, int(2 * per_event)), len(user_ids))
+            remaining -= count
+            event_id = first_event + i
+            registered_at = now - timedelta(seconds=rng.randint(0, 86400 * 90))
+            registrations.extend({
+                'user_id': user_id,
+                'event_id': event_id,
+                'payment_status': 'completed',
+                'registered_at': registered_at
+            } for user_id in rng.sample(user_ids, count))
+            yield {
+                'id': event_id,
+                'title': f'{rng.choice(WORDS).title()} {rng.choice(CATEGORIES)} {i}',
+                'description': 'A synthetic event used for load testing. ' * 3,
+                'organizer': f'Society {i % 500}',
+                'date': now + timedelta(days=rng.randint(-365, 365)),
+                'location': f'Hall {i % 40}',
+                # A fifth of events are free so /api/register-event can be exercised
+                'price': 0.0 if i % 5 == 0 else float(rng.randint(1, 50) * 100),
+                'image': None,
+                'category': rng.choice(CATEGORIES),
+                'participants': count,
+                'college_id': rng.choice(college_ids),
+                'approved': rng.random() < 0.9,
+                'created_at': now - timedelta(seconds=rng.randint(0, 86400 * 365))
+            }
+
+    batch = []
+    for event in events():
+        batch.append(event)
+        if len(batch) >= CHUNK:
+            insert_rows(Event, batch)
+            insert_rows(Registration, registrations)
+            batch = []
+            registrations.clear()
+    insert_rows(Event, batch)
+    insert_rows(Registration, registrations)
+    done('events + registrations')
+
+    rebuild_search_index()
+    done('search index')
+    rebuild_college_stats()
+    done('college stats')
+
+class TestClientTarget:
+    """Sends requests through Flask test clients, one per thread, counting
+    every statement the app's engines run"""
+
+    streamed = 0  # every statement is counted, streamed or not
+
+    def __init__(self, app):
+        self.app = app
+        self.local = threading.local()
+        self.count = 0
+        self.lock = threading.Lock()
+        with app.app_context():
+            for engine in {id(e): e for e in db.engines.values()}.values():
+                event.listen(engine, 'before_cursor_execute', self.on_execute)
+
+    def on_execute(self, *args):
+        with self.lock:
+            self.count += 1
+
+    def statements(self, route):
+        return self.count
+
+    def request(self, method, path, headers=None, body=None):
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        response = client.open(path, method=method, headers=headers, json=body)
+        response.get_data()
+        return response.status_code
+
+class HttpTarget:
+    """Sends requests to a running server"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.streamed = 0
+
+    def request(self, method, path, headers=None, body=None):
+        data = json.dumps(body).encode() if body is not None else None
+        headers = dict(headers or {}, **({'Content-Type': 'application/json'} if data else {}))
+        req = urllib.request.Request(self.base_url + path, data=data, method=method, headers=headers)
+        try:
+            with urllib.request.urlopen(req, timeout=30) as response:
+                response.read()
+                if response.headers.get('Content-Length') is None:
+                    self.streamed += 1
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+
+    def text(self, path):
+        with urllib.request.urlopen(self.base_url + path, timeout=30) as response:
+            return response.read().decode()
+
+    def statements(self, route):
+        """Statements /metrics has recorded for route"""
+        pattern = re.compile(r'eventify_db_statements_per_request_sum\{route="([^"]*)"\} (\S+)')
+        return sum(float(value) for name, value in pattern.findall(self.text('/metrics')) if name == route)
+
+def percentile(sorted_values, fraction):
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def run_scenario(target, scenario, requests, concurrency):
+    route, make_request = scenario
+    before = target.statements(route)
+    streamed = target.streamed
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        method, path, headers, body = make_request(i)
+        started = time.perf_counter()
+        status = target.request(method, path, headers, body)
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            errors += status >= 400
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    # /metrics doesn't see SQL run while a response streams
+    after = target.statements(route) if target.streamed == streamed else None
+    latencies.sort()
+    return {
+        'route': route,
+        'requests': requests,
+        'errors': errors,
+        'throughput_rps': round(requests / wall, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 2),
+        'queries_per_request': round((after - before) / requests, 2) if after is not None else None
+    }
+
+def build_scenarios(app, seed):
+    """Endpoint name -> (route template, function(i) -> (method, path, headers, body))"""
+    rng = random.Random(seed)
+    with app.app_context():
+        max_event = db.session.query(func.max(Event.id)).scalar() or 1
+        max_college = db.session.query(func.max(College.id)).scalar() or 1
+        free_events = [row[0] for row in db.session.query(Event.id).filter(
+            Event.price == 0, Event.approved == True).limit(5000)]
+        users = db.session.query(User).filter(User.email.like('bench%')).limit(200).all()
+        tokens = [issue_token(user) for user in users]
+        login_emails = [user.email for user in users]
+    # Vary registrations between runs so a reused dataset doesn't repeat pairs
+    offset = int(time.time())
+    auth = [{'Authorization': f'Bearer {token}'} for token in tokens] or [{}]
+    admin = auth[login_emails.index(ADMIN_EMAIL)] if ADMIN_EMAIL in login_emails else {}
+    terms = WORDS + CATEGORIES
+
+    def get(path_for):
+        return lambda i: ('GET', path_for(i), None, None)
+
+    return {
+        'events_first_page': ('/api/events', get(lambda i: '/api/events')),
+        'events_by_category': ('/api/events', get(lambda i: f'/api/events?category={CATEGORIES[i % len(CATEGORIES)]}')),
+        'events_upcoming': ('/api/events', get(lambda i: f'/api/events?upcoming=true&limit={20 + i % 30}')),
+        'event_detail': ('/api/events/<int:event_id>', get(lambda i: f'/api/events/{rng.randint(1, max_event)}')),
+        'challenges': ('/api/challenges', get(lambda i: '/api/challenges?upcoming=true')),
+        'colleges': ('/api/colleges', get(lambda i: '/api/colleges')),
+        'college_detail': ('/api/colleges/<int:college_id>', get(lambda i: f'/api/colleges/{rng.randint(1, max_college)}')),
+        'college_events': ('/api/colleges/<int:college_id>/events', get(lambda i: f'/api/colleges/{rng.randint(1, max_college)}/events')),
+        'college_stats': ('/api/colleges/<int:college_id>/stats', lambda i: (
+            'GET', f'/api/colleges/{rng.randint(1, max_college)}/stats', admin, None)),
+        'my_registrations': ('/api/me/registrations', lambda i: (
+            'GET', '/api/me/registrations', auth[i % len(auth)], None)),
+        'search': ('/api/search', get(lambda i: f'/api/search?q={terms[i % len(terms)]}')),
+        'register_event': ('/api/register-event', lambda i: (
+            'POST', '/api/register-event', auth[i % len(auth)],
+            {'event_id': free_events[(i + offset) % len(free_events)] if free_events else 1})),
+        'login': ('/api/auth/login', lambda i: (
+            'POST', '/api/auth/login', None,
+            {'email': login_emails[i % len(login_emails)] if login_emails else 'nobody@example.com',
+             'password': PASSWORD})),
+    }
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(results, baseline_path, threshold):
+    """Print deltas against a previous run; returns the endpoints that regressed"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+    regressed = []
+    print(f"\n{'endpoint':<22} {'p95 before':>11} {'p95 now':>9} {'change':>8}")
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous['p95_ms']:
+            continue
+        change = result['p95_ms'] / previous['p95_ms'] - 1
+        flag = '  REGRESSION' if change > threshold else ''
+        print(f"{name:<22} {previous['p95_ms']:>9.1f}ms {result['p95_ms']:>7.1f}ms {change:>+7.0%}{flag}")
+        if flag:
+            regressed.append(name)
+    return regressed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--colleges', type=int, default=1000)
+    parser.add_argument('--events', type=int, default=20000)
+    parser.add_argument('--challenges', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--registrations', type=int, default=200000)
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the dataset and request mix.')
+    parser.add_argument('--database', help='SQLAlchemy URL or SQLite path; a temporary SQLite file by default.')
+    parser.add_argument('--reuse', action='store_true', help='Use an existing dataset instead of generating one.')
+    parser.add_argument('--url', help='Benchmark a running server instead of the in-process test client.')
+    parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--endpoints', help='Comma-separated subset of endpoints to run.')
+    parser.add_argument('--cache', action='store_true', help='Leave the response cache on.')
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--compare', help='Earlier results file to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p95 slowdown before flagging, e.g. 0.2 = 20%%.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        database = args.database or os.path.join(directory, 'bench.db')
+        uri = database if '://' in database else 'sqlite:///' + os.path.abspath(database)
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': uri,
+            'CACHE_BACKEND': 'memory' if args.cache else 'none',
+            'RATELIMIT_ENABLED': False,
+            'PASSWORD_HASH_WORKERS': 0,
+            # College stats are admin-only; a server under --url needs the same
+            'ADMIN_EMAILS': {ADMIN_EMAIL}
+        })
+
+        with app.app_context():
+            init_db(seed=False)
+            if not args.reuse:
+                print('building dataset:')
+                build_dataset(args)
+            counts = {model.__tablename__: db.session.query(func.count(model.id)).scalar()
+                      for model in (College, Event, Challenge, User, Registration)}
+            print('dataset: ' + ', '.join(f'{count} {table}' for table, count in counts.items()))
+
+        target = HttpTarget(args.url) if args.url else TestClientTarget(app)
+        scenarios = build_scenarios(app, args.seed)
+        if args.endpoints:
+            scenarios = {name: scenarios[name] for name in args.endpoints.split(',')}
+
+        results = {}
+        print(f"\n{'endpoint':<22} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'queries':>8} {'errors':>7}")
+        for name, scenario in scenarios.items():
+            result = results[name] = run_scenario(target, scenario, args.requests, args.concurrency)
+            queries = result['queries_per_request']
+            print(f"{name:<22} {result['throughput_rps']:>8.1f} {result['p50_ms']:>6.1f}ms "
+                  f"{result['p95_ms']:>6.1f}ms {result['p99_ms']:>6.1f}ms "
+                  f"{'-' if queries is None else queries:>8} {result['errors']:>7}")
+
+        with app.app_context():
+            db.engine.dispose()
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'meta': {
+                'timestamp': datetime.utcnow().isoformat(),
+                'git_revision': git_revision(),
+                'python': platform.python_version(),
+                'database': 'external' if args.database and '://' in args.database else 'sqlite',
+                'target': args.url or 'test-client',
+                'dataset': counts,
+                'requests': args.requests,
+                'concurrency': args.concurrency,
+                'cache': args.cache,
+                'seed': args.seed
+            },
+            'results': results
+        }, f, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Password hashing benchmark for Eventify
+
+Measures password checks per second per core, first with PBKDF2 on the calling
+threads (the old inline behaviour) and then through the process-pool hasher
+with the configured method.
+
+Run from the backend directory:
+    python -m benchmarks.passwords --threads 16 --seconds 5
+"""
+
+import argparse
+import os
+import threading
+import time
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+from passwords import PasswordHasher
+
+def run(check, threads, seconds):
+    """Call check() from many threads for a fixed time and return calls/sec"""
+    count = 0
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def worker():
+        nonlocal count
+        done = 0
+        while time.perf_counter() < deadline:
+            check()
+            done += 1
+        with lock:
+            count += done
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    started = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return count / (time.perf_counter() - started)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--method', default=os.getenv('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1'))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    cores = os.cpu_count() or 1
+
+    legacy_hash = generate_password_hash('correct horse', 'pbkdf2:sha256')
+    before = run(lambda: check_password_hash(legacy_hash, 'correct horse'), args.threads, args.seconds)
+
+    hasher = PasswordHasher()
+    hasher.configure(method=args.method, workers=args.workers,
+                     max_pending=args.threads, queue_timeout=60)
+    new_hash = hasher.hash('correct horse')
+    after = run(lambda: hasher.verify(new_hash, 'correct horse'), args.threads, args.seconds)
+    hasher.shutdown()
+
+    print(f"cores: {cores}, client threads: {args.threads}")
+    print(f"before (inline pbkdf2:sha256): {before:.1f} logins/s, {before / cores:.1f} per core")
+    print(f"after  ({hasher.method}, {args.workers} workers): {after:.1f} logins/s, {after / cores:.1f} per core")
+
+if __name__ == '__main__':
+    main()
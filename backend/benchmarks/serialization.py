@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Serialization throughput benchmark for Eventify
+
+Builds a throwaway SQLite catalog (50k approved events by default) and
+compares the old approach, hydrating Event objects and building dicts
+field by field for jsonify, with the row-tuple serializers and fast encoder
+used by the API today.
+
+Run from the backend directory:
+    python -m benchmarks.serialization --events 50000
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+
+from flask import jsonify
+
+from app import create_app
+from commands import init_db
+from models import db, College, Event
+from serializers import event_serializer, dumps, orjson
+
+def build_catalog(events):
+    college = College(name='Benchmark Institute', short_name='BI', location='Pune',
+                      state='Maharashtra', approved=True)
+    db.session.add(college)
+    db.session.flush()
+    db.session.bulk_insert_mappings(Event, [{
+        'title': f'Event {i}',
+        'description': 'A long enough description to look like real event copy. ' * 3,
+        'organizer': 'Benchmark Society',
+        'date': datetime(2024, 3, 15),
+        'location': 'Main Auditorium',
+        'price': float(i % 5000),
+        'image': 'https://images.unsplash.com/photo-1540575467063-178a50c2df87',
+        'category': 'Technology',
+        'participants': i % 300,
+        'college_id': college.id,
+        'approved': True
+    } for i in range(events)])
+    db.session.commit()
+
+def legacy():
+    events = Event.query.filter_by(approved=True).all()
+    return jsonify([{
+        'id': event.id,
+        'title': event.title,
+        'description': event.description,
+        'organizer': event.organizer,
+        'date': event.date.isoformat(),
+        'location': event.location,
+        'price': event.price,
+        'image': event.image,
+        'category': event.category,
+        'participants': event.participants,
+        'college_id': event.college_id,
+        'college_name': event.college.name if event.college else None
+    } for event in events]).get_data()
+
+def current():
+    rows = event_serializer.query().outerjoin(College, Event.college_id == College.id).filter(Event.approved == True).all()
+    return dumps(event_serializer.dump_many(rows))
+
+def measure(func):
+    db.session.expire_all()
+    started = time.perf_counter()
+    body = func()
+    elapsed = time.perf_counter() - started
+    db.session.rollback()
+    return elapsed, len(body)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--events', type=int, default=50000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite:///' + os.path.join(directory, 'bench.db')})
+        with app.app_context():
+            init_db(seed=False)
+            build_catalog(args.events)
+
+            print(f"catalog: {args.events} events, encoder: {'orjson' if orjson else 'json (stdlib)'}")
+            for name, func in (('ORM objects + jsonify', legacy), ('row tuples + serializer', current)):
+                elapsed, size = measure(func)
+                print(f"{name:<26} {elapsed * 1000:8.1f} ms  {args.events / elapsed:10.0f} rows/s  {size / 1024:8.0f} KiB")
+            db.engine.dispose()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for Eventify
+
+Starts fresh interpreters that import the app and call create_app(), the same
+work a Gunicorn worker does at boot, and reports the median time. Each run also
+checks that boot opened no database connections and did not import stripe.
+Exits non-zero if the median misses the target.
+
+Run from the backend directory:
+    python -m benchmarks.startup --runs 10 --target-ms 750
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+app = create_app()
+elapsed = time.perf_counter() - started
+from database import pool_metrics
+print(json.dumps({
+    'seconds': elapsed,
+    'db_checkouts': pool_metrics.snapshot()['checkouts'],
+    'stripe_imported': 'stripe' in sys.modules
+}))
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--target-ms', type=float, default=750)
+    args = parser.parse_args()
+
+    samples = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, '-c', PROBE], capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    median_ms = statistics.median(sample['seconds'] for sample in samples) * 1000
+    db_checkouts = max(sample['db_checkouts'] for sample in samples)
+    stripe_imported = any(sample['stripe_imported'] for sample in samples)
+
+    print(f"create_app cold start: median {median_ms:.1f} ms over {args.runs} runs (target {args.target_ms:.0f} ms)")
+    print(f"database checkouts during boot: {db_checkouts}")
+    print(f"stripe imported during boot: {stripe_imported}")
+
+    if median_ms > args.target_ms or db_checkouts or stripe_imported:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
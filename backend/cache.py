@@ -0,0 +1,262 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, g, request, make_response
+
+from compression import COMPRESSIBLE_TYPES, add_vary, response_compression
+
+class LRUCache:
+    """In-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, max_entries=1024, default_ttl=300):
+        self.max_entries = max_entries
+        self.default_ttl = default_ttl
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (ttl or self.default_ttl)
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def get_version(self, name):
+        with self._lock:
+            return self._versions.get(name, 0)
+
+    def bump_version(self, name):
+        # Versions live outside the LRU so they are never evicted
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+            return self._versions[name]
+
+class RedisCache:
+    """Cache backend for any client exposing the redis-py get/set/incr API"""
+
+    def __init__(self, client, default_ttl=300, prefix='eventify:'):
+        self.client = client
+        self.default_ttl = default_ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self.prefix + key, value, ex=ttl or self.default_ttl)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def get_version(self, name):
+        value = self.client.get(self.prefix + 'version:' + name)
+        return int(value) if value else 0
+
+    def bump_version(self, name):
+        return int(self.client.incr(self.prefix + 'version:' + name))
+
+class ResponseCache:
+    """Read-through cache for GET responses, keyed by resource versions.
+
+    Cached routes get a strong ETag and answer If-None-Match with a bare 304.
+    Each route names the resources its response shows (RESOURCES), and writes
+    call invalidate() with the resources they change. That bumps those
+    versions, so only the entries built from them stop being addressed and
+    age out on their own: a registration refreshes the listings that show
+    participant counts but leaves colleges and search cached. Compressed
+    bodies are cached next to the plain one, one entry per encoding, so a hot
+    response is compressed once per version.
+
+    Versions live in the backend, so with the in-process memory backend an
+    invalidate() from the worker or a CLI command only reaches that process;
+    use the redis backend when those write to the catalog.
+
+    With a read replica (see replicas.py) requests pinned to the primary after
+    a write set g.skip_response_cache and bypass the cache. Responses built
+    on the replica (g.read_replica) may predate the latest invalidate(), so
+    they are cached under their own keys for at most REPLICA_MAX_LAG seconds
+    and never served to requests reading from the primary.
+    """
+
+    # Response headers that are part of the payload and must be replayed
+    replay_headers = ('X-Next-Cursor', 'X-Next-Offset')
+
+    def __init__(self, app=None, backend=None):
+        self.backend = backend
+        self._fixed_backend = backend is not None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'memory')
+        app.config.setdefault('CACHE_TTL', 300)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        if not self._fixed_backend:
+            if app.config['CACHE_BACKEND'] == 'none':
+                self.backend = None
+            elif app.config['CACHE_BACKEND'] == 'redis':
+                import redis
+                client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+                self.backend = RedisCache(client, default_ttl=app.config['CACHE_TTL'])
+            else:
+                self.backend = LRUCache(
+                    max_entries=app.config['CACHE_MAX_ENTRIES'],
+                    default_ttl=app.config['CACHE_TTL']
+                )
+        app.extensions['response_cache'] = self
+
+    def invalidate(self, *names):
+        """Bump the version of each named resource ('catalog' by default)"""
+        if self.backend is not None:
+            for name in names or ('catalog',):
+                self.backend.bump_version(name)
+
+    def cached(self, *names):
+        """Decorate a GET view so its 200 responses are served from the cache
+        until one of the named resources ('catalog' by default) changes"""
+        names = names or ('catalog',)
+        unknown = set(names) - set(RESOURCES)
+        if unknown:
+            raise ValueError(f'Unknown cache resources: {", ".join(sorted(unknown))}')
+
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if self.backend is None or g.get('skip_response_cache'):
+                    return view(*args, **kwargs)
+
+                versions = '.'.join(str(self.backend.get_version(name)) for name in names)
+                key = f"{'+'.join(names)}:v{versions}:{request.full_path}"
+                ttl = None
+                if g.get('read_replica'):
+                    key = 'replica:' + key
+                    ttl = max(1, int(current_app.config.get('REPLICA_MAX_LAG', 1)))
+                entry = self.backend.get(key)
+                if entry is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    entry = self._pack(response)
+                    self.backend.set(key, entry, ttl=ttl)
+
+                return self._unpack(key, entry)
+            return wrapper
+        return decorator
+
+    def _pack(self, response):
+        body = response.get_data()
+        headers = {h: response.headers[h] for h in self.replay_headers if h in response.headers}
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        meta = json.dumps({'etag': etag, 'mimetype': response.mimetype, 'headers': headers})
+        return meta.encode() + b'\n' + body
+
+    def _unpack(self, key, entry):
+        meta, body = entry.split(b'\n', 1)
+        meta = json.loads(meta)
+        encoding = response_compression.choose(meta['mimetype'], len(body))
+        # Each encoding is its own representation and needs its own ETag
+        etag = f"{meta['etag']}-{encoding}" if encoding else meta['etag']
+
+        if request.if_none_match.contains(etag):
+            response = make_response('', 304)
+        else:
+            if encoding:
+                body = self._encoded_body(f'{key}:{encoding}', body, encoding)
+            response = make_response(body)
+            response.mimetype = meta['mimetype']
+            if encoding:
+                response.headers['Content-Encoding'] = encoding
+        if response_compression.enabled and meta['mimetype'] in COMPRESSIBLE_TYPES:
+            add_vary(response, 'Accept-Encoding')
+        response.set_etag(etag)
+        response.headers.update(meta['headers'])
+        return response
+
+    def _encoded_body(self, key, body, encoding):
+        encoded = self.backend.get(key)
+        if encoded is None:
+            encoded = response_compression.compress(body, encoding)
+            self.backend.set(key, encoded)
+        return encoded
+
+# Cache resources, invalidated separately: 'catalog' is the colleges, events
+# and challenges themselves; 'participants' is registration counts and stats
+RESOURCES = ('catalog', 'participants')
+
+response_cache = ResponseCache()
+
+# (path pattern, Cache-Control) pairs; the first match wins. "{max_age}" is
+# replaced with CATALOG_MAX_AGE. Public policies only apply to successful GETs.
+DEFAULT_CACHE_RULES = (
+    (r'/api/auth/', 'private, no-store'),
+    (r'/api/payments/', 'private, no-store'),
+    (r'/api/register-event', 'private, no-store'),
+    (r'/api/me/', 'private, no-store'),
+    (r'/api/admin/', 'private, no-store'),
+    (r'/api/colleges/\d+/stats', 'private, no-cache'),
+    (r'/metrics', 'no-store'),
+    (r'/api/(colleges|events|challenges|search)\b', 'public, max-age={max_age}'),
+)
+
+class CachePolicy:
+    """Sets Cache-Control per route from CACHE_CONTROL_RULES, unless the view
+    set one itself"""
+
+    def __init__(self, app=None):
+        self.rules = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_CONTROL_RULES', DEFAULT_CACHE_RULES)
+        app.config.setdefault('CATALOG_MAX_AGE', 60)
+        max_age = app.config['CATALOG_MAX_AGE']
+        self.rules = [(re.compile(pattern), policy.format(max_age=max_age))
+                      for pattern, policy in app.config['CACHE_CONTROL_RULES']]
+        app.after_request(self.after_request)
+        app.extensions['cache_policy'] = self
+
+    def policy_for(self, path):
+        for pattern, policy in self.rules:
+            if pattern.match(path):
+                return policy
+        return None
+
+    def after_request(self, response):
+        if 'Cache-Control' in response.headers:
+            return response
+        policy = self.policy_for(request.path)
+        if policy is None:
+            return response
+        if policy.startswith('public') and (
+                request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304)):
+            return response
+        response.headers['Cache-Control'] = policy
+        return response
+
+cache_policy = CachePolicy()
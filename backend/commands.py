@@ -0,0 +1,156 @@
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+from sqlalchemy import inspect
+
+from cache import response_cache
+from models import db, College
+from search import create_search_index, rebuild_search_index
+from stats import rebuild_college_stats
+from migrations import (
+    migrate_date_columns, add_missing_columns, remove_duplicate_registrations, create_missing_indexes
+)
+
+eventify_cli = AppGroup('eventify', help='Eventify maintenance commands.')
+
+def init_db(seed=True):
+    """Create missing tables and the search index, seeding an empty database"""
+    stats_missing = not inspect(db.engine).has_table('college_stats')
+    # The primary only; a replica gets its schema through replication
+    db.create_all(bind_key=None)
+    migrate_date_columns()
+    add_missing_columns()
+    if remove_duplicate_registrations():
+        stats_missing = True
+    create_missing_indexes()
+    if create_search_index():
+        rebuild_search_index()
+
+    if seed and College.query.count() == 0:
+        from seed_data import seed_all
+        print("No colleges found, seeding database...")
+        seed_all()
+    elif stats_missing:
+        rebuild_college_stats()
+
+@eventify_cli.command('init-db')
+@click.option('--seed/--no-seed', default=True, help='Seed sample data if the database is empty.')
+def init_db_command(seed):
+    """Create the schema and seed initial data."""
+    init_db(seed=seed)
+    click.echo('Database initialized.')
+
+@eventify_cli.command('migrate-dates')
+@click.option('--batch-size', default=1000, help='Rows written per UPDATE batch.')
+def migrate_dates_command(batch_size):
+    """Convert legacy string event dates and challenge deadlines to DATETIME."""
+    try:
+        converted = migrate_date_columns(batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Converted {converted} columns.' if converted else 'Dates are already migrated.')
+
+@eventify_cli.command('import-colleges')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'jsonl']), help='Input format; guessed from the extension by default.')
+@click.option('--chunk-size', default=1000, help='Rows upserted per transaction.')
+@click.option('--approve/--no-approve', default=None, help='Override the approved column for every row.')
+def import_colleges_command(path, fmt, chunk_size, approve):
+    """Upsert colleges from a CSV or JSON Lines file, keyed on name and state."""
+    from importer import read_records, import_colleges
+
+    def report_error(line, message):
+        click.echo(f'Record {line}: {message}', err=True)
+
+    def report_progress(totals):
+        click.echo(f"{totals['read']} read, {totals['inserted']} inserted, "
+                   f"{totals['updated']} updated, {totals['invalid']} invalid")
+
+    import_colleges(read_records(path, fmt), chunk_size=chunk_size, approve=approve,
+                    on_error=report_error, on_progress=report_progress)
+    response_cache.invalidate()
+    click.echo('Import complete.')
+
+@eventify_cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute college dashboard stats from registrations."""
+    colleges = rebuild_college_stats()
+    response_cache.invalidate('participants')
+    click.echo(f'Rebuilt stats for {colleges} colleges.')
+
+@eventify_cli.command('process-payments')
+@click.option('--batch-size', default=500, help='Webhook events finalized per transaction.')
+def process_payments_command(batch_size):
+    """Finalize registrations for stored Stripe webhook events."""
+    from payments import process_payment_events
+    total = 0
+    while True:
+        processed = process_payment_events(batch_size)
+        if not processed:
+            break
+        total += processed
+    click.echo(f'Processed {total} payment events.')
+
+@eventify_cli.command('ingest-images')
+@click.option('--kind', type=click.Choice(['event', 'college', 'all']), default='all')
+@click.option('--reprocess', is_flag=True, help='Also redo items that already have variants.')
+@click.option('--now', is_flag=True, help='Process here instead of queueing jobs for the worker.')
+def ingest_images_command(kind, reprocess, now):
+    """Store event images and college logos locally and build their variants."""
+    from jobs import enqueue_many
+    from media import IMAGE_OWNERS, items_without_variants, process_item_image
+    kinds = list(IMAGE_OWNERS) if kind == 'all' else [kind]
+    for kind in kinds:
+        item_ids = items_without_variants(kind, include_processed=reprocess)
+        if not now:
+            for i in range(0, len(item_ids), 1000):
+                enqueue_many('process_image', [{'kind': kind, 'item_id': item_id} for item_id in item_ids[i:i + 1000]])
+                db.session.commit()
+            click.echo(f'Queued {len(item_ids)} {kind} images.')
+            continue
+        done = 0
+        for item_id in item_ids:
+            try:
+                process_item_image(kind, item_id)
+                done += 1
+            except Exception as e:
+                db.session.rollback()
+                click.echo(f'{kind.capitalize()} {item_id}: {e}', err=True)
+        click.echo(f'Processed {done} of {len(item_ids)} {kind} images.')
+    if now:
+        response_cache.invalidate()
+
+@eventify_cli.command('replica-sync')
+@click.option('--heartbeat-only', is_flag=True, help='Only stamp the heartbeat; replication copies it.')
+@click.option('--interval', default=0.0, help='Repeat every N seconds instead of running once.')
+def replica_sync_command(heartbeat_only, interval):
+    """Stamp the replica heartbeat and, for SQLite, copy the primary file
+    onto REPLICA_DATABASE_URL."""
+    import time
+    from replicas import REPLICA_BIND, beat, copy_sqlite
+    replica_url = current_app.config['REPLICA_DATABASE_URL']
+    if not heartbeat_only and not replica_url:
+        raise click.UsageError('REPLICA_DATABASE_URL is not set.')
+    while True:
+        beat()
+        if not heartbeat_only:
+            try:
+                copy_sqlite(db.engine, db.engines[REPLICA_BIND])
+            except ValueError as e:
+                raise click.UsageError(f'{e}; use --heartbeat-only with real replication.')
+        if not interval:
+            break
+        time.sleep(interval)
+    click.echo('Replica heartbeat written.' if heartbeat_only else 'Replica synced.')
+
+@eventify_cli.command('worker')
+@click.option('--queue', 'queues', multiple=True, default=['default', 'mail', 'media'], help='Queue to consume; repeatable.')
+@click.option('--concurrency', default=4, help='Jobs run in parallel.')
+@click.option('--burst', is_flag=True, help='Exit once the queues are empty.')
+@with_appcontext
+def worker_command(queues, concurrency, burst):
+    """Run background jobs from the database queue."""
+    import tasks
+    from jobs import Worker
+    click.echo(f"Worker consuming {', '.join(queues)} with concurrency {concurrency}")
+    Worker(current_app._get_current_object(), queues=queues, concurrency=concurrency).run(burst=burst)
@@ -0,0 +1,129 @@
+import gzip
+import zlib
+
+from flask import request
+from werkzeug.http import parse_set_header
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = (
+    'application/json', 'text/plain', 'text/csv', 'text/html', 'text/css',
+    'application/javascript', 'image/svg+xml'
+)
+
+def supported_encodings():
+    # Listed in order of preference when the client rates them equally
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def negotiate(accept_encodings):
+    """Pick the best encoding from an Accept-Encoding header, or None"""
+    best, best_quality = None, 0
+    for encoding in supported_encodings():
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress_chunks(chunks, encoding, level):
+    """Compress an iterable of byte chunks incrementally"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=level)
+        finish = compressor.finish
+        process = compressor.process
+    else:
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+        finish = compressor.flush
+        process = compressor.compress
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        data = process(chunk)
+        if data:
+            yield data
+    yield finish()
+
+def add_vary(response, *names):
+    """Add names to the response's Vary, folding every Vary header into one.
+    response.vary only reads the first header, and Flask-CORS adds Origin as
+    a header of its own, so updating response.vary could drop it."""
+    values = parse_set_header(', '.join(response.headers.getlist('Vary')))
+    for name in names:
+        values.add(name)
+    if values:
+        response.headers['Vary'] = values.to_header()
+
+class ResponseCompression:
+    """gzip/brotli for text responses the client accepts, above a size threshold.
+
+    Buffered bodies under COMPRESS_MIN_SIZE are sent as they are; streamed
+    bodies are compressed chunk by chunk as they are produced. Responses that
+    already carry a Content-Encoding (e.g. replayed from the response cache,
+    which keeps each encoding it has produced) are left alone. Brotli is used
+    when the brotli package is installed and the client asks for it.
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.config = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_ENABLED', True)
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_GZIP_LEVEL', 6)
+        app.config.setdefault('COMPRESS_BROTLI_QUALITY', 5)
+        self.config = app.config
+        self.enabled = app.config['COMPRESS_ENABLED']
+        if self.enabled:
+            app.after_request(self.after_request)
+        app.extensions['response_compression'] = self
+
+    def level(self, encoding):
+        return self.config['COMPRESS_BROTLI_QUALITY'] if encoding == 'br' else self.config['COMPRESS_GZIP_LEVEL']
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.level(encoding))
+        # mtime=0 keeps the output identical for identical input
+        return gzip.compress(data, compresslevel=self.level(encoding), mtime=0)
+
+    def choose(self, mimetype, size=None):
+        """Encoding to use for this request's response, or None to send it as is"""
+        if not self.enabled or mimetype not in COMPRESSIBLE_TYPES:
+            return None
+        if size is not None and size < self.config['COMPRESS_MIN_SIZE']:
+            return None
+        return negotiate(request.accept_encodings)
+
+    def after_request(self, response):
+        # Runs after Flask-CORS, so this also merges its Vary: Origin
+        add_vary(response)
+        if response.mimetype not in COMPRESSIBLE_TYPES or response.direct_passthrough \
+                or 'Content-Encoding' in response.headers \
+                or response.status_code < 200 or response.status_code in (204, 206, 304):
+            return response
+        add_vary(response, 'Accept-Encoding')
+
+        if response.is_streamed:
+            encoding = self.choose(response.mimetype)
+            if encoding is not None:
+                response.response = compress_chunks(response.response, encoding, self.level(encoding))
+                response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            encoding = self.choose(response.mimetype, len(data))
+            if encoding is not None:
+                response.set_data(self.compress(data, encoding))
+                etag, weak = response.get_etag()
+                if etag and not weak:
+                    response.set_etag(f'{etag}-{encoding}')
+
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+response_compression = ResponseCompression()
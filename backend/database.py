@@ -0,0 +1,99 @@
+import os
+import sqlite3
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import QueuePool
+
+class PoolMetrics:
+    """Counters for connection pool checkouts, waits and timeouts"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.listeners = []  # called with each wait, e.g. to feed a histogram
+
+    def record_wait(self, seconds, timed_out=False):
+        with self._lock:
+            self.checkouts += 1
+            self.timeouts += timed_out
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        for listener in self.listeners:
+            listener(seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_seconds_total': round(self.wait_seconds_total, 6),
+                'wait_seconds_max': round(self.wait_seconds_max, 6)
+            }
+
+pool_metrics = PoolMetrics()
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            pool_metrics.record_wait(time.perf_counter() - started, timed_out=True)
+            raise
+        pool_metrics.record_wait(time.perf_counter() - started)
+        return connection
+
+def env_flag(name, default):
+    return os.getenv(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+def engine_options(database_uri):
+    """Build SQLALCHEMY_ENGINE_OPTIONS for the configured database from the environment"""
+    url = make_url(database_uri)
+    options = {'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True)}
+
+    # In-memory SQLite lives and dies with a single connection, so leave its pool alone
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        return options
+
+    options.update(
+        poolclass=MeteredQueuePool,
+        pool_size=int(os.getenv('DB_POOL_SIZE', 5)),
+        max_overflow=int(os.getenv('DB_MAX_OVERFLOW', 10)),
+        # Give up quickly when the pool is exhausted rather than hanging the worker
+        pool_timeout=int(os.getenv('DB_POOL_TIMEOUT', 3)),
+        pool_recycle=int(os.getenv('DB_POOL_RECYCLE', 1800))
+    )
+
+    statement_timeout = int(os.getenv('DB_STATEMENT_TIMEOUT_MS', 5000))
+    if url.get_backend_name() == 'postgresql' and statement_timeout:
+        options['connect_args'] = {'options': f'-c statement_timeout={statement_timeout}'}
+    return options
+
+def pool_status(engine):
+    """Current pool occupancy plus the cumulative checkout metrics"""
+    status = pool_metrics.snapshot()
+    pool = engine.pool
+    if isinstance(pool, QueuePool):
+        status.update(size=pool.size(), checked_out=pool.checkedout(), overflow=pool.overflow())
+    return status
+
+@event.listens_for(Engine, 'connect')
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Let SQLite readers and a writer run concurrently instead of raising
+    "database is locked" as soon as two requests write at once"""
+    if not isinstance(dbapi_connection, sqlite3.Connection):
+        return
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute(f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', 5000))}")
+    cursor.close()
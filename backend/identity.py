@@ -0,0 +1,119 @@
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify
+from flask_jwt_extended import create_access_token, get_current_user, jwt_required
+from sqlalchemy import event
+
+from cache import LRUCache
+from models import db, User
+
+class IdentityCache:
+    """Per-process LRU of JWT identities, keyed by user id and token version.
+
+    Entries hold plain dicts rather than ORM instances so they can be shared
+    across requests. Local writes to a User row drop its entry immediately;
+    changes made by other processes are picked up within IDENTITY_CACHE_TTL.
+    """
+
+    def __init__(self, max_entries=10000, ttl=60):
+        self._cache = LRUCache(max_entries=max_entries, default_ttl=ttl)
+
+    def configure(self, max_entries, ttl):
+        self._cache = LRUCache(max_entries=max_entries, default_ttl=ttl)
+
+    def get(self, user_id):
+        identity = self._cache.get(user_id)
+        if identity is None:
+            row = db.session.query(
+                User.id, User.email, User.username, User.college_id, User.token_version
+            ).filter(User.id == user_id).first()
+            if row is None:
+                return None
+            identity = dict(row._mapping)
+            self._cache.set(user_id, identity)
+        return identity
+
+    def invalidate(self, user_id):
+        self._cache.delete(user_id)
+
+class RevocationList:
+    """Revoked token ids, each kept until the token would have expired anyway.
+
+    Membership checks are a single dict lookup (or one GET when backed by a
+    Redis-compatible client shared between workers).
+    """
+
+    def __init__(self, client=None, prefix='eventify:revoked:'):
+        self.client = client
+        self.prefix = prefix
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def revoke(self, jti, expires_at):
+        ttl = max(1, int(expires_at - time.time()))
+        if self.client is not None:
+            self.client.set(self.prefix + jti, 1, ex=ttl)
+            return
+        with self._lock:
+            self._entries[jti] = expires_at
+            # Amortized cleanup so the set only holds still-valid tokens
+            if len(self._entries) % 1024 == 0:
+                now = time.time()
+                self._entries = {k: v for k, v in self._entries.items() if v > now}
+
+    def is_revoked(self, jti):
+        if self.client is not None:
+            return self.client.get(self.prefix + jti) is not None
+        return jti in self._entries
+
+identity_cache = IdentityCache()
+revoked_tokens = RevocationList()
+
+def issue_token(user):
+    """Create an access token carrying the user's stable claims, so routes
+    like /api/auth/me can answer without loading the user"""
+    return create_access_token(identity=user.id, additional_claims={
+        'email': user.email,
+        'username': user.username,
+        'college_id': user.college_id,
+        'ver': user.token_version or 0
+    })
+
+def admin_required(view):
+    """jwt_required() for users whose email is listed in ADMIN_EMAILS"""
+    @wraps(view)
+    @jwt_required()
+    def wrapper(*args, **kwargs):
+        identity = get_current_user()
+        if identity is None or identity['email'].lower() not in current_app.config['ADMIN_EMAILS']:
+            return jsonify({'error': 'Admin access required'}), 403
+        return view(*args, **kwargs)
+    return wrapper
+
+def init_identity(app, jwt):
+    app.config.setdefault('ADMIN_EMAILS', set())
+    app.config.setdefault('IDENTITY_CACHE_SIZE', 10000)
+    app.config.setdefault('IDENTITY_CACHE_TTL', 60)
+    identity_cache.configure(app.config['IDENTITY_CACHE_SIZE'], app.config['IDENTITY_CACHE_TTL'])
+
+    cache_backend = app.extensions['response_cache'].backend
+    revoked_tokens.client = getattr(cache_backend, 'client', None)
+
+    @jwt.user_lookup_loader
+    def load_user(jwt_header, jwt_data):
+        return identity_cache.get(jwt_data['sub'])
+
+    @jwt.token_in_blocklist_loader
+    def is_token_revoked(jwt_header, jwt_data):
+        if revoked_tokens.is_revoked(jwt_data['jti']):
+            return True
+        # Tokens issued before a "log out everywhere" carry an old version
+        identity = identity_cache.get(jwt_data['sub'])
+        return identity is None or jwt_data.get('ver', 0) != identity['token_version']
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def drop_cached_identity(mapper, connection, target):
+    identity_cache.invalidate(target.id)
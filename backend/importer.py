@@ -0,0 +1,126 @@
+import csv
+import json
+from itertools import islice
+
+from sqlalchemy import tuple_
+
+from models import db, College
+from search import index_row, is_supported
+
+COLLEGE_FIELDS = (
+    'name', 'short_name', 'location', 'state', 'website', 'email', 'phone',
+    'logo_url', 'description', 'established_year', 'college_type',
+    'affiliation', 'approved'
+)
+REQUIRED_FIELDS = ('name', 'short_name', 'location', 'state')
+
+def read_records(path, fmt=None):
+    """Yield dicts from a CSV or JSON Lines file one line at a time"""
+    fmt = fmt or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+    with open(path, encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            yield from csv.DictReader(f)
+        else:
+            for line in f:
+                if line.strip():
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        yield line  # reported as invalid by clean_college
+
+def parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+def clean_college(record):
+    """Normalize one input record to College column values, dropping blanks;
+    raises ValueError if it can't be imported"""
+    if not isinstance(record, dict):
+        raise ValueError('Record must be a JSON object')
+    values = {}
+    for field in COLLEGE_FIELDS:
+        value = record.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+        if value is None or value == '':
+            continue
+        if field == 'established_year':
+            value = int(value)
+        elif field == 'approved':
+            value = parse_bool(value)
+        values[field] = value
+    missing = [field for field in REQUIRED_FIELDS if field not in values]
+    if missing:
+        raise ValueError(f"Missing {', '.join(missing)}")
+    return values
+
+def college_key(values):
+    # Names repeat across states ("Government Engineering College"), so the
+    # natural key is the name within a state
+    return values['name'], values['state']
+
+def import_chunk(rows, approve=None):
+    """Upsert one chunk of cleaned college rows; returns (inserted, updated)"""
+    by_key = {}
+    for values in rows:
+        if approve is not None:
+            values['approved'] = approve
+        by_key.setdefault(college_key(values), {}).update(values)
+
+    existing = dict(
+        ((name, state), college_id) for college_id, name, state in
+        db.session.query(College.id, College.name, College.state)
+        .filter(tuple_(College.name, College.state).in_(list(by_key)))
+    )
+
+    inserts = [values for key, values in by_key.items() if key not in existing]
+    updates = [dict(values, id=existing[key]) for key, values in by_key.items() if key in existing]
+    for values in inserts:
+        values.setdefault('approved', False)
+    if inserts:
+        db.session.bulk_insert_mappings(College, inserts, return_defaults=True)
+    if updates:
+        db.session.bulk_update_mappings(College, updates)
+
+    # Bulk writes skip the mapper events that keep search in sync
+    if is_supported(db.engine.dialect.name):
+        connection = db.session.connection()
+        ids = [values['id'] for values in inserts + updates]
+        for college in College.query.filter(College.id.in_(ids)):
+            index_row(connection, 'college', college)
+
+    db.session.commit()
+    db.session.expunge_all()
+    return len(inserts), len(updates)
+
+def import_colleges(records, chunk_size=1000, approve=None, on_error=None, on_progress=None):
+    """Stream records into the College table in chunks, keyed on (name, state).
+
+    Each chunk costs one existence query, one bulk insert, one bulk update and
+    a commit, so memory stays flat however large the input is. Existing
+    colleges are updated with the non-blank fields given. Returns a dict of
+    totals.
+    """
+    totals = {'read': 0, 'inserted': 0, 'updated': 0, 'invalid': 0}
+    records = iter(records)
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        rows = []
+        for record in chunk:
+            totals['read'] += 1
+            try:
+                rows.append(clean_college(record))
+            except (TypeError, ValueError) as e:
+                totals['invalid'] += 1
+                if on_error:
+                    on_error(totals['read'], str(e))
+        if rows:
+            inserted, updated = import_chunk(rows, approve)
+            totals['inserted'] += inserted
+            totals['updated'] += updated
+        if on_progress:
+            on_progress(totals)
+    return totals
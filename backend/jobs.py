@@ -0,0 +1,171 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from models import db, Job
+
+# Task name -> (function, queue, max_attempts), filled in by @task
+TASKS = {}
+
+def task(name=None, queue='default', max_attempts=5):
+    """Register a function as a background task callable by name"""
+    def decorator(func):
+        TASKS[name or func.__name__] = (func, queue, max_attempts)
+        return func
+    return decorator
+
+def _job_fields(name, delay):
+    _, queue, max_attempts = TASKS.get(name, (None, 'default', 5))
+    return {
+        'name': name,
+        'queue': queue,
+        'max_attempts': max_attempts,
+        'status': 'queued',
+        'attempts': 0,
+        'run_at': datetime.utcnow() + timedelta(seconds=delay)
+    }
+
+def enqueue(name, delay=0, **payload):
+    """Add a job to the current session, committed with the caller's transaction"""
+    job = Job(payload=json.dumps(payload), **_job_fields(name, delay))
+    db.session.add(job)
+    return job
+
+def enqueue_many(name, payloads, delay=0):
+    """Add one job per payload with a single bulk insert"""
+    fields = _job_fields(name, delay)
+    db.session.bulk_insert_mappings(Job, [dict(fields, payload=json.dumps(p)) for p in payloads])
+
+def enqueue_once(name, **payload):
+    """Enqueue unless an identical job is already waiting, so bursts coalesce"""
+    encoded = json.dumps(payload)
+    waiting = db.session.query(Job.id).filter(
+        Job.name == name, Job.payload == encoded, Job.status == 'queued'
+    ).first()
+    if waiting is None:
+        enqueue(name, **payload)
+
+class Worker:
+    """Runs queued jobs from the database with a fixed number of threads.
+
+    Jobs are claimed with a conditional UPDATE so several worker processes can
+    share a queue. A failing job is retried with exponential backoff and
+    jitter; once it has used max_attempts it is left with status 'dead' for
+    inspection. Every worker process checks for jobs whose worker died
+    mid-run; once they have been running for visibility_timeout seconds they
+    are requeued, or marked 'dead' if that was their last attempt, so a job
+    that keeps killing its worker is given up on too. Finished jobs are
+    deleted.
+    """
+
+    def __init__(self, app, queues=('default',), concurrency=4, poll_interval=1.0,
+                 visibility_timeout=300, backoff_base=5, backoff_max=3600):
+        self.app = app
+        self.queues = list(queues)
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.visibility_timeout = visibility_timeout
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.name = f"{socket.gethostname()}:{os.getpid()}"
+        self.stopping = threading.Event()
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_max, self.backoff_base * 2 ** (attempts - 1))
+        return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+    def requeue_stale(self):
+        """Release jobs running for longer than visibility_timeout; returns
+        the number requeued"""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.visibility_timeout)
+        stale = (Job.status == 'running', Job.locked_at < cutoff)
+        released = {Job.locked_at: None, Job.locked_by: None}
+        Job.query.filter(*stale, Job.attempts >= Job.max_attempts).update(
+            {Job.status: 'dead', Job.last_error: 'Worker stopped while running the job', **released},
+            synchronize_session=False
+        )
+        requeued = Job.query.filter(*stale).update({Job.status: 'queued', **released}, synchronize_session=False)
+        db.session.commit()
+        return requeued
+
+    def claim(self):
+        """Atomically take the next due job, or return None"""
+        now = datetime.utcnow()
+        candidates = db.session.query(Job.id).filter(
+            Job.status == 'queued', Job.queue.in_(self.queues), Job.run_at <= now
+        ).order_by(Job.run_at).limit(self.concurrency * 2).all()
+        db.session.commit()
+
+        for (job_id,) in candidates:
+            claimed = Job.query.filter(Job.id == job_id, Job.status == 'queued').update({
+                Job.status: 'running',
+                Job.locked_at: now,
+                Job.locked_by: self.name,
+                Job.attempts: Job.attempts + 1
+            }, synchronize_session=False)
+            db.session.commit()
+            if claimed:
+                return db.session.get(Job, job_id)
+        return None
+
+    def run_job(self, job):
+        job_id = job.id
+        func = TASKS.get(job.name, (None,))[0]
+        try:
+            if func is None:
+                raise LookupError(f'Unknown task {job.name}')
+            func(**json.loads(job.payload))
+        except Exception:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.last_error = traceback.format_exc()
+            job.locked_at = None
+            job.locked_by = None
+            if job.attempts >= job.max_attempts:
+                job.status = 'dead'
+            else:
+                job.status = 'queued'
+                job.run_at = datetime.utcnow() + self.backoff(job.attempts)
+        else:
+            Job.query.filter(Job.id == job_id).delete(synchronize_session=False)
+        db.session.commit()
+
+    def work(self, burst=False):
+        """Claim and run jobs on this thread until stopped (or idle, in burst mode)"""
+        with self.app.app_context():
+            while not self.stopping.is_set():
+                job = self.claim()
+                if job is None:
+                    if burst:
+                        return
+                    self.stopping.wait(self.poll_interval)
+                    continue
+                self.run_job(job)
+
+    def run(self, burst=False):
+        with self.app.app_context():
+            self.requeue_stale()
+
+        threads = [threading.Thread(target=self.work, args=(burst,), daemon=True)
+                   for _ in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        # Another worker can die at any time, so keep looking for its jobs
+        requeue_interval = min(60, self.visibility_timeout)
+        next_requeue = time.monotonic() + requeue_interval
+        try:
+            while any(thread.is_alive() for thread in threads):
+                time.sleep(self.poll_interval)
+                if time.monotonic() >= next_requeue:
+                    with self.app.app_context():
+                        self.requeue_stale()
+                    next_requeue = time.monotonic() + requeue_interval
+        except KeyboardInterrupt:
+            self.stopping.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,216 @@
+import json
+import queue
+import threading
+import time
+
+from flask import Response, current_app, jsonify
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Event, Challenge
+from serializers import dumps
+
+KINDS = {'event': Event, 'challenge': Challenge}
+CHANNEL = 'eventify:participants'
+
+class Subscriber:
+    """One open stream: the kind it follows, optionally a single item, and
+    the encoded messages waiting to be written to it"""
+
+    def __init__(self, kind, item_id, size):
+        self.kind = kind
+        self.item_id = item_id
+        self.messages = queue.Queue(size)
+        self.closed = False
+
+    def send(self, message):
+        try:
+            self.messages.put_nowait(message)
+        except queue.Full:
+            # A client this far behind has missed counts; end its stream so
+            # EventSource reconnects and the page refetches
+            self.closed = True
+
+class LiveCounts:
+    """Pushes participant counts to server-sent event streams.
+
+    Code that commits registrations calls touch() with the items it changed.
+    A single broadcaster thread per process waits LIVE_COUNTS_WINDOW seconds
+    after the first touch so a rush coalesces, reads the current counts of
+    everything touched in one query per kind, and hands each subscriber the
+    same pre-encoded message, so the cost of a window doesn't grow with the
+    number of open streams. Only counts that changed since the last window
+    are sent. With CACHE_BACKEND=redis touches are published on a Redis
+    channel so every process hears about registrations made in the others.
+
+    Each stream holds a connection open, so serve them from an async worker
+    (e.g. gunicorn -k gevent); a sync worker spends a whole thread on each.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self.redis = None
+        self.subscribers = set()
+        self.dirty = {kind: set() for kind in KINDS}
+        self.sent = {}
+        self.reads = 0
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('LIVE_COUNTS_WINDOW', 0.25)
+        app.config.setdefault('LIVE_KEEPALIVE', 15)
+        app.config.setdefault('LIVE_QUEUE_SIZE', 64)
+        app.config.setdefault('LIVE_MAX_SUBSCRIBERS', 10000)
+        self.app = app
+        if app.config.get('CACHE_BACKEND') == 'redis':
+            import redis
+            self.redis = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+        app.extensions['live_counts'] = self
+
+    def touch(self, model, item_ids):
+        """Note that the participant counts of these items changed"""
+        kind = 'event' if model is Event else 'challenge'
+        item_ids = [int(item_id) for item_id in item_ids]
+        if not item_ids:
+            return
+        if self.redis is not None:
+            try:
+                self.redis.publish(CHANNEL, json.dumps({'kind': kind, 'ids': item_ids}))
+                return
+            except Exception as e:
+                current_app.logger.warning('Publishing participant counts failed: %s', e)
+        self._mark(kind, item_ids)
+
+    def _mark(self, kind, item_ids):
+        with self.lock:
+            if not self.subscribers:
+                return
+            self.dirty[kind].update(item_ids)
+        self.wakeup.set()
+
+    def subscribe(self, kind, item_id=None):
+        """Register a stream; None when LIVE_MAX_SUBSCRIBERS are already open"""
+        subscriber = Subscriber(kind, item_id, self.app.config['LIVE_QUEUE_SIZE'])
+        with self.lock:
+            if len(self.subscribers) >= self.app.config['LIVE_MAX_SUBSCRIBERS']:
+                return None
+            self.subscribers.add(subscriber)
+            if self.thread is None:
+                # Started on first use so CLI commands and idle workers never run it
+                self.thread = threading.Thread(target=self.run, name='live-counts', daemon=True)
+                self.thread.start()
+                if self.redis is not None:
+                    threading.Thread(target=self.listen, name='live-counts-redis', daemon=True).start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def listen(self):
+        """Feed touches published by other processes into this one's window"""
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                for message in pubsub.listen():
+                    change = json.loads(message['data'])
+                    self._mark(change['kind'], change['ids'])
+            except Exception as e:
+                self.app.logger.warning('Participant count channel lost, reconnecting: %s', e)
+                time.sleep(1)
+
+    def run(self):
+        while True:
+            self.wakeup.wait()
+            time.sleep(self.app.config['LIVE_COUNTS_WINDOW'])
+            self.wakeup.clear()
+            with self.lock:
+                dirty, self.dirty = self.dirty, {kind: set() for kind in KINDS}
+                subscribers = list(self.subscribers)
+            if not subscribers:
+                # Nobody saw the counts since the last send, so don't diff against them
+                self.sent.clear()
+                continue
+            try:
+                with self.app.app_context():
+                    changes = self.read(dirty)
+            except SQLAlchemyError as e:
+                self.app.logger.warning('Reading participant counts failed: %s', e)
+                continue
+            self.publish(changes, subscribers)
+
+    def read(self, dirty):
+        """{kind: {id: participants}} for touched items whose count changed"""
+        changes = {}
+        for kind, item_ids in dirty.items():
+            if not item_ids:
+                continue
+            model = KINDS[kind]
+            rows = db.session.query(model.id, model.participants).filter(model.id.in_(item_ids)).all()
+            self.reads += 1
+            counts = {}
+            for item_id, participants in rows:
+                if self.sent.get((kind, item_id)) != participants:
+                    self.sent[(kind, item_id)] = participants
+                    counts[item_id] = participants
+            if counts:
+                changes[kind] = counts
+        return changes
+
+    def publish(self, changes, subscribers):
+        encoded = {}
+
+        def message(kind, item_id=None):
+            # Built once per window and shared by every matching subscriber
+            if (kind, item_id) not in encoded:
+                counts = changes[kind]
+                if item_id is not None:
+                    counts = {item_id: counts[item_id]}
+                encoded[(kind, item_id)] = event_message(counts)
+            return encoded[(kind, item_id)]
+
+        for subscriber in subscribers:
+            counts = changes.get(subscriber.kind)
+            if not counts or (subscriber.item_id is not None and subscriber.item_id not in counts):
+                continue
+            subscriber.send(message(subscriber.kind, subscriber.item_id))
+
+    def stream(self, kind, item_id=None, initial=None):
+        """SSE response following kind (or one item of it); initial is an
+        optional {id: participants} sent as soon as the stream opens"""
+        subscriber = self.subscribe(kind, item_id)
+        if subscriber is None:
+            response = jsonify({'error': 'Too many live streams, try again later'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '30'
+            return response
+        keepalive = self.app.config['LIVE_KEEPALIVE']
+
+        def generate():
+            try:
+                yield b'retry: 3000\n\n'
+                if initial:
+                    yield event_message(initial)
+                while not subscriber.closed:
+                    try:
+                        yield subscriber.messages.get(timeout=keepalive)
+                    except queue.Empty:
+                        # Keeps proxies from timing out an idle connection
+                        yield b': keepalive\n\n'
+            finally:
+                self.unsubscribe(subscriber)
+
+        return Response(generate(), mimetype='text/event-stream', headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        })
+
+def event_message(counts):
+    data = dumps([{'id': item_id, 'participants': participants} for item_id, participants in counts.items()])
+    return b'event: participants\ndata: ' + data + b'\n\n'
+
+live_counts = LiveCounts()
@@ -0,0 +1,218 @@
+import base64
+import binascii
+import hashlib
+import io
+import ipaddress
+import os
+import re
+import socket
+import uuid
+from urllib.parse import urljoin, urlsplit
+
+from flask import current_app
+from sqlalchemy import and_, case, func, or_
+
+from models import db, College, Event, MediaImage, insert_or_ignore
+
+# (name, longest side in pixels); each variant is written once as WebP and as
+# a JPEG fallback, and its URL never changes because it is named by the hash
+# of the source bytes
+VARIANTS = (('thumb', 320), ('card', 640), ('large', 1280))
+FORMATS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+# Sources longer than this (in practice data URIs) are never sent to clients
+MAX_SOURCE_URL = 2048
+
+# Redirects followed when fetching an image; each hop is checked again
+MAX_REDIRECTS = 3
+
+# kind -> (model, source column, key column)
+IMAGE_OWNERS = {
+    'event': (Event, Event.image, Event.image_key),
+    'college': (College, College.logo_url, College.logo_key),
+}
+
+DATA_URI = re.compile(r'data:image/[\w.+-]+;base64,(.*)', re.S)
+VARIANT_PATH = re.compile(r'[0-9a-f]{2}/[0-9a-f]{32}/(%s)\.(%s)' % (
+    '|'.join(name for name, _ in VARIANTS), '|'.join(FORMATS.values())))
+
+class ImageError(ValueError):
+    """The source can't be fetched as an image; retrying won't help"""
+
+def image_source(key_column, source_column):
+    """SQL expression for list endpoints: the processed image key if there is
+    one, else the source when it is a short http(s) link, else NULL"""
+    return case(
+        (key_column.isnot(None), key_column),
+        (and_(or_(source_column.like('http://%'), source_column.like('https://%')),
+              func.length(source_column) <= MAX_SOURCE_URL), source_column),
+        else_=None
+    )
+
+def variant_url(value, name='card', fmt='webp'):
+    """Client URL for a value selected with image_source()"""
+    if not value or value.startswith(('http://', 'https://')):
+        return value
+    return f"{current_app.config['MEDIA_URL']}/{value[:2]}/{value}/{name}.{FORMATS[fmt]}"
+
+def thumbnail_url(value):
+    return variant_url(value, 'thumb')
+
+def image_dir(key):
+    return os.path.join(current_app.config['MEDIA_ROOT'], key[:2], key)
+
+def upload_dir():
+    return os.path.join(current_app.config['MEDIA_ROOT'], 'incoming')
+
+def read_limited(chunks, max_bytes):
+    data = bytearray()
+    for chunk in chunks:
+        data += chunk
+        if len(data) > max_bytes:
+            raise ImageError(f'Image is larger than {max_bytes} bytes')
+    return bytes(data)
+
+def check_public_url(url):
+    """Raise ImageError unless url is http(s) and its host resolves only to
+    public addresses, so image links can't make the server request its own
+    network (localhost, private ranges, cloud metadata at 169.254.169.254)"""
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise ImageError('Unsupported image source')
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(parts.hostname, parts.port or None)}
+    except (socket.gaierror, UnicodeError, ValueError):
+        raise ImageError(f'Could not resolve {parts.hostname}')
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            raise ImageError(f'{parts.hostname} is not a public address')
+
+def read_source(source):
+    """Return the bytes of an http(s) URL or a base64 data URI"""
+    max_bytes = current_app.config['IMAGE_MAX_BYTES']
+    if not source:
+        raise ImageError('No image source')
+    match = DATA_URI.fullmatch(source.strip())
+    if match:
+        try:
+            data = base64.b64decode(match.group(1), validate=True)
+        except binascii.Error:
+            raise ImageError('Malformed data URI')
+        return read_limited([data], max_bytes)
+
+    import requests
+    try:
+        # Redirects are followed by hand so every hop is checked
+        for _ in range(MAX_REDIRECTS + 1):
+            check_public_url(source)
+            with requests.get(source, stream=True, allow_redirects=False,
+                              timeout=current_app.config['IMAGE_FETCH_TIMEOUT']) as response:
+                if response.is_redirect:
+                    source = urljoin(source, response.headers['Location'])
+                    continue
+                if 400 <= response.status_code < 500:
+                    raise ImageError(f'Fetching the image failed with {response.status_code}')
+                response.raise_for_status()
+                return read_limited(response.iter_content(65536), max_bytes)
+    except requests.exceptions.InvalidURL as e:
+        raise ImageError(str(e))
+    raise ImageError(f'More than {MAX_REDIRECTS} redirects')
+
+def save_upload(stream):
+    """Spool an uploaded file under MEDIA_ROOT/incoming; returns its name"""
+    os.makedirs(upload_dir(), exist_ok=True)
+    name = uuid.uuid4().hex
+    data = read_limited(iter(lambda: stream.read(65536), b''), current_app.config['IMAGE_MAX_BYTES'])
+    write_file(os.path.join(upload_dir(), name), write_bytes(data))
+    return name
+
+def read_upload(name):
+    with open(os.path.join(upload_dir(), os.path.basename(name)), 'rb') as f:
+        return f.read()
+
+def write_bytes(data):
+    def save(path):
+        with open(path, 'wb') as f:
+            f.write(data)
+    return save
+
+def write_file(path, save):
+    # Written under a temporary name and renamed, so a crash never leaves a
+    # truncated file behind an immutable URL
+    temp = f'{path}.{uuid.uuid4().hex}.tmp'
+    try:
+        save(temp)
+        os.replace(temp, path)
+    finally:
+        if os.path.exists(temp):
+            os.remove(temp)
+
+def store_image(data):
+    """Store data and its variants, once per distinct image; returns its key"""
+    # 128 bits of SHA-256 is plenty to tell images apart and keeps URLs short
+    key = hashlib.sha256(data).hexdigest()[:32]
+    directory = image_dir(key)
+    expected = [os.path.join(directory, f'{name}.{ext}') for name, _ in VARIANTS for ext in FORMATS.values()]
+    if all(os.path.exists(path) for path in expected) and \
+            db.session.query(MediaImage.id).filter(MediaImage.key == key).first():
+        return key
+
+    from PIL import Image, ImageOps
+    Image.MAX_IMAGE_PIXELS = current_app.config['IMAGE_MAX_PIXELS']
+    try:
+        image = Image.open(io.BytesIO(data))
+        source_format = (image.format or 'png').lower()
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ImageError(f'Unreadable image: {e}')
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    os.makedirs(directory, exist_ok=True)
+    write_file(os.path.join(directory, f'original.{source_format}'), write_bytes(data))
+    for name, size in VARIANTS:
+        variant = image.copy()
+        variant.thumbnail((size, size), Image.LANCZOS)
+        write_file(os.path.join(directory, f'{name}.webp'),
+                   lambda path: variant.save(path, 'WEBP', quality=80, method=4))
+        flat = variant.convert('RGB') if variant.mode != 'RGB' else variant
+        write_file(os.path.join(directory, f'{name}.jpg'),
+                   lambda path: flat.save(path, 'JPEG', quality=82, optimize=True, progressive=True))
+
+    insert_or_ignore(MediaImage, {
+        'key': key, 'format': source_format, 'width': image.width,
+        'height': image.height, 'size': len(data)
+    }, ['key'])
+    return key
+
+def process_item_image(kind, item_id, upload=None):
+    """Store the item's source image (or an uploaded file) and point the item
+    at its variants; returns the key, or None if the item has no image"""
+    model, source_column, key_column = IMAGE_OWNERS[kind]
+    if upload:
+        data = read_upload(upload)
+    else:
+        source = db.session.query(source_column).filter(model.id == item_id).scalar()
+        if not source:
+            return None
+        data = read_source(source)
+
+    key = store_image(data)
+    values = {key_column: key}
+    if upload:
+        # The upload replaces whatever the source pointed at
+        values[source_column] = None
+    model.query.filter(model.id == item_id).update(values, synchronize_session=False)
+    db.session.commit()
+    if upload:
+        os.remove(os.path.join(upload_dir(), os.path.basename(upload)))
+    return key
+
+def items_without_variants(kind, include_processed=False):
+    """Ids of items with an image source but no variants yet"""
+    model, source_column, key_column = IMAGE_OWNERS[kind]
+    query = db.session.query(model.id).filter(source_column.isnot(None), source_column != '')
+    if not include_processed:
+        query = query.filter(key_column.is_(None))
+    return [row[0] for row in query.order_by(model.id)]
@@ -0,0 +1,232 @@
+import cProfile
+import io
+import pstats
+import threading
+import time
+
+from flask import Response, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from database import pool_metrics, pool_status
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 3)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{escape_label(v)}"' for n, v in zip(names, values)) + '}'
+
+class Metric:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.values = {}
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, labels=(), amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield self.name + format_labels(self.labels, labels), value
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, labels, value):
+        counts = self.values.get(labels)
+        if counts is None:
+            # One slot per bucket plus +Inf, then the running sum
+            counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[len(self.buckets)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        names = self.labels + ('le',)
+        for labels, counts in sorted(self.values.items()):
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                yield self.name + '_bucket' + format_labels(names, labels + (bound,)), total
+            yield self.name + '_sum' + format_labels(self.labels, labels), counts[-1]
+            yield self.name + '_count' + format_labels(self.labels, labels), total
+
+class MetricsRegistry:
+    """Process-local metrics rendered in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = []
+        self.lock = threading.Lock()
+
+    def counter(self, name, help, labels=()):
+        metric = Counter(name, help, labels)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, help, labels, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def render(self, gauges=()):
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f'# HELP {metric.name} {metric.help}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                lines.extend(f'{sample} {value}' for sample, value in metric.samples())
+        for name, kind, help, value in gauges:
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+class RequestMetrics:
+    """Per-route latency, response size and SQL usage, served at /metrics.
+
+    Statement counts and DB time come from engine events and are attributed
+    to the request running on the current thread. Streamed responses are
+    timed up to the first byte; their size and the SQL run while streaming
+    are not recorded.
+
+    With DEBUG_PROFILE_TOKEN set, a request carrying a matching X-Debug-Profile
+    header is run under cProfile and answered with the top functions by
+    cumulative time instead of its normal body.
+    """
+
+    def __init__(self, app=None):
+        self.registry = MetricsRegistry()
+        self.requests = self.registry.counter(
+            'eventify_http_requests_total', 'Requests handled.', ('route', 'method', 'status'))
+        self.latency = self.registry.histogram(
+            'eventify_http_request_duration_seconds', 'Time spent handling requests.', ('route', 'method'))
+        self.response_size = self.registry.histogram(
+            'eventify_http_response_size_bytes', 'Response body sizes.', ('route',), SIZE_BUCKETS)
+        self.statements = self.registry.histogram(
+            'eventify_db_statements_per_request', 'SQL statements executed per request.', ('route',),
+            STATEMENT_BUCKETS)
+        self.db_time = self.registry.counter(
+            'eventify_db_seconds_total', 'Time spent executing SQL during requests.', ('route',))
+        self.pool_wait = self.registry.histogram(
+            'eventify_db_pool_wait_seconds', 'Time spent waiting for a pooled connection.', (),
+            WAIT_BUCKETS)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('DEBUG_PROFILE_TOKEN', '')
+        app.config.setdefault('DEBUG_PROFILE_LINES', 40)
+        self.config = app.config
+        if not app.config['METRICS_ENABLED']:
+            return
+
+        app.before_request(self.before_request)
+        app.after_request(self.after_request)
+        app.add_url_rule('/metrics', 'metrics', self.metrics_view)
+        if self.record_pool_wait not in pool_metrics.listeners:
+            pool_metrics.listeners.append(self.record_pool_wait)
+        app.extensions['request_metrics'] = self
+
+    def before_request(self):
+        g.metrics_started = time.perf_counter()
+        g.sql_statements = 0
+        g.sql_seconds = 0.0
+
+        token = self.config['DEBUG_PROFILE_TOKEN']
+        if token and request.headers.get('X-Debug-Profile') == token:
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+
+    def after_request(self, response):
+        profiler = g.pop('profiler', None)
+        if profiler is not None:
+            profiler.disable()
+
+        started = g.pop('metrics_started', None)
+        if started is not None and request.endpoint != 'metrics':
+            self.record_request(response, time.perf_counter() - started)
+
+        if profiler is not None:
+            return self.profile_response(profiler, response)
+        return response
+
+    def record_request(self, response, elapsed):
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        with self.registry.lock:
+            self.requests.inc((route, request.method, str(response.status_code)))
+            self.latency.observe((route, request.method), elapsed)
+            if not response.is_streamed and response.content_length is not None:
+                self.response_size.observe((route,), response.content_length)
+            self.statements.observe((route,), g.sql_statements)
+            self.db_time.inc((route,), g.sql_seconds)
+
+    def profile_response(self, profiler, response):
+        output = io.StringIO()
+        stats = pstats.Stats(profiler, stream=output)
+        stats.strip_dirs().sort_stats('cumulative').print_stats(self.config['DEBUG_PROFILE_LINES'])
+        summary = (
+            f'{request.method} {request.full_path} -> {response.status}\n'
+            f"SQL statements: {g.get('sql_statements', 0)}, "
+            f"SQL time: {g.get('sql_seconds', 0.0) * 1000:.1f} ms\n\n"
+        )
+        profiled = Response(summary + output.getvalue(), mimetype='text/plain')
+        profiled.headers['X-Debug-Profile-Status'] = str(response.status_code)
+        return profiled
+
+    def record_statement(self, seconds):
+        if has_request_context() and 'sql_statements' in g:
+            g.sql_statements += 1
+            g.sql_seconds += seconds
+
+    def record_pool_wait(self, seconds):
+        with self.registry.lock:
+            self.pool_wait.observe((), seconds)
+
+    def metrics_view(self):
+        from models import db
+        status = pool_status(db.engine)
+        gauges = [
+            ('eventify_db_pool_checkouts_total', 'counter', 'Connections checked out of the pool.', status['checkouts']),
+            ('eventify_db_pool_timeouts_total', 'counter', 'Checkouts that timed out.', status['timeouts']),
+        ]
+        if 'checked_out' in status:
+            gauges.append(('eventify_db_pool_checked_out', 'gauge', 'Connections currently in use.', status['checked_out']))
+            gauges.append(('eventify_db_pool_size', 'gauge', 'Configured pool size.', status['size']))
+        return Response(self.registry.render(gauges), mimetype='text/plain; version=0.0.4')
+
+request_metrics = RequestMetrics()
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('statement_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info['statement_started'].pop()
+    request_metrics.record_statement(time.perf_counter() - started)
+
+@event.listens_for(Engine, 'handle_error')
+def drop_statement_timer(context):
+    connection = context.connection
+    if connection is not None and connection.info.get('statement_started'):
+        connection.info['statement_started'].pop()
@@ -0,0 +1,190 @@
+import re
+from datetime import datetime, time
+
+from sqlalchemy import String, bindparam, inspect, text
+from sqlalchemy.schema import CreateColumn
+
+from models import db
+
+LEGACY_DATE_FORMATS = (
+    '%B %d, %Y', '%b %d, %Y', '%B %d %Y', '%b %d %Y',
+    '%d %B %Y', '%d %b %Y', '%d/%m/%Y', '%Y/%m/%d'
+)
+
+# (table, column, whether a bare date means the end of that day)
+DATE_COLUMNS = (
+    ('event', 'date', False),
+    ('challenge', 'deadline', True),
+)
+
+def parse_legacy_date(value, end_of_day=False):
+    """Parse a free-form date such as 'March 15, 2024' or 'Dec 15-17, 2023'
+    (a range yields its first day); returns None if the value is unreadable"""
+    value = value.strip()
+    try:
+        parsed = datetime.fromisoformat(value)
+        date_only = len(value) == 10
+    except ValueError:
+        parsed = None
+        date_only = True
+        value = re.sub(r'(\d{1,2})\s*-\s*\d{1,2}(?=,?\s+\d{4})', r'\1', value)
+        for fmt in LEGACY_DATE_FORMATS:
+            try:
+                parsed = datetime.strptime(value, fmt)
+                break
+            except ValueError:
+                continue
+    if parsed is not None and date_only and end_of_day:
+        parsed = datetime.combine(parsed.date(), time(23, 59, 59))
+    return parsed
+
+def legacy_date_columns():
+    """Return the DATE_COLUMNS entries still stored as strings"""
+    inspector = inspect(db.engine)
+    pending = []
+    for table, column, end_of_day in DATE_COLUMNS:
+        if not inspector.has_table(table):
+            continue
+        types = {c['name']: c['type'] for c in inspector.get_columns(table)}
+        if isinstance(types.get(column), String):
+            pending.append((table, column, end_of_day))
+    return pending
+
+def migrate_date_columns(batch_size=1000):
+    """Convert string event dates and challenge deadlines to DATETIME columns.
+
+    Every value is parsed before the schema is touched, so unreadable rows
+    raise ValueError (listing them) and leave the database unchanged. Parsed
+    values are written with batched executemany UPDATEs into a new column that
+    then replaces the old one, all in one transaction (SQLite and PostgreSQL
+    both have transactional DDL), so a failure part way rolls everything
+    back and the command can simply be re-run. Returns the number of columns
+    converted.
+    """
+    pending = legacy_date_columns()
+    if not pending:
+        return 0
+
+    parsed = {}
+    invalid = []
+    for table, column, end_of_day in pending:
+        values = []
+        for row_id, raw in db.session.execute(text(f'SELECT id, {column} FROM {table}')):
+            value = parse_legacy_date(raw, end_of_day) if raw else None
+            if value is None:
+                invalid.append(f'{table} {row_id}: {raw!r}')
+            values.append({'row_id': row_id, 'value': value})
+        parsed[table, column] = values
+    if invalid:
+        raise ValueError('Could not parse these dates, fix them and re-run:\n' + '\n'.join(invalid))
+
+    connection = db.session.connection()
+    begin_explicitly(connection)
+    datetime_type = db.DateTime().compile(dialect=connection.dialect)
+    try:
+        for table, column, _ in pending:
+            new_column = f'{column}_parsed'
+            # Left behind by a run from before this was one transaction
+            if new_column in {c['name'] for c in inspect(connection).get_columns(table)}:
+                connection.execute(text(f'ALTER TABLE {table} DROP COLUMN {new_column}'))
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {new_column} {datetime_type}'))
+            update = text(f'UPDATE {table} SET {new_column} = :value WHERE id = :row_id') \
+                .bindparams(bindparam('value', type_=db.DateTime))
+            values = parsed[table, column]
+            for i in range(0, len(values), batch_size):
+                connection.execute(update, values[i:i + batch_size])
+            connection.execute(text(f'ALTER TABLE {table} DROP COLUMN {column}'))
+            connection.execute(text(f'ALTER TABLE {table} RENAME COLUMN {new_column} TO {column}'))
+
+        # Challenge status is derived from the deadline now
+        if 'status' in {c['name'] for c in inspect(connection).get_columns('challenge')}:
+            connection.execute(text('ALTER TABLE challenge DROP COLUMN status'))
+    except Exception:
+        db.session.rollback()
+        raise
+
+    # Only the converted tables: registration's unique indexes wait until
+    # remove_duplicate_registrations() has run
+    create_missing_indexes(connection, tables={table for table, _, _ in pending})
+    return len(pending)
+
+def begin_explicitly(connection):
+    """Open the transaction now on SQLite. pysqlite only starts one implicitly
+    before INSERT/UPDATE/DELETE, so ALTER TABLE statements issued first would
+    each commit on their own and a failed migration would be half applied."""
+    if connection.dialect.name == 'sqlite' and not connection.connection.dbapi_connection.in_transaction:
+        connection.exec_driver_sql('BEGIN')
+
+def create_missing_indexes(connection=None, tables=None):
+    """Add indexes declared on models to tables that create_all() skipped
+    because they already existed (all tables, or only those named)"""
+    connection = connection or db.session.connection()
+    for table in db.metadata.sorted_tables:
+        if tables is not None and table.name not in tables:
+            continue
+        for index in table.indexes:
+            index.create(bind=connection, checkfirst=True)
+    db.session.commit()
+
+def remove_duplicate_registrations():
+    """Delete repeat registrations of a user for the same event or challenge,
+    keeping the earliest, so the unique indexes on registration can be built.
+    Participant counts are lowered to match; returns the number removed."""
+    inspector = inspect(db.engine)
+    if not inspector.has_table('registration'):
+        return 0
+    existing = {index['name'] for index in inspector.get_indexes('registration')}
+
+    removed = 0
+    connection = db.session.connection()
+    for table, column in (('event', 'event_id'), ('challenge', 'challenge_id')):
+        if f'ux_registration_user_{table}' in existing:
+            continue
+        duplicates = connection.execute(text(
+            f'SELECT r.id, r.{column} FROM registration r '
+            f'WHERE r.{column} IS NOT NULL AND r.id > ('
+            f'SELECT MIN(k.id) FROM registration k '
+            f'WHERE k.user_id = r.user_id AND k.{column} = r.{column})'
+        )).all()
+        if not duplicates:
+            continue
+        counts = {}
+        for _, item_id in duplicates:
+            counts[item_id] = counts.get(item_id, 0) + 1
+        delete = text('DELETE FROM registration WHERE id = :row_id')
+        connection.execute(delete, [{'row_id': row_id} for row_id, _ in duplicates])
+        update = text(f'UPDATE {table} SET participants = participants - :count WHERE id = :item_id')
+        connection.execute(update, [{'count': c, 'item_id': i} for i, c in counts.items()])
+        removed += len(duplicates)
+    db.session.commit()
+    return removed
+
+def add_missing_columns():
+    """Add columns declared on models to tables that already exist; returns
+    the "table.column" names added.
+
+    NOT NULL columns need a server_default to fill the existing rows; one
+    without it raises RuntimeError before anything is changed, rather than
+    leaving the app to fail on the missing column at runtime.
+    """
+    inspector = inspect(db.engine)
+    missing = []
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {c['name'] for c in inspector.get_columns(table.name)}
+        missing.extend((table, column) for column in table.columns if column.name not in existing)
+
+    unfillable = [f'{table.name}.{column.name}' for table, column in missing
+                  if not column.nullable and column.server_default is None]
+    if unfillable:
+        raise RuntimeError('Cannot add NOT NULL columns without a server_default to existing tables, '
+                           'add them by hand: ' + ', '.join(unfillable))
+
+    connection = db.session.connection()
+    for table, column in missing:
+        # CreateColumn renders the type, NOT NULL and server default together
+        spec = CreateColumn(column).compile(dialect=connection.dialect)
+        connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {spec}'))
+    db.session.commit()
+    return [f'{table.name}.{column.name}' for table, column in missing]
@@ -1,23 +1,32 @@
 
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import tuple_
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+from passwords import password_hasher
+from replicas import RoutingSession
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     username = db.Column(db.String(80), unique=True, nullable=False)
-    password_hash = db.Column(db.String(128))
+    password_hash = db.Column(db.String(256))
     college_id = db.Column(db.Integer, db.ForeignKey('college.id'), nullable=True)
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # bump to revoke all of a user's tokens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
 class College(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -28,7 +37,8 @@ class College(db.Model):
     website = db.Column(db.String(200))
     email = db.Column(db.String(120))
     phone = db.Column(db.String(20))
-    logo_url = db.Column(db.Text)
+    logo_url = db.Column(db.Text)  # source image; clients get variants via logo_key
+    logo_key = db.Column(db.String(32), nullable=True)
     description = db.Column(db.Text)
     established_year = db.Column(db.Integer)
     college_type = db.Column(db.String(50))  # Engineering, Medical, Arts, etc.
@@ -40,30 +50,47 @@ class College(db.Model):
     events = db.relationship('Event', backref='college', lazy=True)
     challenges = db.relationship('Challenge', backref='college', lazy=True)
 
+    # Natural key used by the catalog importer
+    __table_args__ = (
+        db.Index('ix_college_name_state', 'name', 'state'),
+    )
+
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     organizer = db.Column(db.String(100), nullable=False)
-    date = db.Column(db.String(50), nullable=False)
+    date = db.Column(db.DateTime, nullable=False)
     location = db.Column(db.String(200), nullable=False)
     price = db.Column(db.Float, default=0.0)
-    image = db.Column(db.Text)
+    image = db.Column(db.Text)  # source image; clients get variants via image_key
+    image_key = db.Column(db.String(32), nullable=True)
     category = db.Column(db.String(50), nullable=False)
     participants = db.Column(db.Integer, default=0)
+    capacity = db.Column(db.Integer, nullable=True)  # None means unlimited seats
     college_id = db.Column(db.Integer, db.ForeignKey('college.id'), nullable=False)
     approved = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Composite indexes matching the keyset order of /api/events, so every
+    # page is an index range scan no matter how deep the cursor is
+    __table_args__ = (
+        db.Index('ix_event_approved_created', 'approved', 'created_at', 'id'),
+        db.Index('ix_event_category_created', 'approved', 'category', 'created_at', 'id'),
+        db.Index('ix_event_college_created', 'college_id', 'approved', 'created_at', 'id'),
+        db.Index('ix_event_approved_price', 'approved', 'price'),
+        db.Index('ix_event_approved_date', 'approved', 'date'),
+    )
+
 class Challenge(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
     description = db.Column(db.Text, nullable=False)
     short_description = db.Column(db.Text)
     category = db.Column(db.String(50), nullable=False)
-    deadline = db.Column(db.String(50), nullable=False)
+    deadline = db.Column(db.DateTime, nullable=False)
     participants = db.Column(db.Integer, default=0)
-    status = db.Column(db.String(20), default='')
+    capacity = db.Column(db.Integer, nullable=True)  # None means unlimited seats
     rules = db.Column(db.Text)
     prizes = db.Column(db.Text)
     price = db.Column(db.Float, default=0.0)
@@ -71,10 +98,143 @@ class Challenge(db.Model):
     approved = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_challenge_approved_deadline', 'approved', 'deadline'),
+    )
+
 class Registration(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True)
     challenge_id = db.Column(db.Integer, db.ForeignKey('challenge.id'), nullable=True)
     payment_status = db.Column(db.String(20), default='pending')
+    stripe_session_id = db.Column(db.String(255), unique=True, nullable=True)
     registered_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    # One registration per user and item; the partial unique indexes also
+    # serve "who registered" lookups, and the user index serves keyset pages
+    # of /api/me/registrations
+    __table_args__ = (
+        db.Index('ux_registration_user_event', 'user_id', 'event_id', unique=True,
+                 sqlite_where=db.text('event_id IS NOT NULL'),
+                 postgresql_where=db.text('event_id IS NOT NULL')),
+        db.Index('ux_registration_user_challenge', 'user_id', 'challenge_id', unique=True,
+                 sqlite_where=db.text('challenge_id IS NOT NULL'),
+                 postgresql_where=db.text('challenge_id IS NOT NULL')),
+        db.Index('ix_registration_event', 'event_id'),
+        db.Index('ix_registration_challenge', 'challenge_id'),
+        db.Index('ix_registration_user_registered', 'user_id', 'registered_at', 'id'),
+    )
+
+class WaitlistEntry(db.Model):
+    """A user queued for a sold-out event or challenge; lower ids are promoted first"""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    event_id = db.Column(db.Integer, db.ForeignKey('event.id'), nullable=True)
+    challenge_id = db.Column(db.Integer, db.ForeignKey('challenge.id'), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ux_waitlist_user_event', 'user_id', 'event_id', unique=True,
+                 sqlite_where=db.text('event_id IS NOT NULL'),
+                 postgresql_where=db.text('event_id IS NOT NULL')),
+        db.Index('ux_waitlist_user_challenge', 'user_id', 'challenge_id', unique=True,
+                 sqlite_where=db.text('challenge_id IS NOT NULL'),
+                 postgresql_where=db.text('challenge_id IS NOT NULL')),
+        db.Index('ix_waitlist_event_order', 'event_id', 'id'),
+        db.Index('ix_waitlist_challenge_order', 'challenge_id', 'id'),
+    )
+
+class MediaImage(db.Model):
+    """A stored image, keyed by a hash of its bytes; its variants live under
+    MEDIA_ROOT and are named by that key"""
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(32), unique=True, nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    width = db.Column(db.Integer, nullable=False)
+    height = db.Column(db.Integer, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CollegeStats(db.Model):
+    """Running dashboard totals for one college, kept current by stats.py"""
+    college_id = db.Column(db.Integer, db.ForeignKey('college.id'), primary_key=True)
+    event_count = db.Column(db.Integer, nullable=False, default=0)  # approved events
+    challenge_count = db.Column(db.Integer, nullable=False, default=0)  # approved challenges
+    participants = db.Column(db.Integer, nullable=False, default=0)
+    registrations = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class CollegeDailyStats(db.Model):
+    """Registrations and revenue for one college on one (UTC) day"""
+    college_id = db.Column(db.Integer, db.ForeignKey('college.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    registrations = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0.0)
+
+class ReplicaHeartbeat(db.Model):
+    """A single row the primary stamps so replicas can tell how far behind
+    they are (see replicas.py); unused on PostgreSQL standbys"""
+    id = db.Column(db.Integer, primary_key=True)
+    beat_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class PaymentEvent(db.Model):
+    """A Stripe webhook event, stored on receipt and finalized in batches"""
+    id = db.Column(db.String(255), primary_key=True)  # Stripe event id, so redeliveries dedupe
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True, index=True)
+
+class Job(db.Model):
+    """A unit of background work, claimed and run by `flask eventify worker`"""
+    id = db.Column(db.Integer, primary_key=True)
+    queue = db.Column(db.String(50), nullable=False, default='default')
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, dead
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_job_claim', 'status', 'queue', 'run_at'),
+    )
+
+# Dialects whose INSERT supports ON CONFLICT
+UPSERT_INSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+def insert_or_ignore(model, values, conflict_columns, conflict_where=None):
+    """Insert a row unless it collides with the unique index on conflict_columns;
+    returns the new primary key, or None if a matching row already exists"""
+    insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(model).values(**values).on_conflict_do_nothing(
+            index_elements=conflict_columns, index_where=conflict_where
+        ).returning(model.id)
+        return db.session.execute(stmt).scalar()
+
+    try:
+        with db.session.begin_nested():
+            row = model(**values)
+            db.session.add(row)
+        return row.id
+    except IntegrityError:
+        return None
+
+def registered_pairs(column, pairs, chunk_size=500):
+    """Return the (user_id, item_id) pairs that already have a registration,
+    where column is Registration.event_id or Registration.challenge_id"""
+    pairs = list(pairs)
+    found = set()
+    for i in range(0, len(pairs), chunk_size):
+        rows = db.session.query(Registration.user_id, column).filter(
+            column.isnot(None), tuple_(Registration.user_id, column).in_(pairs[i:i + chunk_size])
+        )
+        found.update((user_id, item_id) for user_id, item_id in rows)
+    return found
@@ -0,0 +1,93 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash, check_password_hash, DEFAULT_PBKDF2_ITERATIONS
+
+def canonical_method(method):
+    """Spell out Werkzeug's defaults so a method compares equal to the
+    prefix it writes into stored hashes"""
+    name, *args = method.split(':')
+    if name == 'scrypt' and not args:
+        args = ['32768', '8', '1']
+    elif name == 'pbkdf2':
+        args = args or ['sha256']
+        if len(args) == 1:
+            args.append(str(DEFAULT_PBKDF2_ITERATIONS))
+    return ':'.join([name] + args)
+
+class HasherBusy(Exception):
+    """Raised when too many hashes are already queued for the pool"""
+
+class PasswordHasher:
+    """Runs password hashing in a bounded process pool.
+
+    Hashing is pure CPU, so doing it on the request thread holds the GIL and
+    caps logins per worker. Work is handed to a process pool instead, and a
+    semaphore bounds how much can queue up: once PASSWORD_HASH_MAX_PENDING
+    hashes are in flight, callers wait at most PASSWORD_HASH_QUEUE_TIMEOUT
+    seconds and then get HasherBusy. Setting PASSWORD_HASH_WORKERS to 0 hashes
+    inline, which is handy for development and scripts.
+    """
+
+    def __init__(self, app=None):
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self.configure()
+        if app is not None:
+            self.init_app(app)
+
+    def configure(self, method='scrypt:32768:8:1', workers=0, max_pending=1, queue_timeout=2.0):
+        self.method = canonical_method(method)
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+        app.config.setdefault('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('PASSWORD_HASH_MAX_PENDING', 4 * app.config['PASSWORD_HASH_WORKERS'])
+        app.config.setdefault('PASSWORD_HASH_QUEUE_TIMEOUT', 2.0)
+
+        self.configure(
+            method=app.config['PASSWORD_HASH_METHOD'],
+            workers=app.config['PASSWORD_HASH_WORKERS'],
+            max_pending=app.config['PASSWORD_HASH_MAX_PENDING'],
+            queue_timeout=app.config['PASSWORD_HASH_QUEUE_TIMEOUT']
+        )
+        app.extensions['password_hasher'] = self
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise HasherBusy('Too many password hashes pending, try again shortly')
+        try:
+            # The pool is created on first use so importing the app stays cheap
+            if self._pool is None:
+                with self._pool_lock:
+                    if self._pool is None:
+                        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool.submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different algorithm or cost"""
+        return password_hash.split('$', 1)[0] != self.method
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+password_hasher = PasswordHasher()
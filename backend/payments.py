@@ -0,0 +1,279 @@
+import hashlib
+import json
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from cache import LRUCache, response_cache
+from jobs import enqueue_many
+from models import db, Event, Challenge, Registration, PaymentEvent, registered_pairs
+from admission import reserve_up_to
+from live import live_counts
+from stats import record_registrations
+
+class StripeGateway:
+    """Checkout session creation and webhook verification for Stripe.
+
+    All calls share one keep-alive requests session with a bounded connection
+    pool, and carry an idempotency key derived from (user, item) so client or
+    network retries never create a second session. Sessions that are still
+    open are remembered for STRIPE_SESSION_CACHE_TTL seconds and handed back
+    directly. STRIPE_API_BASE points the client at a local fake Stripe server
+    for testing.
+    """
+
+    def __init__(self, app=None):
+        self._stripe = None
+        self._lock = threading.Lock()
+        self.open_sessions = LRUCache(max_entries=10000, default_ttl=1800)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('STRIPE_API_BASE', 'https://api.stripe.com')
+        app.config.setdefault('STRIPE_WEBHOOK_SECRET', '')
+        app.config.setdefault('STRIPE_HTTP_POOL_SIZE', 10)
+        app.config.setdefault('STRIPE_TIMEOUT', 10)
+        app.config.setdefault('STRIPE_SESSION_CACHE_TTL', 1800)
+        self.config = app.config
+        self._stripe = None
+        self.open_sessions = LRUCache(max_entries=10000, default_ttl=app.config['STRIPE_SESSION_CACHE_TTL'])
+        app.extensions['stripe_gateway'] = self
+
+    @property
+    def stripe(self):
+        # Imported and configured on first use so workers don't pay for it at boot
+        if self._stripe is None:
+            with self._lock:
+                if self._stripe is None:
+                    import requests
+                    import stripe
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(
+                        pool_connections=1, pool_maxsize=self.config['STRIPE_HTTP_POOL_SIZE']
+                    )
+                    session.mount('https://', adapter)
+                    session.mount('http://', adapter)
+                    stripe.api_key = self.config['STRIPE_SECRET_KEY']
+                    stripe.api_base = self.config['STRIPE_API_BASE']
+                    stripe.default_http_client = stripe.http_client.RequestsClient(
+                        timeout=self.config['STRIPE_TIMEOUT'], session=session
+                    )
+                    # Safe to retry because every create carries an idempotency key
+                    stripe.max_network_retries = 2
+                    self._stripe = stripe
+        return self._stripe
+
+    def idempotency_key(self, user_id, kind, item_id):
+        ttl = self.config['STRIPE_SESSION_CACHE_TTL']
+        window = int(time.time() // ttl)
+        raw = f"checkout:{user_id}:{kind}:{item_id}:{window}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def checkout_url(self, user_id, kind, item, success_url, cancel_url):
+        """Return the URL of an open checkout session for this user and item"""
+        cache_key = f"{user_id}:{kind}:{item.id}"
+        url = self.open_sessions.get(cache_key)
+        if url is not None:
+            return url
+
+        session = self.stripe.checkout.Session.create(
+            idempotency_key=self.idempotency_key(user_id, kind, item.id),
+            payment_method_types=['card'],
+            line_items=[{
+                'price_data': {
+                    'currency': 'inr',
+                    'product_data': {
+                        'name': item.title,
+                    },
+                    'unit_amount': int(item.price * 100),
+                },
+                'quantity': 1,
+            }],
+            mode='payment',
+            client_reference_id=str(user_id),
+            metadata={'user_id': str(user_id), f'{kind}_id': str(item.id)},
+            success_url=success_url,
+            cancel_url=cancel_url,
+        )
+        self.open_sessions.set(cache_key, session.url)
+        return session.url
+
+    def construct_event(self, payload, signature):
+        """Verify a webhook delivery and return the parsed event"""
+        return self.stripe.Webhook.construct_event(
+            payload, signature, self.config['STRIPE_WEBHOOK_SECRET']
+        )
+
+stripe_gateway = StripeGateway()
+
+def record_payment_event(event):
+    """Store a verified webhook event; redeliveries of the same id are ignored"""
+    if db.session.get(PaymentEvent, event['id']) is not None:
+        return False
+    db.session.add(PaymentEvent(id=event['id'], type=event['type'], payload=json.dumps(event)))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+def metadata_id(metadata, name):
+    """An optional id from checkout metadata, which Stripe returns as strings"""
+    value = metadata.get(name)
+    if value is None or value == '':
+        return None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.isascii() and value.isdigit():
+        return int(value)
+    raise ValueError(f'metadata.{name} is not an id: {value!r}')
+
+def paid_registration(payment_event):
+    """Registration fields for a paid checkout.session.completed event, or
+    None for anything else; raises ValueError for payloads that can't be used"""
+    if payment_event.type != 'checkout.session.completed':
+        return None
+    try:
+        session = json.loads(payment_event.payload)['data']['object']
+        if session.get('payment_status') != 'paid':
+            return None
+        metadata = session.get('metadata') or {}
+        session_id = session['id']
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        raise ValueError(f'malformed payload ({e!r})')
+    mapping = {
+        'user_id': metadata_id(metadata, 'user_id'),
+        'event_id': metadata_id(metadata, 'event_id'),
+        'challenge_id': metadata_id(metadata, 'challenge_id'),
+        'payment_status': 'completed',
+        'stripe_session_id': session_id
+    }
+    if mapping['user_id'] is None:
+        raise ValueError('metadata.user_id is missing')
+    if (mapping['event_id'] is None) == (mapping['challenge_id'] is None):
+        raise ValueError('metadata needs exactly one of event_id or challenge_id')
+    return mapping
+
+def process_payment_events(batch_size=500):
+    """Finalize registrations for a batch of unprocessed webhook events.
+
+    Completed checkouts become Registration rows with one bulk insert and one
+    counter update per item. Events that can't be used are logged and marked
+    processed so they never hold up the rest. If the batch conflicts with
+    rows written meanwhile (e.g. by another worker), it is settled again one
+    event at a time, so only the conflicting events are set aside. Returns
+    the number of events processed.
+    """
+    events = PaymentEvent.query.filter(PaymentEvent.processed_at.is_(None)) \
+        .order_by(PaymentEvent.received_at).limit(batch_size).all()
+    if not events:
+        return 0
+    event_ids = [payment_event.id for payment_event in events]
+
+    try:
+        counts = finalize_payment_events(events)
+    except IntegrityError:
+        db.session.rollback()
+        counts = {'event': Counter(), 'challenge': Counter()}
+        for event_id in event_ids:
+            payment_event = db.session.get(PaymentEvent, event_id)
+            if payment_event is None or payment_event.processed_at is not None:
+                continue
+            try:
+                for kind, item_counts in finalize_payment_events([payment_event]).items():
+                    counts[kind].update(item_counts)
+            except IntegrityError as e:
+                db.session.rollback()
+                current_app.logger.error('Payment event %s conflicts with existing data, skipped: %s',
+                                         event_id, e.orig)
+                PaymentEvent.query.filter(PaymentEvent.id == event_id) \
+                    .update({PaymentEvent.processed_at: datetime.utcnow()}, synchronize_session=False)
+                db.session.commit()
+
+    if counts['event'] or counts['challenge']:
+        response_cache.invalidate('participants')
+        live_counts.touch(Event, counts['event'])
+        live_counts.touch(Challenge, counts['challenge'])
+    return len(events)
+
+def finalize_payment_events(events):
+    """Register the paid checkouts among events and mark them all processed,
+    in one transaction; returns the new registrations per kind and item"""
+    sessions = {}
+    for payment_event in events:
+        try:
+            mapping = paid_registration(payment_event)
+        except ValueError as e:
+            current_app.logger.error('Payment event %s skipped, needs manual review: %s', payment_event.id, e)
+            continue
+        if mapping is not None:
+            sessions[mapping['stripe_session_id']] = mapping
+
+    already_registered = {row[0] for row in db.session.query(Registration.stripe_session_id)
+                          .filter(Registration.stripe_session_id.in_(list(sessions)))} if sessions else set()
+    paid = [mapping for session_id, mapping in sessions.items() if session_id not in already_registered]
+
+    # A second paid checkout for the same item can't add another registration
+    registered = {
+        'event': registered_pairs(Registration.event_id, {
+            (m['user_id'], m['event_id']) for m in paid if m['event_id']}),
+        'challenge': registered_pairs(Registration.challenge_id, {
+            (m['user_id'], m['challenge_id']) for m in paid if m['challenge_id']})
+    }
+
+    accepted = []
+    wanted = {'event': Counter(), 'challenge': Counter()}
+    for mapping in paid:
+        kind = 'event' if mapping['event_id'] else 'challenge'
+        pair = (mapping['user_id'], mapping[f'{kind}_id'])
+        if pair in registered[kind]:
+            current_app.logger.warning(
+                'Duplicate paid checkout %s for user %s %s %s, needs a refund',
+                mapping['stripe_session_id'], pair[0], kind, pair[1]
+            )
+            continue
+        registered[kind].add(pair)
+        accepted.append((kind, pair[1], mapping))
+        wanted[kind][pair[1]] += 1
+
+    # Seats are only taken now, so checkouts that complete after an item
+    # sold out are refused rather than oversold
+    seats = {
+        'event': {item_id: reserve_up_to(Event, item_id, count) for item_id, count in sorted(wanted['event'].items())},
+        'challenge': {item_id: reserve_up_to(Challenge, item_id, count) for item_id, count in sorted(wanted['challenge'].items())}
+    }
+    mappings = []
+    event_counts = Counter()
+    challenge_counts = Counter()
+    for kind, item_id, mapping in accepted:
+        if not seats[kind][item_id]:
+            current_app.logger.warning(
+                'Paid checkout %s for user %s %s %s arrived after it sold out, needs a refund',
+                mapping['stripe_session_id'], mapping['user_id'], kind, item_id
+            )
+            continue
+        seats[kind][item_id] -= 1
+        (event_counts if kind == 'event' else challenge_counts)[item_id] += 1
+        mappings.append(mapping)
+
+    if mappings:
+        db.session.bulk_insert_mappings(Registration, mappings)
+        record_registrations(Event, event_counts)
+        record_registrations(Challenge, challenge_counts)
+
+        payloads = [{'stripe_session_id': m['stripe_session_id']} for m in mappings]
+        enqueue_many('send_registration_confirmation', payloads)
+        enqueue_many('send_receipt', payloads)
+
+    now = datetime.utcnow()
+    for payment_event in events:
+        payment_event.processed_at = now
+
+    db.session.commit()
+    return {'event': event_counts, 'challenge': challenge_counts}
@@ -0,0 +1,194 @@
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, jsonify, make_response
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+# Rule name -> "N/period"; each rule is one token bucket holding N tokens
+# that refills at N per period. RATELIMITS in the app config overrides these.
+DEFAULT_LIMITS = {
+    'login:ip': '60/minute',
+    'login:email': '10/minute',
+    'register:ip': '10/minute',
+    'register-event:user': '30/minute',
+    'register-event:ip': '120/minute',
+}
+
+def parse_limit(value):
+    """Parse "10/minute" (or "10/5 minutes") into (capacity, tokens per second)"""
+    match = re.fullmatch(r'\s*(\d+)\s*/\s*(\d*)\s*(second|minute|hour|day)s?\s*', value)
+    if not match:
+        raise ValueError(f'Invalid rate limit {value!r}')
+    count, multiple, period = match.groups()
+    seconds = PERIODS[period] * int(multiple or 1)
+    return int(count), int(count) / seconds
+
+def parse_limits(value):
+    """Parse "login:ip=60/minute,login:email=10/minute" from the environment"""
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(','))):
+        name, _, limit = item.partition('=')
+        limits[name.strip()] = limit.strip()
+    return limits
+
+class MemoryBuckets:
+    """Token buckets in a bounded in-process LRU; each check is one dict update"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        """Try to take cost tokens; returns (allowed, tokens left)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated_at = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated_at) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, tokens
+
+class RedisBuckets:
+    """Token buckets shared between workers, for any client exposing the
+    redis-py register_script API. The refill and take run as one script so
+    concurrent requests can't overdraw a bucket."""
+
+    SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local clock = redis.call('TIME')
+    local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+    local tokens = tonumber(state[1]) or capacity
+    local updated_at = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, client, prefix='eventify:ratelimit:'):
+        self.prefix = prefix
+        self._take = client.register_script(self.SCRIPT)
+
+    def take(self, key, capacity, rate, cost=1):
+        allowed, tokens = self._take(keys=[self.prefix + key], args=[capacity, rate, cost])
+        return bool(allowed), float(tokens)
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+def submitted_email():
+    data = request.get_json(silent=True)
+    email = data.get('email') if isinstance(data, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+def jwt_user():
+    from flask_jwt_extended import get_jwt_identity
+    identity = get_jwt_identity()
+    return str(identity) if identity is not None else None
+
+class RateLimiter:
+    """Per-route token-bucket limits keyed by client IP and/or identity.
+
+    Checks never touch the database. Responses carry RateLimit-Limit,
+    RateLimit-Remaining and RateLimit-Reset for the tightest bucket, and
+    rejected requests get a 429 with Retry-After. RATELIMIT_STORAGE=redis
+    shares buckets between workers; a store can also be passed in directly.
+    """
+
+    def __init__(self, app=None, store=None):
+        self.store = store
+        self._fixed_store = store is not None
+        self.enabled = True
+        self.limits = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_STORAGE', 'memory')
+        app.config.setdefault('RATELIMIT_REDIS_URL', app.config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+        app.config.setdefault('RATELIMITS', {})
+
+        self.enabled = app.config['RATELIMIT_ENABLED']
+        limits = dict(DEFAULT_LIMITS, **app.config['RATELIMITS'])
+        # An empty limit switches that rule off
+        self.limits = {name: parse_limit(limit) for name, limit in limits.items() if limit}
+
+        if not self._fixed_store:
+            if app.config['RATELIMIT_STORAGE'] == 'redis':
+                import redis
+                self.store = RedisBuckets(redis.Redis.from_url(app.config['RATELIMIT_REDIS_URL']))
+            else:
+                self.store = MemoryBuckets()
+        app.extensions['rate_limiter'] = self
+
+    def check(self, route, keys):
+        """Take a token from each configured bucket; returns (allowed, headers)"""
+        tightest = None
+        for kind, key_func in keys:
+            name = f'{route}:{kind}'
+            limit = self.limits.get(name)
+            if limit is None:
+                continue
+            value = key_func()
+            if value is None:
+                continue
+            capacity, rate = limit
+            allowed, tokens = self.store.take(f'{name}:{value}', capacity, rate)
+            state = (allowed, tokens, capacity, rate)
+            if not allowed:
+                tightest = state
+                break
+            if tightest is None or tokens < tightest[1]:
+                tightest = state
+
+        if tightest is None:
+            return True, {}
+        allowed, tokens, capacity, rate = tightest
+        headers = {
+            'RateLimit-Limit': str(capacity),
+            'RateLimit-Remaining': str(int(tokens)),
+            'RateLimit-Reset': str(math.ceil((capacity - tokens) / rate))
+        }
+        if not allowed:
+            headers['Retry-After'] = str(math.ceil((1 - tokens) / rate))
+        return allowed, headers
+
+    def limit(self, route, **keys):
+        """Decorate a view with the RATELIMITS rules named "<route>:<key>",
+        e.g. limit('login', ip=client_ip, email=submitted_email)"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                allowed, headers = self.check(route, keys.items())
+                if not allowed:
+                    response = jsonify({'error': 'Too many requests, slow down'})
+                    response.status_code = 429
+                else:
+                    response = make_response(view(*args, **kwargs))
+                response.headers.update(headers)
+                return response
+            return wrapper
+        return decorator
+
+rate_limiter = RateLimiter()
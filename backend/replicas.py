@@ -0,0 +1,160 @@
+import sqlite3
+import time
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import DateTime, text
+from sqlalchemy.exc import SQLAlchemyError
+
+from cache import LRUCache, RedisCache
+
+REPLICA_BIND = 'replica'
+
+# On a PostgreSQL standby: 0 when everything received has been replayed (an
+# idle primary isn't lag), else the age of the last replayed transaction.
+# NULL on a server that isn't a standby.
+POSTGRESQL_LAG = text("""
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+""")
+HEARTBEAT = text('SELECT beat_at FROM replica_heartbeat WHERE id = 1').columns(beat_at=DateTime)
+
+class RoutingSession(Session):
+    """Session that sends plain SELECTs to the replica engine while the
+    current request is marked with g.read_replica; everything else (flushes,
+    bulk UPDATE/DELETE, SELECT ... FOR UPDATE, raw SQL) stays on the primary"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context() and g.get('read_replica') \
+                and getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None:
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+class ReplicaRouter:
+    """Optional read replica for catalog GETs.
+
+    With REPLICA_DATABASE_URL set, views decorated with reads() run their
+    SELECTs on the replica unless:
+      * the replica is more than REPLICA_MAX_LAG seconds behind (checked at
+        most every REPLICA_LAG_CHECK_INTERVAL seconds per process; an
+        unreachable replica counts as infinitely behind), or
+      * the same user (or, signed out, the same IP) made a successful write
+        within the last REPLICA_STICKY_SECONDS, so they read their own writes.
+    Lag comes from PostgreSQL's replay position on a standby, and otherwise
+    from the replica_heartbeat row the primary writes (see replica-sync).
+    """
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.pins = None
+        self._lag = float('inf')
+        self._lag_checked_at = float('-inf')
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('REPLICA_DATABASE_URL', '')
+        app.config.setdefault('REPLICA_MAX_LAG', 5)
+        app.config.setdefault('REPLICA_STICKY_SECONDS', 10)
+        app.config.setdefault('REPLICA_LAG_CHECK_INTERVAL', 1)
+        self.config = app.config
+        self.enabled = bool(app.config['REPLICA_DATABASE_URL'])
+        self._lag_checked_at = float('-inf')
+        if not self.enabled:
+            return
+
+        if app.config.get('CACHE_BACKEND') == 'redis':
+            import redis
+            client = redis.Redis.from_url(app.config['CACHE_REDIS_URL'])
+            self.pins = RedisCache(client, default_ttl=app.config['REPLICA_STICKY_SECONDS'], prefix='eventify:pin:')
+        else:
+            self.pins = LRUCache(max_entries=100000, default_ttl=app.config['REPLICA_STICKY_SECONDS'])
+        app.after_request(self.after_request)
+        app.extensions['replica_router'] = self
+
+    def requester(self):
+        from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+        try:
+            verify_jwt_in_request(optional=True)
+            identity = get_jwt_identity()
+        except Exception:
+            identity = None
+        return f'user:{identity}' if identity is not None else f'ip:{request.remote_addr}'
+
+    def after_request(self, response):
+        # Pin the writer to the primary for long enough to cover replica lag
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            self.pins.set(self.requester(), b'1')
+        return response
+
+    def lag(self):
+        """Replica lag in seconds, re-measured at most once per check interval"""
+        now = time.monotonic()
+        if now - self._lag_checked_at < self.config['REPLICA_LAG_CHECK_INTERVAL']:
+            return self._lag
+        self._lag_checked_at = now
+        self._lag = self.measure_lag()
+        return self._lag
+
+    def measure_lag(self):
+        from models import db
+        engine = db.engines[REPLICA_BIND]
+        try:
+            with engine.connect() as connection:
+                if connection.dialect.name == 'postgresql':
+                    lag = connection.execute(POSTGRESQL_LAG).scalar()
+                    if lag is not None:
+                        return float(lag)
+                beat_at = connection.execute(HEARTBEAT).scalar()
+        except SQLAlchemyError as e:
+            current_app.logger.warning('Replica unavailable, reading from the primary: %s', e)
+            return float('inf')
+        if beat_at is None:
+            return float('inf')
+        return max(0.0, (datetime.utcnow() - beat_at).total_seconds())
+
+    def reads(self, view):
+        """Decorate a GET view whose queries may be served by the replica.
+        Goes above response_cache.cached() so the cache knows where the
+        response comes from: pinned requesters skip it, and responses built
+        on the replica are cached apart from the primary's."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if self.enabled:
+                if self.pins.get(self.requester()) is not None:
+                    g.skip_response_cache = True
+                elif self.lag() <= self.config['REPLICA_MAX_LAG']:
+                    g.read_replica = True
+            return view(*args, **kwargs)
+        return wrapper
+
+def beat():
+    """Stamp the heartbeat row on the primary; replicas measure lag against it"""
+    from models import db, ReplicaHeartbeat
+    db.session.merge(ReplicaHeartbeat(id=1, beat_at=datetime.utcnow()))
+    db.session.commit()
+
+def copy_sqlite(primary, replica):
+    """Copy the primary engine's SQLite file onto the replica's with the
+    online backup API, so a second file can stand in for a streaming replica
+    during development. Engine URLs are used because Flask-SQLAlchemy has
+    already resolved relative paths against the instance folder."""
+    paths = [engine.url.database for engine in (primary, replica)]
+    if not all(engine.url.get_backend_name() == 'sqlite' for engine in (primary, replica)) \
+            or any(path in (None, '', ':memory:') for path in paths):
+        raise ValueError('Both databases must be SQLite files')
+    source, target = (sqlite3.connect(path) for path in paths)
+    try:
+        source.backup(target)
+    finally:
+        source.close()
+        target.close()
+
+replica_router = ReplicaRouter()
@@ -0,0 +1,174 @@
+import re
+
+from sqlalchemy import event, text
+
+from models import db, College, Event, Challenge
+
+# Each indexed row gets rowid = item id * len(KINDS) + kind code, so syncing a
+# single row is a primary-key delete/insert rather than a scan
+KINDS = {'event': 1, 'challenge': 2, 'college': 3}
+
+SQLITE_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5(
+    title, body,
+    kind UNINDEXED, item_id UNINDEXED, description UNINDEXED, location UNINDEXED,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+POSTGRES_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS search_index (
+        rowid BIGINT PRIMARY KEY,
+        title TEXT,
+        body TEXT,
+        kind VARCHAR(20) NOT NULL,
+        item_id INTEGER NOT NULL,
+        description TEXT,
+        location TEXT,
+        document TSVECTOR GENERATED ALWAYS AS (
+            setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+        ) STORED
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index USING GIN (document)"
+]
+
+SQLITE_QUERY = """
+SELECT kind, item_id, title, description, location
+FROM search_index
+WHERE search_index MATCH :query {kind_filter}
+ORDER BY bm25(search_index, 10.0, 1.0)
+LIMIT :limit OFFSET :offset
+"""
+
+POSTGRES_QUERY = """
+SELECT kind, item_id, title, description, location
+FROM search_index
+WHERE document @@ to_tsquery('simple', :query) {kind_filter}
+ORDER BY ts_rank(document, to_tsquery('simple', :query)) DESC, rowid
+LIMIT :limit OFFSET :offset
+"""
+
+def join_text(*parts, sep=' '):
+    return sep.join(part for part in parts if part)
+
+def document_for(kind, row):
+    """Build the indexed fields for an event, challenge or college row"""
+    if kind == 'event':
+        return {
+            'title': row.title,
+            'body': join_text(row.description, row.organizer, row.category),
+            'description': row.description,
+            'location': row.location
+        }
+    if kind == 'challenge':
+        return {
+            'title': row.title,
+            'body': join_text(row.short_description, row.description),
+            'description': row.short_description,
+            'location': None
+        }
+    return {
+        'title': row.name,
+        'body': join_text(row.short_name, row.location, row.state),
+        'description': row.college_type,
+        'location': join_text(row.location, row.state, sep=', ')
+    }
+
+def index_row(connection, kind, row):
+    """Replace the index entry for one row, dropping it if the row is unapproved"""
+    rowid = row.id * len(KINDS) + KINDS[kind]
+    connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': rowid})
+    if row.approved:
+        params = document_for(kind, row)
+        params.update(rowid=rowid, kind=kind, item_id=row.id)
+        connection.execute(text(
+            "INSERT INTO search_index (rowid, title, body, kind, item_id, description, location) "
+            "VALUES (:rowid, :title, :body, :kind, :item_id, :description, :location)"
+        ), params)
+
+def unindex_row(connection, kind, row):
+    rowid = row.id * len(KINDS) + KINDS[kind]
+    connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {'rowid': rowid})
+
+def is_supported(dialect_name):
+    return dialect_name in ('sqlite', 'postgresql')
+
+def create_search_index():
+    """Create the search index if missing; returns True if it was just created"""
+    dialect_name = db.engine.dialect.name
+    if not is_supported(dialect_name):
+        return False
+
+    exists = db.session.execute(text(
+        "SELECT name FROM sqlite_master WHERE name = 'search_index'"
+        if dialect_name == 'sqlite' else
+        "SELECT to_regclass('search_index')"
+    )).scalar()
+    statements = [SQLITE_SCHEMA] if dialect_name == 'sqlite' else POSTGRES_SCHEMA
+    for statement in statements:
+        db.session.execute(text(statement))
+    db.session.commit()
+    return not exists
+
+def rebuild_search_index():
+    """Re-index every approved event, challenge and college"""
+    if not is_supported(db.engine.dialect.name):
+        return
+    connection = db.session.connection()
+    connection.execute(text("DELETE FROM search_index"))
+    for kind, model in (('event', Event), ('challenge', Challenge), ('college', College)):
+        for row in db.session.query(model).filter_by(approved=True).yield_per(1000):
+            index_row(connection, kind, row)
+    db.session.commit()
+
+def build_query(dialect_name, terms):
+    """Turn free text into an AND of prefix terms for the active backend"""
+    words = re.findall(r'\w+', terms.lower())
+    if not words:
+        return None
+    if dialect_name == 'sqlite':
+        return ' '.join(f'"{word}"*' for word in words)
+    return ' & '.join(f'{word}:*' for word in words)
+
+def search(terms, kind=None, limit=20, offset=0):
+    """Return ranked search results as dicts, best match first"""
+    dialect_name = db.engine.dialect.name
+    if not is_supported(dialect_name):
+        raise NotImplementedError(f'Search is not supported on {dialect_name}')
+
+    query = build_query(dialect_name, terms)
+    if query is None:
+        return []
+
+    sql = SQLITE_QUERY if dialect_name == 'sqlite' else POSTGRES_QUERY
+    sql = sql.format(kind_filter='AND kind = :kind' if kind else '')
+    rows = db.session.execute(text(sql), {
+        'query': query, 'kind': kind, 'limit': limit, 'offset': offset
+    })
+    return [{
+        'type': row.kind,
+        'id': int(row.item_id),
+        'title': row.title,
+        'description': row.description,
+        'location': row.location
+    } for row in rows]
+
+def _listen(model, kind):
+    @event.listens_for(model, 'after_insert')
+    @event.listens_for(model, 'after_update')
+    def sync(mapper, connection, target):
+        if is_supported(connection.dialect.name):
+            index_row(connection, kind, target)
+
+    @event.listens_for(model, 'after_delete')
+    def remove(mapper, connection, target):
+        if is_supported(connection.dialect.name):
+            unindex_row(connection, kind, target)
+
+_listen(Event, 'event')
+_listen(Challenge, 'challenge')
+_listen(College, 'college')
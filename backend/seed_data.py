@@ -1,6 +1,11 @@
 
 import json
+from datetime import datetime
 from models import db, College, Event, Challenge
+from cache import response_cache
+from importer import import_colleges
+from search import rebuild_search_index
+from stats import rebuild_college_stats
 
 def get_indian_colleges():
     """Return a list of real Indian colleges with their data"""
@@ -149,28 +154,19 @@ def get_indian_colleges():
 
 def seed_colleges():
     """Add real college data to the database"""
-    colleges_data = get_indian_colleges()
-    
-    for college_data in colleges_data:
-        # Check if college already exists
-        existing_college = College.query.filter_by(name=college_data["name"]).first()
-        if not existing_college:
-            college = College(**college_data)
-            db.session.add(college)
-    
-    db.session.commit()
-    print(f"Added {len(colleges_data)} colleges to database")
+    totals = import_colleges(get_indian_colleges())
+    print(f"Added {totals['inserted']} colleges to database")
 
 def seed_sample_events():
-    """Add sample events for the colleges"""
-    colleges = College.query.all()
+    """Add sample events for the colleges, skipping any already present"""
+    college_ids = [row[0] for row in db.session.query(College.id).order_by(College.id).limit(5)]
     
     sample_events = [
         {
             "title": "Tech Innovation Summit 2024",
             "description": "Annual technology conference featuring latest innovations in AI, ML, and Web3",
             "organizer": "Tech Society",
-            "date": "March 15, 2024",
+            "date": datetime(2024, 3, 15),
             "location": "Main Auditorium",
             "price": 2999,
             "image": "https://images.unsplash.com/photo-1540575467063-178a50c2df87",
@@ -181,7 +177,7 @@ def seed_sample_events():
             "title": "Cultural Fest 2024",
             "description": "Annual cultural festival with music, dance, and art competitions",
             "organizer": "Cultural Committee",
-            "date": "April 20, 2024",
+            "date": datetime(2024, 4, 20),
             "location": "Campus Grounds",
             "price": 1500,
             "image": "https://images.unsplash.com/photo-1559136555-9303baea8ebd",
@@ -192,7 +188,7 @@ def seed_sample_events():
             "title": "Hackathon 2024",
             "description": "48-hour coding competition to solve real-world problems",
             "organizer": "Programming Club",
-            "date": "May 10, 2024",
+            "date": datetime(2024, 5, 10),
             "location": "Computer Center",
             "price": 999,
             "image": "https://images.unsplash.com/photo-1504384308090-c894fdcc538d",
@@ -201,19 +197,27 @@ def seed_sample_events():
         }
     ]
     
-    for college in colleges[:5]:  # Add events to first 5 colleges
-        for event_data in sample_events:
-            event = Event(
-                **event_data,
-                college_id=college.id
-            )
-            db.session.add(event)
-    
+    # One query finds the (college, title) pairs that already exist
+    titles = [event_data["title"] for event_data in sample_events]
+    existing = set(db.session.query(Event.college_id, Event.title).filter(
+        Event.college_id.in_(college_ids), Event.title.in_(titles)
+    ))
+    mappings = [
+        dict(event_data, college_id=college_id)
+        for college_id in college_ids  # Add events to first 5 colleges
+        for event_data in sample_events
+        if (college_id, event_data["title"]) not in existing
+    ]
+    db.session.bulk_insert_mappings(Event, mappings)
     db.session.commit()
-    print("Added sample events to colleges")
+    print(f"Added {len(mappings)} sample events to colleges")
 
 def seed_all():
     """Seed all data"""
     seed_colleges()
     seed_sample_events()
+    # Bulk inserts skip the mapper events, so refresh derived tables once
+    rebuild_search_index()
+    rebuild_college_stats()
+    response_cache.invalidate()
     print("Database seeded successfully!")
@@ -0,0 +1,167 @@
+import json
+from datetime import datetime, timedelta
+
+from flask import Response, stream_with_context
+
+from media import image_source, variant_url, thumbnail_url
+from models import db, User, College, Event, Challenge, Registration, CollegeStats, CollegeDailyStats
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(data):
+    """Encode data as compact JSON bytes, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+class Field:
+    """One output key, read from a selected column and optionally transformed"""
+
+    def __init__(self, column, key=None, transform=None):
+        self.column = column
+        self.key = key or column.key
+        self.transform = transform
+
+class Serializer:
+    """Declarative row serializer.
+
+    Fields name the columns to select; dump() turns the resulting row tuples
+    straight into dicts, so list endpoints never hydrate ORM instances. Extra
+    columns selected after the serializer's own (e.g. keyset columns) are
+    ignored.
+    """
+
+    def __init__(self, *fields):
+        self.fields = [f if isinstance(f, Field) else Field(f) for f in fields]
+        self.columns = [f.column for f in self.fields]
+        self.keys = [f.key for f in self.fields]
+        self.transforms = [(f.key, i, f.transform) for i, f in enumerate(self.fields) if f.transform]
+
+    def query(self, *extra_columns):
+        return db.session.query(*self.columns, *extra_columns)
+
+    def dump(self, row):
+        data = dict(zip(self.keys, row))
+        for key, index, transform in self.transforms:
+            data[key] = transform(row[index])
+        return data
+
+    def dump_instance(self, obj):
+        """Serialize an ORM instance that is already loaded, e.g. after an insert"""
+        return self.dump([getattr(obj, f.column.key) for f in self.fields])
+
+    def dump_many(self, rows):
+        return [self.dump(row) for row in rows]
+
+    def response(self, row):
+        return json_response(self.dump(row))
+
+    def list_response(self, rows):
+        return json_response(self.dump_many(rows))
+
+    def stream_response(self, rows, chunk_size=500):
+        """Stream a JSON array without building the whole list in memory"""
+        def generate():
+            yield b'['
+            chunk = []
+            first = True
+            for row in rows:
+                chunk.append(self.dump(row))
+                if len(chunk) >= chunk_size:
+                    yield (b'' if first else b',') + dumps(chunk)[1:-1]
+                    first = False
+                    chunk = []
+            if chunk:
+                yield (b'' if first else b',') + dumps(chunk)[1:-1]
+            yield b']'
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+def isoformat(value):
+    return value.isoformat() if value else None
+
+def split_rules(rules):
+    return rules.split('|') if rules else []
+
+CLOSING_SOON = timedelta(days=7)
+
+def challenge_status(deadline):
+    """Derive a challenge's badge from its deadline each time it is serialized"""
+    now = datetime.utcnow()
+    if deadline < now:
+        return 'Closed'
+    if deadline - now <= CLOSING_SOON:
+        return 'Closing Soon'
+    return ''
+
+college_name = Field(College.name.label('college_name'), 'college_name')
+
+user_serializer = Serializer(User.id, User.email, User.username, User.college_id)
+
+# Lists carry variant URLs, never the stored source (which may be a data URI)
+def image_field(key_column, source_column, key, transform=variant_url):
+    return Field(image_source(key_column, source_column).label(key), key, transform=transform)
+
+college_serializer = Serializer(
+    College.id, College.name, College.short_name, College.location, College.state,
+    College.website, College.email, College.phone,
+    image_field(College.logo_key, College.logo_url, 'logo_url'),
+    College.description, College.established_year, College.college_type,
+    College.affiliation
+)
+
+pending_college_serializer = Serializer(
+    College.id, College.name, College.short_name, College.location, College.state,
+    Field(College.created_at, transform=isoformat)
+)
+
+event_fields = (
+    Event.id, Event.title, Event.description, Event.organizer,
+    Field(Event.date, transform=isoformat), Event.location, Event.price,
+    image_field(Event.image_key, Event.image, 'image'),
+    image_field(Event.image_key, Event.image, 'thumbnail', thumbnail_url), Event.category,
+    Event.participants, Event.capacity, Event.college_id
+)
+college_event_serializer = Serializer(*event_fields)
+event_serializer = Serializer(*event_fields, college_name)
+
+challenge_serializer = Serializer(
+    Challenge.id, Challenge.title, Challenge.description,
+    Field(Challenge.short_description, 'shortDescription'),
+    Challenge.category, Field(Challenge.deadline, transform=isoformat), Challenge.participants,
+    Challenge.capacity, Field(Challenge.deadline, 'status', transform=challenge_status),
+    Field(Challenge.rules, transform=split_rules),
+    Challenge.prizes, Challenge.price, Challenge.college_id, college_name
+)
+
+college_stats_serializer = Serializer(
+    CollegeStats.college_id, CollegeStats.event_count, CollegeStats.challenge_count,
+    CollegeStats.participants, CollegeStats.registrations, CollegeStats.revenue,
+    Field(CollegeStats.updated_at, transform=isoformat)
+)
+
+daily_stats_serializer = Serializer(
+    Field(CollegeDailyStats.day, 'date', transform=isoformat),
+    CollegeDailyStats.registrations, CollegeDailyStats.revenue
+)
+
+registration_fields = (
+    Registration.id, Registration.user_id, Registration.event_id,
+    Registration.challenge_id, Registration.payment_status,
+    Field(Registration.registered_at, transform=isoformat)
+)
+registration_serializer = Serializer(*registration_fields)
+
+# Needs Event and Challenge outer-joined
+my_registration_serializer = Serializer(
+    *registration_fields,
+    Field(Event.title.label('event_title'), 'event_title'),
+    Field(Event.date.label('event_date'), 'event_date', transform=isoformat),
+    Field(Challenge.title.label('challenge_title'), 'challenge_title'),
+    Field(Challenge.deadline.label('challenge_deadline'), 'challenge_deadline', transform=isoformat)
+)
@@ -5,17 +5,18 @@ Database setup script for Eventify
 This script will create the database tables and seed them with initial data
 """
 
-from app import app
-from models import db
+from app import create_app
+from commands import init_db
 from seed_data import seed_all
 
 def setup_database():
     """Set up the database with tables and initial data"""
     print("Setting up Eventify Database...")
     
+    app = create_app()
     with app.app_context():
         # Create all tables
-        db.create_all()
+        init_db(seed=False)
         print("✓ Database tables created")
         
         # Seed with initial data
@@ -0,0 +1,110 @@
+from collections import defaultdict
+from datetime import date, datetime
+
+from sqlalchemy import case, func
+
+from models import db, Event, Challenge, Registration, CollegeStats, CollegeDailyStats, UPSERT_INSERTS
+
+# Totals are kept in CollegeStats and CollegeDailyStats so dashboards read one
+# row per college (plus one per day shown) however many registrations exist.
+# Writers call record_registrations()/record_approval() inside their own
+# transaction; rebuild_college_stats() recomputes everything from scratch.
+
+def add_to_row(model, keys, deltas, **values):
+    """Add deltas to the row of model identified by keys, creating it if missing"""
+    insert = UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is not None:
+        stmt = insert(model).values(**keys, **deltas, **values)
+        updates = {name: getattr(model, name) + stmt.excluded[name] for name in deltas}
+        updates.update(values)
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=updates))
+        return
+
+    updates = {getattr(model, name): getattr(model, name) + delta for name, delta in deltas.items()}
+    updates.update({getattr(model, name): value for name, value in values.items()})
+    if not model.query.filter_by(**keys).update(updates, synchronize_session=False):
+        db.session.add(model(**keys, **deltas, **values))
+
+def record_registrations(model, counts, day=None):
+    """Add completed registrations (item id -> count) to their colleges' totals"""
+    counts = {item_id: count for item_id, count in counts.items() if count}
+    if not counts:
+        return
+    day = day or datetime.utcnow().date()
+
+    totals = defaultdict(lambda: [0, 0.0])
+    item_ids = sorted(counts)
+    for i in range(0, len(item_ids), 500):
+        rows = db.session.query(model.id, model.college_id, model.price) \
+            .filter(model.id.in_(item_ids[i:i + 500]))
+        for item_id, college_id, price in rows:
+            totals[college_id][0] += counts[item_id]
+            totals[college_id][1] += counts[item_id] * (price or 0.0)
+
+    now = datetime.utcnow()
+    # Fixed lock order so concurrent batches touching the same colleges can't deadlock
+    for college_id, (registrations, revenue) in sorted(totals.items()):
+        add_to_row(CollegeStats, {'college_id': college_id}, {
+            'participants': registrations,
+            'registrations': registrations,
+            'revenue': revenue
+        }, updated_at=now)
+        add_to_row(CollegeDailyStats, {'college_id': college_id, 'day': day}, {
+            'registrations': registrations,
+            'revenue': revenue
+        })
+
+def record_approval(model, college_id):
+    """Count a newly approved event or challenge"""
+    key = 'event_count' if model is Event else 'challenge_count'
+    add_to_row(CollegeStats, {'college_id': college_id}, {key: 1}, updated_at=datetime.utcnow())
+
+def as_date(value):
+    # SQLite's date() returns text, PostgreSQL returns a date
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+def rebuild_college_stats():
+    """Recompute every college's totals from the source tables; returns the
+    number of colleges with stats"""
+    CollegeDailyStats.query.delete(synchronize_session=False)
+    CollegeStats.query.delete(synchronize_session=False)
+
+    totals = defaultdict(lambda: {
+        'event_count': 0, 'challenge_count': 0, 'participants': 0,
+        'registrations': 0, 'revenue': 0.0
+    })
+    for model, key in ((Event, 'event_count'), (Challenge, 'challenge_count')):
+        rows = db.session.query(
+            model.college_id,
+            func.sum(case((model.approved == True, 1), else_=0)),
+            func.sum(model.participants)
+        ).group_by(model.college_id)
+        for college_id, approved, participants in rows:
+            totals[college_id][key] = approved or 0
+            totals[college_id]['participants'] += participants or 0
+
+    daily = defaultdict(lambda: [0, 0.0])
+    day = func.date(Registration.registered_at)
+    for model, foreign_key in ((Event, Registration.event_id), (Challenge, Registration.challenge_id)):
+        rows = db.session.query(
+            model.college_id, day, func.count(Registration.id), func.sum(model.price)
+        ).join(model, model.id == foreign_key) \
+            .filter(Registration.payment_status == 'completed') \
+            .group_by(model.college_id, day)
+        for college_id, registered_on, registrations, revenue in rows:
+            entry = daily[(college_id, as_date(registered_on))]
+            entry[0] += registrations
+            entry[1] += revenue or 0.0
+            totals[college_id]['registrations'] += registrations
+            totals[college_id]['revenue'] += revenue or 0.0
+
+    now = datetime.utcnow()
+    db.session.bulk_insert_mappings(CollegeStats, [
+        dict(values, college_id=college_id, updated_at=now) for college_id, values in totals.items()
+    ])
+    db.session.bulk_insert_mappings(CollegeDailyStats, [
+        {'college_id': college_id, 'day': registered_on, 'registrations': registrations, 'revenue': revenue}
+        for (college_id, registered_on), (registrations, revenue) in daily.items()
+    ])
+    db.session.commit()
+    return len(totals)
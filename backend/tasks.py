@@ -0,0 +1,82 @@
+import smtplib
+from email.message import EmailMessage
+
+from flask import current_app
+
+from cache import response_cache
+from jobs import task
+from models import db, User, Event, Challenge, Registration
+
+def send_mail(to, subject, body):
+    """Send a plain-text email through the configured SMTP server"""
+    config = current_app.config
+    message = EmailMessage()
+    message['From'] = config['MAIL_SENDER']
+    message['To'] = to
+    message['Subject'] = subject
+    message.set_content(body)
+
+    with smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'], timeout=10) as smtp:
+        if config['MAIL_USE_TLS']:
+            smtp.starttls()
+        if config['MAIL_USERNAME']:
+            smtp.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+        smtp.send_message(message)
+
+def load_registration(registration_id=None, stripe_session_id=None):
+    """Return (registration, user, item) or raise LookupError"""
+    if registration_id is not None:
+        registration = db.session.get(Registration, registration_id)
+    else:
+        registration = Registration.query.filter_by(stripe_session_id=stripe_session_id).first()
+    if registration is None:
+        raise LookupError('Registration not found')
+
+    user = db.session.get(User, registration.user_id)
+    if registration.event_id:
+        item = db.session.get(Event, registration.event_id)
+    else:
+        item = db.session.get(Challenge, registration.challenge_id)
+    return registration, user, item
+
+@task(queue='mail')
+def send_registration_confirmation(registration_id=None, stripe_session_id=None):
+    registration, user, item = load_registration(registration_id, stripe_session_id)
+    send_mail(
+        user.email,
+        f"You're registered for {item.title}",
+        f"Hi {user.username},\n\n"
+        f"Your registration for {item.title} is confirmed (reference #{registration.id}).\n\n"
+        "See you there!\nEventify"
+    )
+
+@task(queue='mail')
+def send_receipt(registration_id=None, stripe_session_id=None):
+    registration, user, item = load_registration(registration_id, stripe_session_id)
+    send_mail(
+        user.email,
+        f"Receipt for {item.title}",
+        f"Receipt #{registration.id}\n"
+        f"Date: {registration.registered_at:%d %b %Y}\n"
+        f"Item: {item.title}\n"
+        f"Amount paid: INR {item.price:.2f}\n"
+        f"Payment reference: {registration.stripe_session_id or 'n/a'}\n"
+    )
+
+@task()
+def process_payments(batch_size=500):
+    from payments import process_payment_events
+    while process_payment_events(batch_size):
+        pass
+
+@task(queue='media', max_attempts=3)
+def process_image(kind, item_id, upload=None):
+    """Generate the variants of an event image or college logo"""
+    from media import ImageError, process_item_image
+    try:
+        process_item_image(kind, item_id, upload)
+    except ImageError as e:
+        # Bad input won't get better on retry; the item keeps its old image
+        current_app.logger.warning('Image for %s %s skipped: %s', kind, item_id, e)
+        return
+    response_cache.invalidate()
@@ -0,0 +1,115 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from commands import init_db
+from database import engine_options
+from identity import issue_token
+from models import db, College, Event, Challenge, User
+
+def make_app(tmp_path, **config):
+    """App on a fresh file-backed SQLite database, without caching, rate
+    limits or metrics getting between a request and its queries unless
+    config turns them back on"""
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'eventify.db'}",
+        'CACHE_BACKEND': 'none',
+        'RATELIMIT_ENABLED': False,
+        'METRICS_ENABLED': False,
+        'MEDIA_ROOT': str(tmp_path / 'media'),
+        **config
+    })
+    with app.app_context():
+        init_db(seed=False)
+    return app
+
+def dispose(app):
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+
+@pytest.fixture
+def app(tmp_path):
+    app = make_app(tmp_path)
+    yield app
+    dispose(app)
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+THREADS = 16
+
+@pytest.fixture
+def pooled_app(tmp_path, monkeypatch):
+    """One pooled connection per thread, so requests queue for SQLite's write
+    lock rather than timing out waiting for a connection with a 503. SQLite
+    doesn't hand the lock out in order, so an unlucky writer can wait longer
+    than the default 5 s busy_timeout at this concurrency."""
+    monkeypatch.setenv('SQLITE_BUSY_TIMEOUT_MS', '60000')
+    uri = f"sqlite:///{tmp_path / 'eventify.db'}"
+    app = make_app(tmp_path, SQLALCHEMY_DATABASE_URI=uri, SQLALCHEMY_ENGINE_OPTIONS={
+        **engine_options(uri), 'pool_size': THREADS, 'max_overflow': 0, 'pool_timeout': 30
+    })
+    yield app
+    dispose(app)
+
+def add_users(count):
+    db.session.execute(insert(User), [
+        {'email': f'user-{i}@example.com', 'username': f'user-{i}', 'password_hash': '!'} for i in range(count)
+    ])
+    db.session.commit()
+    return [issue_token(user) for user in User.query.order_by(User.id)]
+
+def add_college(**fields):
+    college = College(**{
+        'name': 'Test College', 'short_name': 'TC', 'location': 'Test', 'state': 'Test', 'approved': True, **fields
+    })
+    db.session.add(college)
+    db.session.flush()
+    return college
+
+def add_events(college, count, **fields):
+    events = [Event(**{
+        'title': f'Event {i}', 'description': 'Test event', 'organizer': 'Tests',
+        'date': datetime.utcnow() + timedelta(days=30), 'location': 'Main hall', 'price': 0.0,
+        'category': 'Technology', 'participants': 0, 'college_id': college.id, 'approved': True, **fields
+    }) for i in range(count)]
+    db.session.add_all(events)
+    db.session.flush()
+    return events
+
+def add_challenges(college, count, **fields):
+    challenges = [Challenge(**{
+        'title': f'Challenge {i}', 'description': 'Test challenge', 'category': 'Coding',
+        'deadline': datetime.utcnow() + timedelta(days=30), 'participants': 0,
+        'college_id': college.id, 'approved': True, **fields
+    }) for i in range(count)]
+    db.session.add_all(challenges)
+    db.session.flush()
+    return challenges
+
+def count_statements(app, client, path):
+    """Run GET path (reading the whole body, streamed or not) and return the
+    response with the SQL statements executed while serving it"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(path)
+        response.get_data()
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return response, statements
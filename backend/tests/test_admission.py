@@ -0,0 +1,64 @@
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+from identity import issue_token
+from models import db, User, Event, Registration, WaitlistEntry
+from tests.conftest import THREADS, add_college, add_events, add_users
+
+def test_only_admins_set_capacity(app, client):
+    app.config['ADMIN_EMAILS'] = {'admin@example.com'}
+    with app.app_context():
+        add_events(add_college(), 1)
+        users = [User(email=f'{name}@example.com', username=name, password_hash='!') for name in ('admin', 'user')]
+        db.session.add_all(users)
+        db.session.commit()
+        admin, user = (issue_token(u) for u in users)
+
+    def put(token, path='/api/admin/events/1/capacity'):
+        return client.put(path, json={'capacity': 5}, headers={'Authorization': f'Bearer {token}'}).status_code
+
+    assert put(user) == 403
+    assert put(user, '/api/admin/challenges/1/capacity') == 403
+    with app.app_context():
+        assert db.session.get(Event, 1).capacity is None
+    assert put(admin) == 200
+    with app.app_context():
+        assert db.session.get(Event, 1).capacity == 5
+
+def test_burst_admission_respects_capacity(pooled_app):
+    """A scaled-down benchmarks/admission.py: more users than seats, each
+    submitting twice at once"""
+    app, users, capacity = pooled_app, 300, 25
+    with app.app_context():
+        event_id = add_events(add_college(), 1, capacity=capacity)[0].id
+        tokens = add_users(users)
+
+    def register(token):
+        response = app.test_client().post('/api/register-event', json={'event_id': event_id},
+                                          headers={'Authorization': f'Bearer {token}'})
+        return response.status_code
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        statuses = list(pool.map(register, tokens + tokens))
+    assert set(statuses) <= {200, 202}
+
+    with app.app_context():
+        registered = [r.user_id for r in Registration.query.filter_by(event_id=event_id)]
+        waitlisted = [w.user_id for w in WaitlistEntry.query.filter_by(event_id=event_id).order_by(WaitlistEntry.id)]
+        assert db.session.get(Event, event_id).participants == len(registered) == capacity
+        # Every user holds exactly one seat or one place in the queue
+        assert Counter(registered + waitlisted) == Counter(range(1, users + 1))
+        cancelled = Registration.query.filter_by(event_id=event_id).order_by(Registration.id).limit(3).all()
+        cancelled = [(r.id, r.user_id) for r in cancelled]
+
+    # Each cancellation hands its seat to the head of the queue
+    for registration_id, user_id in cancelled:
+        response = app.test_client().delete(f'/api/me/registrations/{registration_id}',
+                                            headers={'Authorization': f'Bearer {tokens[user_id - 1]}'})
+        assert response.get_json()['promoted'] == 1
+    with app.app_context():
+        registered = {r.user_id for r in Registration.query.filter_by(event_id=event_id)}
+        assert set(waitlisted[:3]) <= registered
+        assert db.session.get(Event, event_id).participants == len(registered) == capacity
+        assert [w.user_id for w in WaitlistEntry.query.filter_by(event_id=event_id).order_by(WaitlistEntry.id)] \
+            == waitlisted[3:]
@@ -0,0 +1,55 @@
+from identity import issue_token
+from models import db, User, Registration
+from tests.conftest import add_college, add_events
+
+def setup_catalog(app):
+    """Two free events and a paid one; returns tokens for an admin and a user"""
+    app.config['ADMIN_EMAILS'] = {'user-0@example.com'}
+    with app.app_context():
+        college = add_college()
+        add_events(college, 2)
+        add_events(college, 1, price=25.0)
+        users = [User(email=f'user-{i}@example.com', username=f'user-{i}', password_hash='!') for i in range(3)]
+        db.session.add_all(users)
+        db.session.commit()
+        return issue_token(users[0]), issue_token(users[1])
+
+def bulk(client, token, rows):
+    return client.post('/api/register-event/bulk', json=rows, headers={'Authorization': f'Bearer {token}'})
+
+def test_bulk_rows_are_type_checked(app, client):
+    token, _ = setup_catalog(app)
+    response = bulk(client, token, [
+        {'user_id': 1.7, 'event_id': 1},
+        {'user_id': True, 'event_id': 1},
+        {'user_id': 1, 'event_id': '1.0'},
+        {'email': ['user-0@example.com'], 'event_id': 1},
+        {'email': 42, 'event_id': 1},
+        {'user_id': '2', 'event_id': '1'},
+        {'email': 'user-2@example.com', 'event_id': 2},
+    ])
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [result['success'] for result in results] == [False] * 5 + [True, True]
+    assert results[0]['error'] == 'user_id must be an integer'
+    assert results[2]['error'] == 'event_id must be an integer'
+    assert results[3]['error'] == 'email must be a string'
+
+    with app.app_context():
+        assert sorted((r.user_id, r.event_id) for r in Registration.query) == [(2, 1), (3, 2)]
+
+def test_bulk_is_admin_only(app, client):
+    _, user_token = setup_catalog(app)
+    response = bulk(client, user_token, [{'user_id': 2, 'event_id': 1}])
+    assert response.status_code == 403
+    with app.app_context():
+        assert Registration.query.count() == 0
+
+def test_bulk_refuses_paid_items(app, client):
+    token, _ = setup_catalog(app)
+    response = bulk(client, token, [{'user_id': 2, 'event_id': 3}, {'user_id': 2, 'event_id': 1}])
+    results = response.get_json()['results']
+    assert results[0] == {'row': 0, 'success': False, 'error': 'Payment required, register through checkout'}
+    assert results[1]['success']
+    with app.app_context():
+        assert [(r.user_id, r.event_id) for r in Registration.query] == [(2, 1)]
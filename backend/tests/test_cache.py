@@ -0,0 +1,153 @@
+import pytest
+
+from cache import LRUCache, RedisCache, ResponseCache, response_cache
+from identity import issue_token
+from models import db, College, User
+from tests.conftest import add_college, add_events, count_statements, dispose, make_app
+
+@pytest.fixture
+def cached_app(tmp_path):
+    app = make_app(tmp_path, CACHE_BACKEND='memory')
+    with app.app_context():
+        college = add_college()
+        add_events(college, 2)
+        user = User(email='a@example.com', username='a', password_hash='!')
+        db.session.add(user)
+        db.session.commit()
+        app.config['TEST_TOKEN'] = issue_token(user)
+    yield app
+    dispose(app)
+
+def served_from_cache(app, client, path):
+    response, statements = count_statements(app, client, path)
+    assert response.status_code == 200
+    return not statements
+
+def test_registration_only_refreshes_participant_routes(cached_app):
+    client = cached_app.test_client()
+    for path in ('/api/colleges', '/api/search?q=event', '/api/events', '/api/colleges/1/events'):
+        client.get(path)
+
+    response = client.post('/api/register-event', json={'event_id': 1},
+                           headers={'Authorization': f"Bearer {cached_app.config['TEST_TOKEN']}"})
+    assert response.status_code == 200
+
+    assert served_from_cache(cached_app, client, '/api/colleges')
+    assert served_from_cache(cached_app, client, '/api/search?q=event')
+    assert not served_from_cache(cached_app, client, '/api/events')
+    assert not served_from_cache(cached_app, client, '/api/colleges/1/events')
+    events = {event['id']: event['participants'] for event in client.get('/api/events').get_json()}
+    assert events[1] == 1
+
+def test_catalog_change_refreshes_every_route(cached_app):
+    client = cached_app.test_client()
+    client.get('/api/colleges')
+    client.get('/api/events')
+    with cached_app.app_context():
+        response_cache.invalidate()
+    assert not served_from_cache(cached_app, client, '/api/colleges')
+    assert not served_from_cache(cached_app, client, '/api/events')
+
+def test_unknown_resource_is_rejected():
+    with pytest.raises(ValueError):
+        ResponseCache(backend=LRUCache()).cached('registrations')
+
+@pytest.mark.parametrize('path', ['/api/events', '/api/events/1'])
+@pytest.mark.parametrize('encoding', ['gzip', 'identity'])
+def test_vary_keeps_origin_next_to_accept_encoding(cached_app, path, encoding):
+    with cached_app.app_context():
+        add_events(db.session.get(College, 1), 30)
+        db.session.commit()
+    client = cached_app.test_client()
+    headers = {'Origin': 'http://localhost:8080', 'Accept-Encoding': encoding}
+    for _ in range(2):  # built, then replayed from the cache
+        response = client.get(path, headers=headers)
+        assert response.status_code == 200
+        assert response.headers['Access-Control-Allow-Origin'] == 'http://localhost:8080'
+        assert len(response.headers.getlist('Vary')) == 1
+        assert {'Origin', 'Accept-Encoding'} <= set(response.vary)
+
+@pytest.mark.parametrize('encoding', ['identity', 'gzip', 'br'])
+def test_if_none_match_gets_304_per_encoding(cached_app, encoding):
+    if encoding == 'br':
+        pytest.importorskip('brotli')
+    with cached_app.app_context():
+        add_events(db.session.get(College, 1), 30)
+        db.session.commit()
+    client = cached_app.test_client()
+    headers = {'Accept-Encoding': encoding}
+
+    response = client.get('/api/events', headers=headers)
+    etag = response.headers['ETag'].strip('"')
+    if encoding == 'identity':
+        assert 'Content-Encoding' not in response.headers and '-' not in etag
+    else:
+        assert response.headers['Content-Encoding'] == encoding and etag.endswith(f'-{encoding}')
+
+    response = client.get('/api/events', headers={**headers, 'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'].strip('"') == etag
+
+    # Another encoding is another representation, so the tag doesn't match it
+    other = 'gzip' if encoding == 'identity' else 'identity'
+    response = client.get('/api/events', headers={'Accept-Encoding': other, 'If-None-Match': f'"{etag}"'})
+    assert response.status_code == 200
+
+    # A new version of the data gets a new tag
+    with cached_app.app_context():
+        add_events(db.session.get(College, 1), 1, title='Late addition')
+        db.session.commit()
+        response_cache.invalidate()
+    assert client.get('/api/events', headers={**headers, 'If-None-Match': f'"{etag}"'}).status_code == 200
+
+class FakeRedis:
+    """The slice of the redis-py client RedisCache uses; expiries are
+    recorded rather than enforced"""
+
+    def __init__(self):
+        self.values = {}
+        self.expiries = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None):
+        assert ex is None or isinstance(ex, int), 'redis expiries are whole seconds'
+        self.values[key] = value if isinstance(value, bytes) else str(value).encode()
+        self.expiries[key] = ex
+
+    def incr(self, key):
+        value = int(self.values.get(key, 0)) + 1
+        self.values[key] = str(value).encode()
+        return value
+
+    def delete(self, key):
+        self.values.pop(key, None)
+
+def test_redis_backend():
+    client = FakeRedis()
+    cache = RedisCache(client, default_ttl=60, prefix='test:')
+    cache.set('a', b'1')
+    cache.set('b', b'2', ttl=5)
+    assert cache.get('a') == b'1'
+    assert client.expiries == {'test:a': 60, 'test:b': 5}
+    cache.delete('a')
+    assert cache.get('a') is None
+    assert cache.get_version('catalog') == 0
+    assert cache.bump_version('catalog') == 1
+    assert cache.get_version('catalog') == 1
+
+def test_responses_cached_in_redis(cached_app, monkeypatch):
+    client = FakeRedis()
+    monkeypatch.setattr(response_cache, 'backend', RedisCache(client))
+    http = cached_app.test_client()
+    assert not served_from_cache(cached_app, http, '/api/events')
+    assert served_from_cache(cached_app, http, '/api/events')
+    assert any(key.startswith('eventify:catalog+participants:v0.0:') for key in client.values)
+
+    with cached_app.app_context():
+        response_cache.invalidate('participants')
+    assert client.get('eventify:version:participants') == b'1'
+    assert not served_from_cache(cached_app, http, '/api/events')
+    assert served_from_cache(cached_app, http, '/api/events')
@@ -0,0 +1,15 @@
+from identity import issue_token
+from models import db, User
+
+def test_pool_status_is_admin_only(app, client):
+    app.config['ADMIN_EMAILS'] = {'admin@example.com'}
+    with app.app_context():
+        users = [User(email=f'{name}@example.com', username=name, password_hash='!') for name in ('admin', 'user')]
+        db.session.add_all(users)
+        db.session.commit()
+        admin, user = ({'Authorization': f'Bearer {issue_token(u)}'} for u in users)
+
+    assert client.get('/api/admin/db/pool', headers=user).status_code == 403
+    response = client.get('/api/admin/db/pool', headers=admin)
+    assert response.status_code == 200
+    assert {'size', 'checked_out', 'timeouts'} <= set(response.get_json())
@@ -0,0 +1,171 @@
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta
+from email import message_from_bytes
+
+import pytest
+
+import tasks  # registers the mail tasks
+from identity import issue_token
+from jobs import Worker, enqueue, task
+from models import db, Job, User
+from tests.conftest import add_college, add_events
+
+calls = []
+
+@task(name='test_record')
+def record(value):
+    calls.append(value)
+
+@task(name='test_fail', max_attempts=2)
+def fail():
+    raise RuntimeError('boom')
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    calls.clear()
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib.send_message"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.reply('220 localhost test SMTP')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line[:4].upper()
+            if not line or command == 'QUIT':
+                self.reply('221 bye')
+                return
+            if command == 'MAIL':
+                sender, recipients = line.split(':', 1)[1].strip(' <>'), []
+            elif command == 'RCPT':
+                recipients.append(line.split(':', 1)[1].strip(' <>'))
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                data = b''
+                while (chunk := self.rfile.readline()) != b'.\r\n':
+                    data += chunk
+                self.server.messages.append((sender, recipients, message_from_bytes(data)))
+            self.reply('250 OK')
+
+@pytest.fixture
+def smtp(app):
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPHandler)
+    server.messages = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config.update(MAIL_SERVER='127.0.0.1', MAIL_PORT=server.server_address[1])
+    yield server.messages
+    server.shutdown()
+    server.server_close()
+
+def test_enqueued_job_is_claimed_run_and_deleted(app):
+    with app.app_context():
+        enqueue('test_record', value=42)
+        db.session.commit()
+        job = Worker(app).claim()
+        assert (job.status, job.attempts) == ('running', 1)
+        assert Worker(app).claim() is None  # already taken
+        Worker(app).run_job(job)
+        assert calls == [42]
+        assert Job.query.count() == 0
+
+def test_failed_job_is_retried_with_backoff_then_dead(app):
+    worker = Worker(app, backoff_base=10)
+    with app.app_context():
+        enqueue('test_fail')
+        db.session.commit()
+        job_id = Job.query.one().id
+
+        worker.run_job(worker.claim())
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.attempts) == ('queued', 1)
+        assert 'RuntimeError: boom' in job.last_error
+        delay = (job.run_at - datetime.utcnow()).total_seconds()
+        assert 7 <= delay <= 12  # backoff_base with +-20% jitter
+        assert worker.claim() is None  # not due yet
+
+        job.run_at = datetime.utcnow()
+        db.session.commit()
+        worker.run_job(worker.claim())
+        db.session.expire_all()
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.attempts) == ('dead', 2)
+        assert worker.claim() is None
+
+def stale_job(name, attempts, max_attempts=5):
+    job = Job(name=name, queue='default', payload='{"value": 1}', status='running', attempts=attempts,
+              max_attempts=max_attempts, run_at=datetime.utcnow(), locked_by='gone:1',
+              locked_at=datetime.utcnow() - timedelta(minutes=10))
+    db.session.add(job)
+    db.session.commit()
+    return job.id
+
+def test_stale_jobs_are_requeued_until_out_of_attempts(app):
+    with app.app_context():
+        retry = stale_job('test_record', attempts=1)
+        last = stale_job('test_record', attempts=5)
+        assert Worker(app).requeue_stale() == 1
+        assert db.session.get(Job, retry).status == 'queued'
+        assert db.session.get(Job, last).status == 'dead'
+        assert db.session.get(Job, last).last_error == 'Worker stopped while running the job'
+
+def test_running_worker_picks_up_jobs_of_a_dead_worker(app):
+    worker = Worker(app, poll_interval=0.05, visibility_timeout=0.2)
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+    try:
+        time.sleep(0.1)  # past the requeue done at startup
+        with app.app_context():
+            stale_job('test_record', attempts=1)
+        deadline = time.monotonic() + 5
+        while not calls and time.monotonic() < deadline:
+            time.sleep(0.05)
+    finally:
+        worker.stopping.set()
+        thread.join()
+    assert calls == [1]
+
+def add_user_and_event():
+    add_events(add_college(), 1, title='Robotics Fest')
+    user = User(email='a@example.com', username='asha', password_hash='!')
+    db.session.add(user)
+    db.session.commit()
+    return issue_token(user)
+
+def test_registration_confirmation_is_mailed(app, client, smtp):
+    with app.app_context():
+        token = add_user_and_event()
+    response = client.post('/api/register-event', json={'event_id': 1}, headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+
+    Worker(app, queues=['mail']).run(burst=True)
+    [(sender, recipients, message)] = smtp
+    assert recipients == ['a@example.com']
+    assert message['Subject'] == "You're registered for Robotics Fest"
+    assert 'Hi asha' in message.get_payload()
+    with app.app_context():
+        assert Job.query.count() == 0
+
+def test_unreachable_mail_server_is_retried(app, client, smtp):
+    with app.app_context():
+        token = add_user_and_event()
+    client.post('/api/register-event', json={'event_id': 1}, headers={'Authorization': f'Bearer {token}'})
+    port, app.config['MAIL_PORT'] = app.config['MAIL_PORT'], 1  # nothing listens there
+
+    worker = Worker(app, queues=['mail'])
+    worker.run(burst=True)
+    with app.app_context():
+        job = Job.query.one()
+        assert (job.status, job.attempts) == ('queued', 1)
+        assert 'ConnectionRefusedError' in job.last_error
+        job.run_at = datetime.utcnow()
+        db.session.commit()
+
+    app.config['MAIL_PORT'] = port
+    worker.run(burst=True)
+    assert [recipients for _, recipients, _ in smtp] == [['a@example.com']]
@@ -0,0 +1,34 @@
+import pytest
+
+from models import db
+from tests.conftest import add_college, add_events, add_challenges, count_statements
+
+def build_catalog(app, rows):
+    with app.app_context():
+        colleges = [add_college(name=f'College {i}') for i in range(3)]
+        for i in range(rows):
+            add_events(colleges[i % 3], 1)
+            add_challenges(colleges[i % 3], 1)
+        db.session.commit()
+
+@pytest.mark.parametrize('rows', [1, 40])
+@pytest.mark.parametrize('path', ['/api/events', '/api/challenges'])
+def test_listing_is_one_select(app, client, path, rows):
+    build_catalog(app, rows)
+    client.get(path)  # open the pooled connection outside the count
+
+    response, statements = count_statements(app, client, path)
+    assert response.status_code == 200
+    items = response.get_json()
+    assert len(items) == rows
+    assert all(item['college_name'].startswith('College ') for item in items)
+    assert len(statements) == 1 and statements[0].lstrip().upper().startswith('SELECT')
+
+def test_event_detail_is_one_select(app, client):
+    build_catalog(app, 5)
+    client.get('/api/events/1')
+
+    response, statements = count_statements(app, client, '/api/events/3')
+    assert response.status_code == 200
+    assert response.get_json()['college_name'].startswith('College ')
+    assert len(statements) == 1
@@ -0,0 +1,47 @@
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from live import live_counts
+from tests.conftest import THREADS, add_college, add_events, add_users
+
+def last_count(stream, event_id, expected):
+    """Read a stream's messages until event_id's count reaches expected"""
+    count = None
+    for chunk in stream.response:
+        for line in chunk.decode().splitlines():
+            if line.startswith('data: '):
+                counts = {row['id']: row['participants'] for row in json.loads(line[6:])}
+                count = counts.get(event_id, count)
+        if count == expected:
+            return count
+    return count
+
+def test_one_read_per_window_reaches_every_stream(pooled_app):
+    """A scaled-down benchmarks/live.py: a burst of registrations is read once
+    per window however many streams are open"""
+    app, users, streams = pooled_app, 100, 200
+    with app.app_context():
+        event_id = add_events(add_college(), 1)[0].id
+        tokens = add_users(users)
+    live_counts.sent.clear()
+
+    client = app.test_client()
+    subscribers = [client.get('/api/events/stream') for _ in range(streams)]
+    assert all(s.status_code == 200 and s.mimetype == 'text/event-stream' for s in subscribers)
+
+    def register(token):
+        return app.test_client().post('/api/register-event', json={'event_id': event_id},
+                                      headers={'Authorization': f'Bearer {token}'}).status_code
+
+    reads, started = live_counts.reads, time.monotonic()
+    with ThreadPoolExecutor(THREADS) as pool:
+        assert set(pool.map(register, tokens)) == {200}
+    assert [last_count(s, event_id, users) for s in subscribers] == [users] * streams
+    windows = (time.monotonic() - started) / app.config['LIVE_COUNTS_WINDOW']
+
+    # Reads follow the clock, not the registrations or the open streams
+    assert 1 <= live_counts.reads - reads <= windows + 1
+    for subscriber in subscribers:
+        subscriber.close()
+    assert not live_counts.subscribers
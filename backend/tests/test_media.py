@@ -0,0 +1,98 @@
+import socket
+
+import pytest
+
+import media
+from identity import issue_token
+from media import ImageError, read_source
+from models import db, User
+from tests.conftest import add_college, add_events
+
+def setup_event(app):
+    """An event plus tokens for an admin and a regular user"""
+    app.config['ADMIN_EMAILS'] = {'admin@example.com'}
+    with app.app_context():
+        add_events(add_college(), 1)
+        users = [User(email=f'{name}@example.com', username=name, password_hash='!') for name in ('admin', 'user')]
+        db.session.add_all(users)
+        db.session.commit()
+        return issue_token(users[0]), issue_token(users[1])
+
+def replace(client, token, url, path='/api/admin/events/1/image'):
+    return client.post(path, json={'url': url}, headers={'Authorization': f'Bearer {token}'})
+
+def test_only_admins_replace_images(app, client):
+    _, user = setup_event(app)
+    assert replace(client, user, 'https://example.com/a.png').status_code == 403
+    assert replace(client, user, 'https://example.com/a.png', '/api/admin/colleges/1/logo').status_code == 403
+
+@pytest.mark.parametrize('url', [
+    'http://169.254.169.254/latest/meta-data/',
+    'http://127.0.0.1:5000/api/admin/db/pool',
+    'http://localhost/',
+    'http://10.0.0.5/logo.png',
+    'http://[::1]/logo.png',
+])
+def test_image_urls_on_private_hosts_are_refused(app, client, url):
+    admin, _ = setup_event(app)
+    response = replace(client, admin, url)
+    assert response.status_code == 400
+    assert 'not a public address' in response.get_json()['error']
+
+class FakeResponse:
+    def __init__(self, status_code, headers=None, body=b''):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.body = body
+
+    @property
+    def is_redirect(self):
+        return 'Location' in self.headers
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        pass
+
+    def iter_content(self, size):
+        yield self.body
+
+def test_redirects_to_private_hosts_are_not_followed(app, monkeypatch):
+    import requests
+    fetched = []
+
+    def fake_get(url, **kwargs):
+        assert kwargs['allow_redirects'] is False
+        fetched.append(url)
+        return FakeResponse(302, {'Location': 'http://169.254.169.254/latest/meta-data/'})
+
+    def fake_getaddrinfo(host, port, *args):
+        address = host if host[0].isdigit() else '93.184.216.34'
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, '', (address, port or 80))]
+
+    monkeypatch.setattr(requests, 'get', fake_get)
+    monkeypatch.setattr(media.socket, 'getaddrinfo', fake_getaddrinfo)
+    with app.app_context():
+        with pytest.raises(ImageError, match='not a public address'):
+            read_source('https://images.example.com/logo.png')
+    assert fetched == ['https://images.example.com/logo.png']
+
+def test_public_redirects_are_followed(app, monkeypatch):
+    import requests
+    responses = iter([FakeResponse(301, {'Location': '/v2/logo.png'}), FakeResponse(200, body=b'png')])
+    fetched = []
+
+    def fake_get(url, **kwargs):
+        fetched.append(url)
+        return next(responses)
+
+    monkeypatch.setattr(requests, 'get', fake_get)
+    monkeypatch.setattr(media.socket, 'getaddrinfo', lambda host, port, *args: [
+        (socket.AF_INET, socket.SOCK_STREAM, 6, '', ('93.184.216.34', port or 80))])
+    with app.app_context():
+        assert read_source('https://images.example.com/logo.png') == b'png'
+    assert fetched == ['https://images.example.com/logo.png', 'https://images.example.com/v2/logo.png']
@@ -0,0 +1,96 @@
+import pytest
+from sqlalchemy import text
+
+from migrations import add_missing_columns
+from models import db, User
+
+def drop_token_version():
+    db.session.execute(text('ALTER TABLE user DROP COLUMN token_version'))
+    db.session.execute(text("INSERT INTO user (email, username) VALUES ('old@example.com', 'old')"))
+    db.session.commit()
+
+def test_not_null_column_is_added_with_its_default(app):
+    with app.app_context():
+        drop_token_version()
+        assert add_missing_columns() == ['user.token_version']
+        assert db.session.query(User.token_version).scalar() == 0
+
+def test_not_null_column_without_default_fails_loudly(app, monkeypatch):
+    with app.app_context():
+        drop_token_version()
+        monkeypatch.setattr(User.__table__.c.token_version, 'server_default', None)
+        with pytest.raises(RuntimeError, match='user.token_version'):
+            add_missing_columns()
+
+def make_legacy_event_table(dates):
+    """Recreate the event table with the old string date column"""
+    from sqlalchemy.schema import CreateTable
+    from models import Event
+    ddl = str(CreateTable(Event.__table__).compile(dialect=db.engine.dialect))
+    assert '\tdate DATETIME NOT NULL' in ddl
+    db.session.execute(text('DROP TABLE event'))
+    db.session.execute(text(ddl.replace('\tdate DATETIME NOT NULL', '\tdate VARCHAR(50) NOT NULL')))
+    for i, value in enumerate(dates, 1):
+        db.session.execute(text(
+            "INSERT INTO event (id, title, description, organizer, date, location, category, college_id) "
+            "VALUES (:id, 'Fest', 'x', 'x', :date, 'Hall', 'Tech', 1)"
+        ), {'id': i, 'date': value})
+    db.session.commit()
+
+def event_columns():
+    from sqlalchemy import inspect
+    return {c['name']: str(c['type']) for c in inspect(db.engine).get_columns('event')}
+
+def test_failed_date_migration_changes_nothing_and_can_rerun(app):
+    from sqlalchemy import event as sa_event
+    from migrations import migrate_date_columns
+
+    with app.app_context():
+        make_legacy_event_table(['March 15, 2024', 'Dec 15-17, 2023'])
+        engine = db.engine
+
+        def fail_on_drop(conn, cursor, statement, parameters, context, executemany):
+            if statement.startswith('ALTER TABLE event DROP COLUMN date'):
+                raise RuntimeError('simulated crash')
+
+        sa_event.listen(engine, 'before_cursor_execute', fail_on_drop)
+        try:
+            with pytest.raises(RuntimeError):
+                migrate_date_columns()
+        finally:
+            sa_event.remove(engine, 'before_cursor_execute', fail_on_drop)
+        db.session.remove()
+        assert 'date_parsed' not in event_columns()
+        assert event_columns()['date'].startswith('VARCHAR')
+
+        assert migrate_date_columns() == 1
+        assert event_columns()['date'] == 'DATETIME'
+        dates = [row[0] for row in db.session.execute(text('SELECT date FROM event ORDER BY id'))]
+        assert dates == ['2024-03-15 00:00:00.000000', '2023-12-15 00:00:00.000000']
+
+def test_leftover_parsed_column_is_replaced(app):
+    from migrations import migrate_date_columns
+
+    with app.app_context():
+        make_legacy_event_table(['2024-05-01'])
+        db.session.execute(text('ALTER TABLE event ADD COLUMN date_parsed DATETIME'))
+        db.session.commit()
+        assert migrate_date_columns() == 1
+        assert 'date_parsed' not in event_columns()
+
+def test_upgrade_with_duplicate_registrations(app):
+    from commands import init_db
+    from models import Registration
+
+    with app.app_context():
+        make_legacy_event_table(['March 15, 2024'])
+        db.session.execute(text('DROP INDEX ux_registration_user_event'))
+        db.session.execute(text("INSERT INTO user (id, email, username, password_hash) VALUES (1, 'a@example.com', 'a', '!')"))
+        for _ in range(3):
+            db.session.execute(text("INSERT INTO registration (user_id, event_id, payment_status, registered_at) "
+                                    "VALUES (1, 1, 'free', '2024-01-01 00:00:00')"))
+        db.session.commit()
+
+        init_db(seed=False)
+        assert db.session.query(Registration).count() == 1
+        assert event_columns()['date'] == 'DATETIME'
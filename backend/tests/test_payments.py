@@ -0,0 +1,152 @@
+import hashlib
+import hmac
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+import pytest
+
+import payments
+import tasks  # registers process_payments
+from identity import issue_token
+from jobs import Worker
+from models import db, User, Event, Registration, PaymentEvent
+from payments import process_payment_events, stripe_gateway
+from tests.conftest import add_college, add_events
+
+def checkout_completed(event_id, session_id, metadata):
+    return PaymentEvent(id=event_id, type='checkout.session.completed', payload=json.dumps({
+        'data': {'object': {'id': session_id, 'payment_status': 'paid', 'metadata': metadata}}
+    }))
+
+def setup_paid_event(app):
+    with app.app_context():
+        event = add_events(add_college(), 1, price=25.0)[0]
+        db.session.add_all([User(email=f'user-{i}@example.com', username=f'user-{i}', password_hash='!')
+                            for i in range(2)])
+        db.session.commit()
+        return event.id
+
+def test_unusable_events_do_not_block_the_batch(app):
+    event_id = setup_paid_event(app)
+    with app.app_context():
+        db.session.add_all([
+            checkout_completed('evt_missing_user', 'cs_1', {'event_id': str(event_id)}),
+            checkout_completed('evt_bad_item', 'cs_2', {'user_id': '1', 'event_id': 'abc'}),
+            checkout_completed('evt_both_items', 'cs_3', {'user_id': '1', 'event_id': '1', 'challenge_id': '1'}),
+            PaymentEvent(id='evt_bad_payload', type='checkout.session.completed', payload='{"data": []}'),
+            checkout_completed('evt_ok', 'cs_4', {'user_id': '2', 'event_id': str(event_id)}),
+        ])
+        db.session.commit()
+
+        assert process_payment_events() == 5
+        assert [(r.user_id, r.stripe_session_id) for r in Registration.query] == [(2, 'cs_4')]
+        assert db.session.get(Event, event_id).participants == 1
+        assert PaymentEvent.query.filter(PaymentEvent.processed_at.is_(None)).count() == 0
+
+def test_conflicting_events_are_set_aside(app, monkeypatch):
+    event_id = setup_paid_event(app)
+    with app.app_context():
+        db.session.add(Registration(user_id=1, event_id=event_id, payment_status='completed', stripe_session_id='cs_0'))
+        db.session.add_all([
+            checkout_completed('evt_conflict', 'cs_1', {'user_id': '1', 'event_id': str(event_id)}),
+            checkout_completed('evt_ok', 'cs_2', {'user_id': '2', 'event_id': str(event_id)}),
+        ])
+        db.session.commit()
+        # As if another worker registered user 1 after the duplicate check ran
+        monkeypatch.setattr(payments, 'registered_pairs', lambda column, pairs: set())
+
+        assert process_payment_events() == 2
+        assert sorted(r.stripe_session_id for r in Registration.query) == ['cs_0', 'cs_2']
+        assert PaymentEvent.query.filter(PaymentEvent.processed_at.is_(None)).count() == 0
+
+WEBHOOK_SECRET = 'whsec_test'
+
+class FakeStripe(BaseHTTPRequestHandler):
+    """Creates checkout sessions, replaying the first response for a
+    repeated Idempotency-Key the way Stripe does"""
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers['Content-Length'])).decode())
+        server = self.server
+        key = self.headers.get('Idempotency-Key')
+        server.requests.append((self.path, key, form))
+        if key not in server.sessions:
+            session_id = f'cs_test_{len(server.sessions) + 1}'
+            server.sessions[key] = {'id': session_id, 'object': 'checkout.session',
+                                    'url': f'https://checkout.example.com/pay/{session_id}'}
+        body = json.dumps(server.sessions[key]).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_stripe(app):
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeStripe)
+    server.requests, server.sessions = [], {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    app.config.update(STRIPE_API_BASE=f'http://127.0.0.1:{server.server_port}',
+                      STRIPE_WEBHOOK_SECRET=WEBHOOK_SECRET, STRIPE_SECRET_KEY='sk_test_fake')
+    stripe_gateway.init_app(app)
+    yield server
+    server.shutdown()
+    server.server_close()
+    stripe_gateway.init_app(app)
+
+def signed(payload, secret=WEBHOOK_SECRET):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f'{timestamp}.{payload}'.encode(), hashlib.sha256).hexdigest()
+    return {'Stripe-Signature': f't={timestamp},v1={signature}', 'Content-Type': 'application/json'}
+
+def test_checkout_webhook_registration(app, client, fake_stripe):
+    event_id = setup_paid_event(app)
+    with app.app_context():
+        auth = {'Authorization': f'Bearer {issue_token(db.session.get(User, 1))}'}
+
+    response = client.post('/api/payments/create-session', json={'event_id': event_id}, headers=auth)
+    assert response.status_code == 200
+    assert response.get_json()['url'] == 'https://checkout.example.com/pay/cs_test_1'
+    [(path, key, form)] = fake_stripe.requests
+    assert path == '/v1/checkout/sessions'
+    assert form['metadata[user_id]'] == ['1'] and form['metadata[event_id]'] == [str(event_id)]
+    assert form['line_items[0][price_data][unit_amount]'] == ['2500']
+
+    # The open session is handed back without calling Stripe again
+    assert client.post('/api/payments/create-session', json={'event_id': event_id}, headers=auth) \
+        .get_json()['url'].endswith('cs_test_1')
+    assert len(fake_stripe.requests) == 1
+    # Once forgotten, the idempotency key still leads Stripe to the same session
+    stripe_gateway.open_sessions = type(stripe_gateway.open_sessions)()
+    assert client.post('/api/payments/create-session', json={'event_id': event_id}, headers=auth) \
+        .get_json()['url'].endswith('cs_test_1')
+    assert [request[1] for request in fake_stripe.requests] == [key, key]
+
+    payload = json.dumps({
+        'id': 'evt_1', 'object': 'event', 'type': 'checkout.session.completed',
+        'data': {'object': {'id': 'cs_test_1', 'object': 'checkout.session', 'payment_status': 'paid',
+                            'metadata': {'user_id': '1', 'event_id': str(event_id)}}}
+    })
+    assert client.post('/api/payments/webhook', data=payload, headers=signed(payload, 'whsec_wrong')).status_code == 400
+    assert client.post('/api/payments/webhook', data='{', headers=signed('{')).status_code == 400
+    assert client.post('/api/payments/webhook', data=payload, headers=signed(payload)).status_code == 200
+    # Stripe redelivers; the event is recorded once
+    assert client.post('/api/payments/webhook', data=payload, headers=signed(payload)).status_code == 200
+
+    with app.app_context():
+        assert PaymentEvent.query.count() == 1
+        assert Registration.query.count() == 0
+    Worker(app).run(burst=True)
+    with app.app_context():
+        [registration] = Registration.query.all()
+        assert (registration.user_id, registration.event_id) == (1, event_id)
+        assert registration.stripe_session_id == 'cs_test_1'
+        assert db.session.get(Event, event_id).participants == 1
+
+    assert client.post('/api/payments/create-session', json={'event_id': event_id}, headers=auth).status_code == 409
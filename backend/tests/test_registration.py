@@ -0,0 +1,24 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from models import db, Event, Registration
+from tests.conftest import THREADS, add_college, add_events, add_users
+
+def test_parallel_registrations_count_every_participant(pooled_app):
+    app, users = pooled_app, 1000
+    with app.app_context():
+        event_id = add_events(add_college(), 1)[0].id
+        tokens = add_users(users)
+
+    def register(token):
+        # One client per call; test clients are not shared between threads
+        return app.test_client().post('/api/register-event', json={'event_id': event_id},
+                                      headers={'Authorization': f'Bearer {token}'}).status_code
+
+    # Every user submits twice, as a double click would
+    with ThreadPoolExecutor(THREADS) as pool:
+        statuses = list(pool.map(register, tokens + tokens))
+    assert statuses == [200] * len(statuses)
+
+    with app.app_context():
+        assert db.session.get(Event, event_id).participants == users
+        assert Registration.query.filter_by(event_id=event_id).count() == users
@@ -0,0 +1,62 @@
+import pytest
+
+from identity import issue_token
+from models import db, User
+from replicas import REPLICA_BIND, beat, copy_sqlite
+from tests.conftest import add_college, add_events, dispose, make_app
+
+@pytest.fixture
+def replica_app(tmp_path):
+    """Cached app reading from a second SQLite file, synced by hand"""
+    app = make_app(tmp_path, REPLICA_DATABASE_URL=f"sqlite:///{tmp_path / 'replica.db'}",
+                   REPLICA_LAG_CHECK_INTERVAL=0, CACHE_BACKEND='memory')
+    with app.app_context():
+        college = add_college()
+        add_events(college, 1)
+        user = User(email='a@example.com', username='a', password_hash='!')
+        db.session.add(user)
+        db.session.commit()
+        app.config['TEST_TOKEN'] = issue_token(user)
+        beat()
+        copy_sqlite(db.engine, db.engines[REPLICA_BIND])
+    yield app
+    dispose(app)
+
+def participants(client, **kwargs):
+    response = client.get('/api/events', **kwargs)
+    assert response.status_code == 200
+    return response.get_json()[0]['participants']
+
+def test_writer_reads_own_write_past_cached_replica_response(replica_app):
+    client = replica_app.test_client()
+    auth = {'Authorization': f"Bearer {replica_app.config['TEST_TOKEN']}"}
+    assert participants(client, headers=auth) == 0  # from the replica, now cached
+
+    assert client.post('/api/register-event', json={'event_id': 1}, headers=auth).status_code == 200
+    # Another visitor's read reaches the replica before the write has
+    assert participants(client, environ_base={'REMOTE_ADDR': '10.0.0.2'}) == 0
+    # Pinned to the primary, past both the stale replica and the cache
+    assert participants(client, headers=auth) == 1
+    assert participants(client, headers=auth) == 1
+
+def test_replica_responses_are_not_served_from_the_primary(replica_app):
+    client = replica_app.test_client()
+    auth = {'Authorization': f"Bearer {replica_app.config['TEST_TOKEN']}"}
+    # The replica misses this write; another visitor still reads from it
+    client.post('/api/register-event', json={'event_id': 1}, headers=auth)
+    assert participants(client, environ_base={'REMOTE_ADDR': '10.0.0.2'}) == 0  # stale replica
+
+    # Once the replica is too far behind, reads return to the primary and
+    # must not be answered with the response built on the replica
+    replica_app.config['REPLICA_MAX_LAG'] = -1
+    assert participants(client, environ_base={'REMOTE_ADDR': '10.0.0.2'}) == 1
+
+def test_replica_responses_expire_after_the_allowed_lag(replica_app, monkeypatch):
+    from cache import RedisCache, response_cache
+    from tests.test_cache import FakeRedis
+
+    client = FakeRedis()
+    monkeypatch.setattr(response_cache, 'backend', RedisCache(client, default_ttl=300))
+    replica_app.test_client().get('/api/events')
+    [key] = [key for key in client.values if 'replica:' in key]
+    assert client.expiries[key] == 5
@@ -0,0 +1,29 @@
+from identity import issue_token
+from models import db, User, Event
+from tests.conftest import add_college, add_events
+
+def setup_users(app):
+    app.config['ADMIN_EMAILS'] = {'admin@example.com'}
+    with app.app_context():
+        add_events(add_college(), 1, approved=False)
+        users = [User(email=f'{name}@example.com', username=name, password_hash='!') for name in ('admin', 'user')]
+        db.session.add_all(users)
+        db.session.commit()
+        return [{'Authorization': f'Bearer {issue_token(u)}'} for u in users]
+
+def test_only_admins_read_college_stats(app, client):
+    admin, user = setup_users(app)
+    assert client.get('/api/colleges/1/stats', headers=user).status_code == 403
+    response = client.get('/api/colleges/1/stats', headers=admin)
+    assert response.status_code == 200
+    assert response.get_json()['college_id'] == 1
+
+def test_only_admins_approve(app, client):
+    admin, user = setup_users(app)
+    assert client.post('/api/admin/events/1/approve', headers=user).status_code == 403
+    assert client.post('/api/admin/challenges/1/approve', headers=user).status_code == 403
+    with app.app_context():
+        assert not db.session.get(Event, 1).approved
+    assert client.post('/api/admin/events/1/approve', headers=admin).status_code == 200
+    with app.app_context():
+        assert db.session.get(Event, 1).approved
@@ -34,7 +34,7 @@ interface Challenge {
   category: string;
   deadline: string;
   participants: number;
-  status: 'New' | 'Trending' | 'Closing Soon' | 'Popular' | '';
+  status: 'New' | 'Trending' | 'Closing Soon' | 'Popular' | 'Closed' | '';
   rules: string[];
   prizes: string;
   price: number; // Adding price for registration
@@ -162,6 +162,7 @@ const statusColors = {
   'Trending': 'bg-pink-500',
   'Closing Soon': 'bg-orange-500',
   'Popular': 'bg-blue-500',
+  'Closed': 'bg-gray-500',
   '': ''
 };
 
@@ -79,13 +79,29 @@ export const collegesAPI = {
 
 // Events API
 export const eventsAPI = {
-  getAll: () => apiRequest('/events'),
+  getAll: (upcoming = false) => apiRequest(upcoming ? '/events?upcoming=true' : '/events'),
   getById: (id: number) => apiRequest(`/events/${id}`),
+
+  // Live participant counts; returns a function that closes the stream
+  subscribeParticipants: (onUpdate: (counts: { id: number; participants: number }[]) => void, eventId?: number) => {
+    const source = new EventSource(`${API_BASE_URL}/events${eventId ? `/${eventId}` : ''}/stream`);
+    source.addEventListener('participants', (event) => onUpdate(JSON.parse((event as MessageEvent).data)));
+    return () => source.close();
+  },
 };
 
 // Challenges API
 export const challengesAPI = {
-  getAll: () => apiRequest('/challenges'),
+  getAll: (upcoming = false) => apiRequest(upcoming ? '/challenges?upcoming=true' : '/challenges'),
+};
+
+// Search API
+export const searchAPI = {
+  search: (query: string, type?: 'event' | 'challenge' | 'college') => {
+    const params = new URLSearchParams({ q: query });
+    if (type) params.set('type', type);
+    return apiRequest(`/search?${params.toString()}`);
+  },
 };
 
 // Payments API
@@ -102,7 +118,16 @@ export const paymentsAPI = {
       method: 'POST',
       body: JSON.stringify({ event_id: eventId, challenge_id: challengeId }),
     });
-  }
+  },
+
+  getMyRegistrations: (cursor?: string) =>
+    apiRequest(cursor ? `/me/registrations?cursor=${encodeURIComponent(cursor)}` : '/me/registrations'),
+
+  cancelRegistration: (id: number) => apiRequest(`/me/registrations/${id}`, { method: 'DELETE' }),
+
+  getMyWaitlist: () => apiRequest('/me/waitlist'),
+
+  leaveWaitlist: (id: number) => apiRequest(`/me/waitlist/${id}`, { method: 'DELETE' })
 };
 
 // Admin API